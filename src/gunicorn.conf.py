@@ -0,0 +1,13 @@
+# src/gunicorn.conf.py
+import os
+
+# PRELOAD_APP=1 imports the app once in the master before forking, so the
+# frequent worker recycling (--max-requests) doesn't repeat startup imports
+preload_app = os.environ.get("PRELOAD_APP") == "1"
+
+
+def worker_exit(server, worker):
+    # Workers exit every few requests; keep what they measured
+    from recipes.metrics import flush
+    flush(force=True)
+
@@ -0,0 +1,232 @@
+# src/recipe_app/cache_backends.py
+import time
+import pickle
+import logging
+import threading
+from collections import OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+# Like LocMemCache, local tiers are module-level so every thread and greenlet
+# in the process shares one LRU; Django builds backend instances per thread
+_tiers = {}
+_tiers_lock = threading.Lock()
+
+# Called with "local_hit", "shared_hit" or "miss" after every get, e.g. by
+# the metrics middleware to attribute lookups to the request being served
+lookup_hooks = []
+
+
+def _notify_lookup(result):
+    for hook in lookup_hooks:
+        hook(result)
+
+
+class LocalTier:
+    """An LRU of pickled values bounded by entry count and total size."""
+
+    def __init__(self, max_entries, max_bytes):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.bytes = 0
+        self.lock = threading.Lock()
+        self.counters = {
+            "local_hits": 0,
+            "local_misses": 0,
+            "shared_hits": 0,
+            "shared_misses": 0,
+        }
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return _MISSING
+            expires, pickled = entry
+            if expires is not None and expires <= time.time():
+                self._delete(key)
+                return _MISSING
+            self.entries.move_to_end(key)
+        return pickle.loads(pickled)
+
+    def set(self, key, value, expires):
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        with self.lock:
+            self._delete(key)
+            if len(pickled) > self.max_bytes:
+                return
+            self.entries[key] = (expires, pickled)
+            self.bytes += len(pickled)
+            # Evict least recently used entries past either bound
+            while len(self.entries) > self.max_entries or self.bytes > self.max_bytes:
+                _, (_, evicted) = self.entries.popitem(last=False)
+                self.bytes -= len(evicted)
+
+    def delete(self, key):
+        with self.lock:
+            self._delete(key)
+
+    def _delete(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= len(entry[1])
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.bytes = 0
+
+
+class TwoTierCache(BaseCache):
+    """
+    A bounded in-process LRU in front of a shared cache.
+
+    Reads try the local tier first and fall back to the shared one, copying
+    what they find into the local tier. Writes go to both. The shared tier is
+    another CACHES alias, e.g. a FileBasedCache or memcached, so entries
+    survive worker restarts and are seen by every worker.
+
+    Local copies live at most LOCAL_TIMEOUT seconds, which bounds how long a
+    worker can miss another worker's change. Keys starting with one of
+    LOCAL_BYPASS_PREFIXES are always read from the shared tier; use it for
+    counters that must be coherent across workers, such as cache versions.
+
+    ROUTES sends keys starting with a given prefix to another alias instead
+    of the shared one, e.g. cache versions to a store every machine sees,
+    kept apart from the pool that page data fills and culls.
+    LOCAL_TIMEOUTS shortens the local lifetime of keys by prefix, for keys
+    that must be nearly coherent but are read on every request.
+
+    OPTIONS:
+        SHARED (str): Alias of the shared cache
+        ROUTES (dict): Key prefix -> alias of the cache holding those keys
+        MAX_ENTRIES (int): Local tier entry limit
+        MAX_BYTES (int): Local tier size limit, counting pickled values
+        LOCAL_TIMEOUT (int): Longest lifetime of a local copy, in seconds
+        LOCAL_TIMEOUTS (dict): Key prefix -> shorter local lifetime, in seconds
+        LOCAL_BYPASS_PREFIXES (list): Keys never kept locally
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get("OPTIONS", {})
+        self.shared_alias = options["SHARED"]
+        self.routes = dict(options.get("ROUTES", {}))
+        self.local_timeout = int(options.get("LOCAL_TIMEOUT", 30))
+        self.local_timeouts = dict(options.get("LOCAL_TIMEOUTS", {}))
+        self.bypass_prefixes = tuple(options.get("LOCAL_BYPASS_PREFIXES", ()))
+        with _tiers_lock:
+            self.local = _tiers.setdefault(location, LocalTier(
+                self._max_entries, int(options.get("MAX_BYTES", 32 * 1024 * 1024))
+            ))
+
+    @property
+    def shared(self):
+        return caches[self.shared_alias]
+
+    def backend_for(self, key):
+        """Return the cache behind the local tier that holds key."""
+        for prefix, alias in self.routes.items():
+            if key.startswith(prefix):
+                return caches[alias]
+        return self.shared
+
+    def _cacheable_locally(self, key):
+        return not key.startswith(self.bypass_prefixes)
+
+    def _local_set(self, key, local_key, value, timeout):
+        expires = self.get_backend_timeout(timeout)
+        local_timeout = self.local_timeout
+        for prefix, seconds in self.local_timeouts.items():
+            if key.startswith(prefix):
+                local_timeout = min(local_timeout, seconds)
+        local_expires = time.time() + local_timeout
+        if expires is None or expires > local_expires:
+            expires = local_expires
+        self.local.set(local_key, value, expires)
+
+    # Cache API
+
+    def get(self, key, default=None, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self._cacheable_locally(key):
+            value = self.local.get(local_key)
+            if value is not _MISSING:
+                self.local.count("local_hits")
+                _notify_lookup("local_hit")
+                return value
+            self.local.count("local_misses")
+
+        value = self.backend_for(key).get(key, _MISSING, version=version)
+        if value is _MISSING:
+            self.local.count("shared_misses")
+            _notify_lookup("miss")
+            return default
+        self.local.count("shared_hits")
+        _notify_lookup("shared_hit")
+        if self._cacheable_locally(key):
+            self._local_set(key, local_key, value, DEFAULT_TIMEOUT)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.backend_for(key).set(key, value, timeout, version=version)
+        if self._cacheable_locally(key):
+            self._local_set(key, local_key, value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        added = self.backend_for(key).add(key, value, timeout, version=version)
+        if added and self._cacheable_locally(key):
+            self._local_set(key, local_key, value, timeout)
+        elif not added:
+            # Someone else's value wins; read it from the shared tier next time
+            self.local.delete(local_key)
+        return added
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        self.make_and_validate_key(key, version=version)
+        return self.backend_for(key).touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        self.local.delete(local_key)
+        return self.backend_for(key).delete(key, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Counters change in place on the shared tier, atomically where it can
+        local_key = self.make_and_validate_key(key, version=version)
+        self.local.delete(local_key)
+        return self.backend_for(key).incr(key, delta, version=version)
+
+    def has_key(self, key, version=None):
+        local_key = self.make_and_validate_key(key, version=version)
+        if self._cacheable_locally(key) and self.local.get(local_key) is not _MISSING:
+            return True
+        return self.backend_for(key).has_key(key, version=version)
+
+    def clear(self):
+        self.local.clear()
+        for alias in {self.shared_alias, *self.routes.values()}:
+            caches[alias].clear()
+
+    def stats(self):
+        """
+        Returns:
+            dict: Hit and miss counters per tier, plus the local tier's size
+        """
+        with self.local.lock:
+            return dict(
+                self.local.counters,
+                local_entries=len(self.local.entries),
+                local_bytes=self.local.bytes,
+            )
@@ -0,0 +1,101 @@
+# src/recipe_app/db_backend/base.py
+import sys
+import logging
+import psycopg2
+from psycopg2 import extensions
+from django.db.backends.postgresql import base
+from recipe_app.db_utils import retry_with_backoff
+from .pool import get_pool
+
+logger = logging.getLogger(__name__)
+
+# Settings under DATABASES[alias]["POOL"]; the rest configure ConnectionPool
+RETRY_OPTIONS = {"CONNECT_RETRIES": 3, "BACKOFF_FACTOR": 0.5}
+POOL_OPTIONS = {
+    "MAX_SIZE": "max_size",
+    "MAX_WAIT": "max_wait",
+    "MAX_IDLE": "max_idle",
+    "MAX_LIFETIME": "max_lifetime",
+    "CHECK_AFTER": "check_after",
+}
+
+
+def gevent_wait_callback(conn, timeout=None):
+    """Wait for psycopg2 I/O through the gevent hub instead of blocking it."""
+    from gevent.socket import wait_read, wait_write
+
+    while True:
+        state = conn.poll()
+        if state == extensions.POLL_OK:
+            break
+        elif state == extensions.POLL_READ:
+            wait_read(conn.fileno(), timeout=timeout)
+        elif state == extensions.POLL_WRITE:
+            wait_write(conn.fileno(), timeout=timeout)
+        else:
+            raise psycopg2.OperationalError(f"Bad result from poll: {state!r}")
+
+
+def make_psycopg2_green():
+    # Under gunicorn's gevent workers a blocking query would stall every
+    # greenlet in the worker; only switch when gevent has patched sockets
+    monkey = sys.modules.get("gevent.monkey")
+    if monkey is None or not monkey.is_module_patched("socket"):
+        return
+    if extensions.get_wait_callback() is None:
+        extensions.set_wait_callback(gevent_wait_callback)
+        logger.info("Using gevent wait callback for psycopg2")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend that reuses connections from a per-process pool.
+
+    Django still "closes" the connection after every request (CONN_MAX_AGE=0),
+    which here returns it to the pool instead of ending the TLS session.
+    New connections are opened with exponential backoff and jitter.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        make_psycopg2_green()
+
+    @property
+    def pool_settings(self):
+        return self.settings_dict.get("POOL", {})
+
+    @property
+    def pool(self):
+        options = {
+            name: self.pool_settings[key]
+            for key, name in POOL_OPTIONS.items()
+            if key in self.pool_settings
+        }
+        return get_pool(self.alias, options)
+
+    def get_new_connection(self, conn_params):
+        pool = self.pool
+        connect = super().get_new_connection
+        retries = {key: self.pool_settings.get(key, default) for key, default in RETRY_OPTIONS.items()}
+        connection = pool.acquire(lambda: retry_with_backoff(
+            lambda: connect(conn_params),
+            max_retries=retries["CONNECT_RETRIES"],
+            backoff_factor=retries["BACKOFF_FACTOR"],
+            on_retry=pool.count_retry,
+        ))
+        # Reused connections skip the parent's setup of the isolation level
+        isolation_level = self.settings_dict["OPTIONS"].get("isolation_level")
+        self.isolation_level = (
+            base.IsolationLevel(isolation_level) if isolation_level is not None
+            else base.IsolationLevel.READ_COMMITTED
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                self.pool.release(self.connection)
+
+    def close_pool(self):
+        """Close every idle connection in this process's pool."""
+        self.pool.close_all()
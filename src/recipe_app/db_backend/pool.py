@@ -0,0 +1,200 @@
+# src/recipe_app/db_backend/pool.py
+import time
+import logging
+import threading
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+
+logger = logging.getLogger(__name__)
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no connection frees up within the pool's max wait."""
+
+
+class ConnectionPool:
+    """
+    A per-process pool of open psycopg2 connections.
+
+    Connections are handed out most recently used first, so a quiet pool
+    keeps a few warm connections and lets the rest go idle and expire.
+    Connections idle for longer than check_after are checked with SELECT 1
+    before reuse; ones past max_idle or max_lifetime are closed instead.
+    Uses threading primitives, which gevent patches into greenlet-aware ones.
+    """
+
+    def __init__(self, name, max_size=8, max_wait=5.0, max_idle=240,
+                 max_lifetime=1800, check_after=30):
+        self.name = name
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.max_idle = max_idle
+        self.max_lifetime = max_lifetime
+        self.check_after = check_after
+        self._idle = []
+        self._created = {}
+        self._size = 0
+        self._condition = threading.Condition()
+        self.counters = {
+            "checkouts": 0,
+            "opened": 0,
+            "closed": 0,
+            "failed_checks": 0,
+            "connect_retries": 0,
+            "waits": 0,
+            "timeouts": 0,
+        }
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _count(self, name, amount=1):
+        with self._condition:
+            self.counters[name] += amount
+
+    def count_retry(self, error):
+        self._count("connect_retries")
+
+    def _reserve(self):
+        """Take an idle connection or room for a new one, waiting if needed."""
+        started = time.monotonic()
+        deadline = started + self.max_wait
+        waited = False
+        with self._condition:
+            try:
+                while not self._idle and self._size >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.counters["timeouts"] += 1
+                        raise PoolTimeout(
+                            f"No database connection free after {self.max_wait}s "
+                            f"({self.max_size} in use)"
+                        )
+                    waited = True
+                    self._condition.wait(remaining)
+            finally:
+                if waited:
+                    elapsed = time.monotonic() - started
+                    self.counters["waits"] += 1
+                    self.wait_time_total += elapsed
+                    self.wait_time_max = max(self.wait_time_max, elapsed)
+            self.counters["checkouts"] += 1
+            if self._idle:
+                return self._idle.pop()
+            self._size += 1
+            return None
+
+    def _usable(self, conn, returned_at):
+        now = time.monotonic()
+        if conn.closed:
+            return False
+        if now - self._created.get(conn, now) > self.max_lifetime:
+            return False
+        idle = now - returned_at
+        if idle > self.max_idle:
+            return False
+        if idle > self.check_after:
+            try:
+                with conn.cursor() as cursor:
+                    cursor.execute("SELECT 1")
+                if not conn.autocommit:
+                    conn.rollback()
+            except Exception as e:
+                logger.info(f"Discarding dead connection from pool {self.name}: {str(e)}")
+                self._count("failed_checks")
+                return False
+        return True
+
+    def acquire(self, connect):
+        """
+        Check out a healthy connection, opening one with connect if none is idle.
+
+        Raises:
+            PoolTimeout: If the pool stays full for max_wait seconds
+        """
+        while True:
+            idle = self._reserve()
+            if idle is None:
+                try:
+                    conn = connect()
+                except Exception:
+                    self._forget(None)
+                    raise
+                with self._condition:
+                    self._created[conn] = time.monotonic()
+                    self.counters["opened"] += 1
+                return conn
+
+            conn, returned_at = idle
+            if self._usable(conn, returned_at):
+                return conn
+            self.discard(conn)
+
+    def release(self, conn):
+        """Return a connection for reuse, or close it if it can't be reused."""
+        if conn.closed:
+            self._forget(conn)
+            return
+        try:
+            if conn.get_transaction_status() != TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+        except Exception:
+            self.discard(conn)
+            return
+        with self._condition:
+            self._idle.append((conn, time.monotonic()))
+            self._condition.notify()
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+        self._forget(conn)
+
+    def _forget(self, conn):
+        with self._condition:
+            self._size -= 1
+            if conn is not None:
+                self._created.pop(conn, None)
+                self.counters["closed"] += 1
+            self._condition.notify()
+
+    def close_all(self):
+        with self._condition:
+            idle, self._idle = self._idle, []
+        for conn, _ in idle:
+            self.discard(conn)
+
+    def stats(self):
+        with self._condition:
+            return dict(
+                self.counters,
+                max_size=self.max_size,
+                size=self._size,
+                idle=len(self._idle),
+                in_use=self._size - len(self._idle),
+                wait_time_total=round(self.wait_time_total, 3),
+                wait_time_max=round(self.wait_time_max, 3),
+            )
+
+
+def get_pool(alias, options):
+    """Return the process-wide pool for a database alias, creating it on first use."""
+    with _pools_lock:
+        pool = _pools.get(alias)
+        if pool is None:
+            pool = _pools[alias] = ConnectionPool(alias, **options)
+        return pool
+
+
+def pool_stats():
+    """
+    Returns:
+        dict: Database alias -> stats of its pool in this process
+    """
+    with _pools_lock:
+        pools = list(_pools.values())
+    return {pool.name: pool.stats() for pool in pools}
@@ -8,50 +8,75 @@ from psycopg2 import OperationalError, InterfaceError
 
 logger = logging.getLogger(__name__)
 
-def connect_with_retry(db_url, max_retries=5, backoff_factor=0.5):
+def retry_with_backoff(func, max_retries=5, backoff_factor=0.5, on_retry=None):
     """
-    Attempt to connect to PostgreSQL with exponential backoff retry logic.
-    
+    Call func, retrying connection errors with exponential backoff and jitter.
+
     Args:
-        db_url (str): Database connection URL
-        max_retries (int): Maximum number of retry attempts
+        func (callable): Opens and returns a PostgreSQL connection
+        max_retries (int): Maximum number of attempts
         backoff_factor (float): Factor to determine backoff time between retries
-        
+        on_retry (callable): Called with the error before each retry
+
     Returns:
-        connection: PostgreSQL connection object
-        
+        Whatever func returns
+
     Raises:
-        Exception: If connection fails after all retries
+        Exception: The last error if every attempt fails
     """
     retries = 0
     last_exception = None
-    
+
     while retries < max_retries:
         try:
-            # Attempt connection
-            conn = psycopg2.connect(db_url)
-            
-            # Configure connection settings
-            conn.set_session(autocommit=True)
-            
-            logger.info("Successfully connected to Neon PostgreSQL database")
-            return conn
-            
+            return func()
+
         except (OperationalError, InterfaceError) as e:
             last_exception = e
             retries += 1
-            
+            if retries >= max_retries:
+                break
+            if on_retry is not None:
+                on_retry(e)
+
             # Calculate backoff time with jitter
             backoff_time = backoff_factor * (2 ** retries) + random.uniform(0, 0.5)
-            
+
             if "rate limit" in str(e).lower():
                 logger.warning(f"Hit Neon rate limit, retrying in {backoff_time:.2f} seconds (attempt {retries}/{max_retries})")
             else:
                 logger.warning(f"Database connection error: {str(e)}. Retrying in {backoff_time:.2f} seconds (attempt {retries}/{max_retries})")
-                
+
             # Sleep with backoff
             time.sleep(backoff_time)
-    
+
     # If we exit the loop, we've failed to connect
     logger.error(f"Failed to connect to Neon PostgreSQL after {max_retries} attempts. Last error: {str(last_exception)}")
     raise last_exception
+
+def connect_with_retry(db_url, max_retries=5, backoff_factor=0.5):
+    """
+    Attempt to connect to PostgreSQL with exponential backoff retry logic.
+
+    Args:
+        db_url (str): Database connection URL
+        max_retries (int): Maximum number of retry attempts
+        backoff_factor (float): Factor to determine backoff time between retries
+
+    Returns:
+        connection: PostgreSQL connection object
+
+    Raises:
+        Exception: If connection fails after all retries
+    """
+    def connect():
+        # Attempt connection
+        conn = psycopg2.connect(db_url)
+
+        # Configure connection settings
+        conn.set_session(autocommit=True)
+
+        logger.info("Successfully connected to Neon PostgreSQL database")
+        return conn
+
+    return retry_with_backoff(connect, max_retries, backoff_factor)
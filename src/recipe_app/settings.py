@@ -12,6 +12,7 @@ https://docs.djangoproject.com/en/4.2/ref/settings/
 
 import os
 import sys
+import tempfile
 from pathlib import Path
 import dj_database_url
 from dotenv import load_dotenv
@@ -52,10 +53,12 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "recipes.middleware.MetricsMiddleware",  # First, so it times everything below
     "django.middleware.security.SecurityMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
-    "recipes.middleware.RateLimitMiddleware",  # Add our rate limit middleware
     "django.contrib.sessions.middleware.SessionMiddleware",
+    # After sessions: list pages depend on the logged in user's saved recipes
+    "recipes.middleware.RateLimitMiddleware",  # Add our rate limit middleware
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
@@ -63,19 +66,109 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
+# Admission control per route class: requests allowed to run database work
+# at once in each worker, requests allowed to queue behind them, and the
+# longest a queued request waits (seconds) before getting a 503
+ADMISSION_LIMITS = {
+    'list': {'concurrency': 4, 'queue': 16, 'max_wait': 2.0},
+    'detail': {'concurrency': 4, 'queue': 16, 'max_wait': 2.0},
+    'analytics': {'concurrency': 2, 'queue': 8, 'max_wait': 5.0},
+    'save': {'concurrency': 2, 'queue': 8, 'max_wait': 2.0},
+    # Each export streams the whole catalog over one connection
+    'export': {'concurrency': 1, 'queue': 2, 'max_wait': 2.0},
+}
+
+# URL names mapped to the route class whose limit they share
+ADMISSION_ROUTES = {
+    'recipes:list': 'list',
+    'recipes:my_recipes': 'list',
+    'recipes:recipe_detail': 'detail',
+    'recipes:api_recipes': 'list',
+    'recipes:api_recipe': 'detail',
+    'recipes:analytics': 'analytics',
+    'recipes:chart': 'analytics',
+    'recipes:save_recipe': 'save',
+    'recipes:save_recipes': 'save',
+    'recipes:export': 'export',
+}
+
 # Cache settings for rate limit management
+# Each worker keeps a small LRU in front of a cache shared by all workers,
+# which survives worker recycling. Set MEMCACHED_LOCATION to share through
+# memcached, otherwise files under CACHE_DIR are used.
+CACHE_DIR = os.environ.get(
+    'CACHE_DIR', os.path.join(tempfile.gettempdir(), 'recipe-app-cache')
+)
+if os.environ.get('MEMCACHED_LOCATION'):
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache',
+        'LOCATION': os.environ['MEMCACHED_LOCATION'],
+    }
+    VERSIONS_CACHE = dict(SHARED_CACHE)
+    CONTROL_CACHE = dict(SHARED_CACHE)
+else:
+    SHARED_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': CACHE_DIR,
+        'OPTIONS': {'MAX_ENTRIES': 5000},
+    }
+    # Cache versions decide what every page shows, so they live where web
+    # and job worker machines all see them and page data can't cull them:
+    # a table created by the recipes migrations
+    VERSIONS_CACHE = {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'recipe_cache_versions',
+        'OPTIONS': {'MAX_ENTRIES': 10000000},
+    }
+    # Breaker state and metrics totals: a few keys per machine, which must
+    # keep working while the database is down
+    CONTROL_CACHE = {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.path.join(CACHE_DIR, 'control'),
+    }
+# Entries written with the default timeout still expire; keys meant to
+# live forever pass None themselves
+SHARED_CACHE['TIMEOUT'] = 60 * 60 * 24
+VERSIONS_CACHE['TIMEOUT'] = None
+CONTROL_CACHE['TIMEOUT'] = None
+
 CACHES = {
     'default': {
-        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
-        'LOCATION': 'unique-snowflake',
-    }
+        'BACKEND': 'recipe_app.cache_backends.TwoTierCache',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'ROUTES': {
+                'version_': 'versions',
+                'circuit_': 'control',
+                'metrics_': 'control',
+            },
+            'MAX_ENTRIES': 500,
+            'MAX_BYTES': 32 * 1024 * 1024,
+            'LOCAL_TIMEOUT': 30,
+            # Versions are read on every page, so each worker reuses them
+            # for a second rather than querying their store every time
+            'LOCAL_TIMEOUTS': {'version_': 1},
+            # Breaker state, metrics and sessions must agree across workers
+            'LOCAL_BYPASS_PREFIXES': [
+                'circuit_', 'metrics_', 'django.contrib.sessions',
+            ],
+        },
+    },
+    'shared': SHARED_CACHE,
+    'versions': VERSIONS_CACHE,
+    'control': CONTROL_CACHE,
 }
 
+# Sessions are read on every list page to key it by the user's saved
+# recipes, so serve them from the cache and only write through to the database
+SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+
 ROOT_URLCONF = "recipe_app.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # DjangoTemplates, timing renders for the metrics middleware
+        "BACKEND": "recipes.metrics.TimedDjangoTemplates",
         "DIRS": [BASE_DIR / "templates"],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -84,6 +177,7 @@ TEMPLATES = [
                 "django.template.context_processors.request",
                 "django.contrib.auth.context_processors.auth",
                 "django.contrib.messages.context_processors.messages",
+                "recipes.context_processors.saved_recipes",
             ],
         },
     },
@@ -91,24 +185,38 @@ TEMPLATES = [
 
 WSGI_APPLICATION = "recipe_app.wsgi.application"
 
-# Database Configuration - Only using Neon PostgreSQL
+# Database Configuration - Neon PostgreSQL in production, SQLite for local and test runs
 if not os.environ.get('DATABASE_URL'):
     # If DATABASE_URL is not set, raise an error
     raise Exception("DATABASE_URL environment variable is required for connection to Neon PostgreSQL")
 
+USE_SQLITE = os.environ.get('DATABASE_URL').startswith('sqlite')
+
 # Configure PostgreSQL connection with connection pooling and retry logic
 db_config = dj_database_url.config(
     default=os.environ.get('DATABASE_URL'),
-    conn_max_age=0,  # Close connections after each request to avoid rate limits
-    ssl_require=True,
+    conn_max_age=0,  # Hand connections back after each request; the pool keeps them open
+    ssl_require=not USE_SQLITE,
 )
 
 # Add options for minimal connections and fast timeouts
-db_config['OPTIONS'] = {
-    'connect_timeout': 10,  # 10 second connection timeout
-    'options': '-c statement_timeout=15000',  # 15 second query timeout
-    'sslmode': 'require',
-}
+if not USE_SQLITE:
+    db_config['OPTIONS'] = {
+        'connect_timeout': 10,  # 10 second connection timeout
+        'options': '-c statement_timeout=15000',  # 15 second query timeout
+        'sslmode': 'require',
+    }
+    # Reuse connections from a per-worker pool instead of reconnecting per request
+    db_config['ENGINE'] = 'recipe_app.db_backend'
+    db_config['POOL'] = {
+        'MAX_SIZE': int(os.environ.get('DB_POOL_SIZE', '8')),
+        'MAX_WAIT': float(os.environ.get('DB_POOL_MAX_WAIT', '5')),
+        'MAX_IDLE': 240,  # Neon suspends idle computes after 5 minutes
+        'MAX_LIFETIME': 1800,
+        'CHECK_AFTER': 30,  # Idle seconds before a connection is pinged on reuse
+        'CONNECT_RETRIES': 3,
+        'BACKOFF_FACTOR': 0.5,
+    }
 
 # Apply the database configuration
 DATABASES = {
@@ -125,7 +233,7 @@ STATICFILES_DIRS = [
 
 
 MEDIA_URL = "/media/"
-MEDIA_ROOT = BASE_DIR / "src" "media"
+MEDIA_ROOT = BASE_DIR / "media"
 
 CLOUDINARY_STORAGE = {
     'CLOUD_NAME': os.environ.get('CLOUDINARY_CLOUD_NAME'),
@@ -133,7 +241,50 @@ CLOUDINARY_STORAGE = {
     'API_SECRET': os.environ.get('CLOUDINARY_API_SECRET'),
 }
 
-DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+# Uploads and their thumbnails go to Cloudinary when it is configured,
+# otherwise to local files under MEDIA_ROOT
+if CLOUDINARY_STORAGE['CLOUD_NAME']:
+    DEFAULT_FILE_STORAGE = 'cloudinary_storage.storage.MediaCloudinaryStorage'
+else:
+    DEFAULT_FILE_STORAGE = 'django.core.files.storage.FileSystemStorage'
+
+# Analytics chart resolution; charts are cached per DPI
+CHART_DPI = int(os.environ.get('CHART_DPI', '300'))
+# Processes in each web worker's chart render pool, 0 renders in the request
+CHART_RENDER_PROCESSES = int(os.environ.get('CHART_RENDER_PROCESSES', '2'))
+# Seconds a request waits for a render before answering 202 to be polled
+CHART_RENDER_WAIT = float(os.environ.get('CHART_RENDER_WAIT', '5'))
+
+# Database circuit breaker: after FAILURE_THRESHOLD connection errors within
+# FAILURE_WINDOW seconds, views serve cached snapshots for RESET_TIMEOUT
+# seconds before probing the database again
+CIRCUIT_BREAKER = {
+    'FAILURE_THRESHOLD': int(os.environ.get('CIRCUIT_FAILURE_THRESHOLD', '5')),
+    'FAILURE_WINDOW': int(os.environ.get('CIRCUIT_FAILURE_WINDOW', '30')),
+    'RESET_TIMEOUT': int(os.environ.get('CIRCUIT_RESET_TIMEOUT', '30')),
+}
+
+# Background jobs run by "manage.py run_jobs". Failed jobs are retried up to
+# MAX_ATTEMPTS times, RETRY_DELAY seconds later doubling per attempt up to
+# MAX_RETRY_DELAY. A job still running after LEASE_SECONDS is assumed lost
+# with its worker and run again. Idle workers poll every POLL_INTERVAL
+# seconds, and finished jobs are kept RETENTION_DAYS for the status endpoint.
+JOBS = {
+    'MAX_ATTEMPTS': int(os.environ.get('JOB_MAX_ATTEMPTS', '5')),
+    'RETRY_DELAY': float(os.environ.get('JOB_RETRY_DELAY', '10')),
+    'MAX_RETRY_DELAY': float(os.environ.get('JOB_MAX_RETRY_DELAY', '3600')),
+    'LEASE_SECONDS': int(os.environ.get('JOB_LEASE_SECONDS', '600')),
+    'POLL_INTERVAL': float(os.environ.get('JOB_POLL_INTERVAL', '2')),
+    'RETENTION_DAYS': int(os.environ.get('JOB_RETENTION_DAYS', '7')),
+}
+
+# Seconds between merges of a worker's metrics into the shared totals served
+# at /metrics; set METRICS_TOKEN to require "Authorization: Bearer <token>"
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', '10'))
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+
+# Milliseconds a fresh worker may spend importing, see check_import_time
+IMPORT_TIME_BUDGET_MS = float(os.environ.get('IMPORT_TIME_BUDGET_MS', '1500'))
 
 # Default primary key field type
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
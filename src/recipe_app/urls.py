@@ -5,7 +5,10 @@ from django.conf import settings
 from django.conf.urls.static import static
 from django.shortcuts import redirect
 from django.http import HttpResponse, JsonResponse
+from django.utils.crypto import constant_time_compare
 from .views import login_view, logout_view, success_view
+from .db_backend.pool import pool_stats
+from recipes.metrics import collect
 
 # Health check views
 def health_check(request):
@@ -20,12 +23,23 @@ def db_check(request):
             cursor.execute("SELECT 1")
             one = cursor.fetchone()[0]
             if one == 1:
-                return JsonResponse({"status": "Database connection successful"})
+                return JsonResponse({
+                    "status": "Database connection successful",
+                    "pools": pool_stats(),
+                })
     except Exception as e:
         return JsonResponse({"status": "Database error", "error": str(e)}, status=500)
     
     return JsonResponse({"status": "Unknown database error"}, status=500)
 
+def metrics_view(request):
+    # Prometheus scrape endpoint, totals across all workers
+    if settings.METRICS_TOKEN and not constant_time_compare(
+        request.headers.get("Authorization", ""), f"Bearer {settings.METRICS_TOKEN}"
+    ):
+        return HttpResponse("Unauthorized", status=401)
+    return HttpResponse(collect(), content_type="text/plain; version=0.0.4; charset=utf-8")
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("", include("recipes.urls")),
@@ -35,6 +49,7 @@ urlpatterns = [
     # Health check endpoints
     path("health/", health_check, name="health_check"),
     path("db-health/", db_check, name="db_health_check"),
+    path("metrics", metrics_view, name="metrics"),
 ]
 
 # Add static files urlpatterns
@@ -14,3 +14,12 @@ from django.core.wsgi import get_wsgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "recipe_app.settings")
 
 application = get_wsgi_application()
+
+if os.environ.get("PRELOAD_APP") == "1":
+    # gunicorn.conf.py loads the app in the master in this mode; warming the
+    # URLconf and chart stack there means forked workers start with them
+    from django.urls import get_resolver
+    from recipes.rendering import preload
+
+    get_resolver().url_patterns
+    preload()
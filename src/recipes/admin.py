@@ -1,4 +1,12 @@
 from django.contrib import admin
-from .models import Recipe
+from .models import Recipe, Ingredient, Job
 
 admin.site.register(Recipe)
+admin.site.register(Ingredient)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ["name", "status", "attempts", "run_at", "finished_at"]
+    list_filter = ["status", "name"]
+    readonly_fields = ["attempts", "locked_by", "locked_until", "result", "last_error", "finished_at"]
@@ -0,0 +1,99 @@
+# src/recipes/admission.py
+import time
+import logging
+import threading
+from django.conf import settings
+from django.urls import Resolver404, resolve
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_limiters = {}
+
+
+class ConcurrencyLimiter:
+    """
+    Bound how many requests of one route class run database work at once.
+
+    Requests over the limit queue for a free slot, first come first served,
+    for at most max_wait seconds. Once max_queue requests are already waiting,
+    newcomers are refused straight away rather than piling up behind them.
+    Works with gevent, which patches the threading primitives used here.
+    """
+
+    def __init__(self, name, concurrency, queue, max_wait):
+        self.name = name
+        self.concurrency = concurrency
+        self.max_queue = queue
+        self.max_wait = max_wait
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.shed = 0
+        self._condition = threading.Condition()
+
+    def acquire(self):
+        """
+        Take a slot, waiting up to max_wait seconds for one.
+
+        Returns:
+            bool: True if admitted, False if the request should be shed
+        """
+        with self._condition:
+            if self.active < self.concurrency and not self.waiting:
+                self.active += 1
+                self.admitted += 1
+                return True
+            if self.waiting >= self.max_queue:
+                self.shed += 1
+                return False
+
+            self.waiting += 1
+            deadline = time.monotonic() + self.max_wait
+            try:
+                while self.active >= self.concurrency:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.shed += 1
+                        return False
+                    self._condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.active += 1
+            self.admitted += 1
+            return True
+
+    def release(self):
+        with self._condition:
+            self.active -= 1
+            self._condition.notify()
+
+    def stats(self):
+        return {
+            "active": self.active,
+            "waiting": self.waiting,
+            "admitted": self.admitted,
+            "shed": self.shed,
+        }
+
+
+def limiter_for(route_class):
+    """Return the process-wide limiter for a route class, or None if it is unlimited."""
+    config = settings.ADMISSION_LIMITS.get(route_class)
+    if config is None:
+        return None
+    key = (route_class, tuple(sorted(config.items())))
+    with _lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = ConcurrencyLimiter(route_class, **config)
+        return limiter
+
+
+def route_class(request):
+    """Return the ADMISSION_ROUTES class of the view a request resolves to."""
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None
+    return settings.ADMISSION_ROUTES.get(match.view_name)
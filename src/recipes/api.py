@@ -0,0 +1,263 @@
+# src/recipes/api.py
+import hashlib
+import logging
+from urllib.parse import urlencode
+from django.http import JsonResponse
+from django.utils import timezone
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import require_GET
+from .caching import CATALOG, VERSIONED_TIMEOUT, get_or_compute, jittered, recipe_namespace, versioned_key
+from .circuit import DATABASE_ERRORS, CircuitOpen, database, fetch_and_remember, last_known_good
+from .conditional import (
+    catalog_etag, catalog_last_modified, conditional_page, detail_last_modified, recipe_etag
+)
+from .forms import RecipesSearchForm
+from .models import Recipe
+from .pagination import InvalidCursor, KeysetPaginator
+from .search import apply_search_filters, search_sort_key
+
+logger = logging.getLogger(__name__)
+
+# Fields clients may pick with ?fields=, and the defaults of each endpoint
+FIELDS = ("id", "name", "ingredients", "cooking_time", "difficulty", "pic",
+          "pic_width", "pic_height", "updated_at")
+LIST_FIELDS = ("id", "name", "cooking_time", "difficulty", "pic")
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# No spaces after separators; payloads are for programs
+COMPACT = {"separators": (",", ":")}
+
+
+class BadRequest(Exception):
+    """Raised for query parameters the API can't serve."""
+
+
+def parse_fields(request, default):
+    """
+    Return the fields named by ?fields=, in the order given, or default.
+
+    Raises:
+        BadRequest: If a name isn't one of FIELDS
+    """
+    value = request.GET.get("fields")
+    if value is None:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in value.split(",") if name.strip()))
+    unknown = [name for name in fields if name not in FIELDS]
+    if unknown or not fields:
+        raise BadRequest(
+            f"Unknown fields: {', '.join(unknown) or repr(value)}; choose from {', '.join(FIELDS)}"
+        )
+    return fields
+
+
+def parse_limit(request):
+    value = request.GET.get("limit")
+    if value is None:
+        return DEFAULT_PAGE_SIZE
+    try:
+        limit = int(value)
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise BadRequest(f"limit must be a number from 1 to {MAX_PAGE_SIZE}")
+    return limit
+
+
+def serialize(row, fields):
+    """
+    Build the JSON object of a values() row, holding only the requested fields.
+
+    Works on plain dicts, so no model instances are built.
+    """
+    data = {name: row[name] for name in fields}
+    if data.get("pic"):
+        data["pic"] = Recipe._meta.get_field("pic").storage.url(data["pic"])
+    return data
+
+
+def fetch_page(cleaned_data, sort_key, fields, limit, cursor):
+    """
+    Read one page of recipes as serialized rows with the cursors around it.
+
+    Only the requested columns, the id and the sort key are selected.
+    """
+    queryset = Recipe.objects.all()
+    if cleaned_data:
+        # All filters run in the database as a single indexed query
+        queryset = apply_search_filters(queryset, cleaned_data)
+    columns = tuple(dict.fromkeys(("id", sort_key.lstrip("-")) + fields))
+    page = KeysetPaginator(queryset.values(*columns), sort_key, limit).page(cursor)
+    return {
+        "results": [serialize(row, fields) for row in page],
+        "next": page.next_cursor,
+        "previous": page.prev_cursor,
+    }
+
+
+def fetch_recipe(pk):
+    row = Recipe.objects.filter(pk=pk).values(*FIELDS).first()
+    return None if row is None else serialize(row, FIELDS)
+
+
+def cached_recipe(pk):
+    """
+    Return a recipe's serialized row, read once per version of the recipe.
+
+    Raises:
+        CircuitOpen: If it isn't cached and the breaker is open
+    """
+    cache_key = f"api_recipe_{pk}"
+    return get_or_compute(
+        versioned_key(recipe_namespace(pk), cache_key),
+        lambda: fetch_and_remember(cache_key, lambda: fetch_recipe(pk)),
+        jittered(VERSIONED_TIMEOUT),
+    )
+
+
+def recipe_last_modified(request, pk, *args, **kwargs):
+    # The payload is the row itself, so its updated_at is when it last
+    # changed. Reading it fills the cache the view then serves from, so
+    # revalidations still cost no queries
+    try:
+        recipe = cached_recipe(pk)
+    except (CircuitOpen,) + DATABASE_ERRORS:
+        recipe = None
+    if recipe is None:
+        return detail_last_modified(request, pk)
+    updated_at = recipe["updated_at"]
+    # condition() reads naive datetimes as UTC, but they're in TIME_ZONE
+    return updated_at if timezone.is_aware(updated_at) else timezone.make_aware(updated_at)
+
+
+def page_url(request, cursor):
+    if cursor is None:
+        return None
+    params = [(name, value) for name, value in request.GET.items() if name != "cursor"]
+    params.append(("cursor", cursor))
+    return f"{request.path}?{urlencode(params)}"
+
+
+def error_response(message, status=400, **extra):
+    return JsonResponse({"error": message, **extra}, status=status, json_dumps_params=COMPACT)
+
+
+def unavailable_response():
+    response = error_response("Database unavailable", status=503)
+    response["Retry-After"] = str(database.reset_timeout)
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+def stale_response(data):
+    # Built from a snapshot while the database is down; conditional_page
+    # drops the validators of no-store responses
+    response = JsonResponse({**data, "stale": True}, json_dumps_params=COMPACT)
+    patch_cache_control(response, private=True, no_store=True)
+    return response
+
+
+@require_GET
+@conditional_page(catalog_etag, catalog_last_modified, public=True)
+def recipe_list(request):
+    """
+    List or search recipes as JSON, e.g. /api/recipes/?recipe_ingredients=cumin&fields=id,name
+
+    Takes the search form's fields as query parameters, plus fields, limit
+    and the cursor from a previous page's next or previous link. Responses
+    only depend on the URL and the catalog version, so shared caches can
+    keep them and revalidate with the ETag.
+    """
+    try:
+        fields = parse_fields(request, LIST_FIELDS)
+        limit = parse_limit(request)
+    except BadRequest as e:
+        return error_response(str(e))
+
+    search = {
+        name: value for name, value in request.GET.items()
+        if name in RecipesSearchForm.base_fields
+    }
+    cleaned_data = {}
+    if search:
+        request.metrics_route = "recipes:api_search"
+        form = RecipesSearchForm(search)
+        # The page's form posts every field; API callers send only the
+        # filters they want
+        for field in form.fields.values():
+            field.required = False
+        if not form.is_valid():
+            return error_response("Invalid search", errors=form.errors)
+        cleaned_data = form.cleaned_data
+    sort_key = search_sort_key(cleaned_data, "name")
+
+    cursor = request.GET.get("cursor") or None
+    if cursor:
+        try:
+            # Checked before any query; also refuses cursors of another sort order
+            KeysetPaginator(None, sort_key).decode(cursor)
+        except InvalidCursor:
+            return error_response("Invalid cursor")
+
+    params = sorted(search.items()) + [
+        ("fields", ",".join(fields)), ("limit", limit), ("cursor", cursor or "")
+    ]
+    cache_key = f"api_recipes_{hashlib.md5(urlencode(params).encode()).hexdigest()}"
+    # Only the default first page keeps a snapshot for outages; other pages
+    # are as many as clients can make up
+    default_page = (not search and cursor is None and fields == LIST_FIELDS
+                    and limit == DEFAULT_PAGE_SIZE)
+    try:
+        page = get_or_compute(
+            versioned_key(CATALOG, cache_key),
+            lambda: fetch_and_remember(
+                cache_key, lambda: fetch_page(cleaned_data, sort_key, fields, limit, cursor),
+                remember=default_page,
+            ),
+            jittered(VERSIONED_TIMEOUT),
+        )
+        stale = False
+    except (CircuitOpen,) + DATABASE_ERRORS as e:
+        logger.error(f"Database unavailable in the recipe API: {str(e)}")
+        page = last_known_good(cache_key)
+        if page is None:
+            return unavailable_response()
+        stale = True
+
+    data = {
+        "results": page["results"],
+        "next": page_url(request, page["next"]),
+        "previous": page_url(request, page["previous"]),
+    }
+    if stale:
+        return stale_response(data)
+    return JsonResponse(data, json_dumps_params=COMPACT)
+
+
+@require_GET
+@conditional_page(recipe_etag, recipe_last_modified, public=True)
+def recipe_detail(request, pk):
+    """One recipe as JSON, e.g. /api/recipes/12/?fields=name,ingredients"""
+    try:
+        fields = parse_fields(request, FIELDS)
+    except BadRequest as e:
+        return error_response(str(e))
+
+    stale = False
+    try:
+        recipe = cached_recipe(pk)
+    except (CircuitOpen,) + DATABASE_ERRORS as e:
+        logger.error(f"Database unavailable in the recipe API: {str(e)}")
+        recipe = last_known_good(f"api_recipe_{pk}")
+        if recipe is None:
+            return unavailable_response()
+        stale = True
+
+    if recipe is None:
+        return error_response("Recipe not found", status=404)
+    data = {name: recipe[name] for name in fields}
+    if stale:
+        return stale_response(data)
+    return JsonResponse(data, json_dumps_params=COMPACT)
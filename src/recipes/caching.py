@@ -0,0 +1,212 @@
+# src/recipes/caching.py
+import math
+import time
+import random
+import logging
+import threading
+from django.core.cache import cache
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import DatabaseError, transaction
+
+logger = logging.getLogger(__name__)
+
+# Namespace covering every recipe and anything derived from the catalog
+CATALOG = "catalog"
+
+VERSION_KEY = "version_{}"
+
+# Versioned entries can't go stale, so they live until evicted for space or
+# for this long, whichever comes first
+VERSIONED_TIMEOUT = 60 * 60 * 6
+
+# Spread of expiry times, as a fraction of the timeout
+TIMEOUT_JITTER = 0.2
+
+# How long get_or_compute keeps serving an expired value while it's refreshed
+STALE_TIMEOUT = 60 * 5
+
+# Longest a computation may hold its key's lock, and longest another request
+# waits for it before computing the value itself
+COMPUTE_LOCK_TIMEOUT = 30
+COMPUTE_WAIT = 5
+
+# Larger values make early refreshes more likely, see _should_refresh
+XFETCH_BETA = 1.0
+
+_MISSING = object()
+
+# Computations running in this process, so concurrent callers wait on an
+# event instead of polling the cache
+_flights = {}
+_flights_lock = threading.Lock()
+
+
+def recipe_namespace(pk):
+    """Namespace covering one recipe's detail page."""
+    return f"recipe_{pk}"
+
+
+def _now_ms():
+    return int(time.time() * 1000)
+
+
+def get_version(namespace):
+    """
+    Return the current version of a cache namespace.
+
+    Versions are millisecond timestamps, so a namespace whose counter was
+    evicted restarts above every version handed out before it, and entries
+    cached under old versions can never be served again.
+    """
+    key = VERSION_KEY.format(namespace)
+    try:
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, _now_ms(), None)
+            version = cache.get(key)
+    except DatabaseError as e:
+        # Versions are kept in the database unless memcached is set up.
+        # While it's unreachable every lookup misses, so views fall back
+        # to their snapshots instead of failing here
+        logger.warning(f"Could not read cache version {namespace}: {str(e)}")
+        return _now_ms()
+    return version
+
+
+def versions_are_local():
+    """
+    Return True if cache versions live where only this machine sees them.
+
+    Bumps made elsewhere, e.g. by a job worker on another machine, then
+    never reach this machine's cached pages.
+    """
+    backend = cache.backend_for(VERSION_KEY.format(CATALOG)) if hasattr(cache, "backend_for") else cache
+    return isinstance(backend, (FileBasedCache, LocMemCache))
+
+
+def bump_version(namespace):
+    """Move a namespace to a new version, orphaning everything cached under the old one."""
+    key = VERSION_KEY.format(namespace)
+    version = max(_now_ms(), (cache.get(key) or 0) + 1)
+    cache.set(key, version, None)
+    logger.debug(f"Bumped cache namespace {namespace} to {version}")
+    return version
+
+
+def bump_on_commit(namespace):
+    """
+    Bump a namespace once the current transaction commits.
+
+    Bumping earlier would let a concurrent request cache pre-commit data
+    under the new version.
+    """
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+def versioned_key(namespace, key):
+    """
+    Return key qualified by its namespace's current version.
+
+    Bumping the namespace moves readers to fresh keys at once; entries under
+    old versions are never read again and age out on their own.
+    """
+    return f"{key}_v{get_version(namespace)}"
+
+
+def jittered(timeout):
+    """Randomize a timeout so entries written together don't all expire together."""
+    return int(timeout * random.uniform(1 - TIMEOUT_JITTER, 1 + TIMEOUT_JITTER))
+
+
+def _should_refresh(expires_at, cost, beta):
+    # Probabilistic early expiry ("XFetch"): each read may refresh a little
+    # before expiry, more likely the closer expiry is and the more expensive
+    # the value was to compute, so refreshes rarely coincide
+    return time.time() - cost * beta * math.log(1 - random.random()) >= expires_at
+
+
+def _wait_for(key):
+    deadline = time.monotonic() + COMPUTE_WAIT
+    while time.monotonic() < deadline:
+        time.sleep(0.05)
+        entry = cache.get(key)
+        if entry is not None:
+            return entry[0]
+    return _MISSING
+
+
+def _compute(key, compute, timeout, block):
+    with _flights_lock:
+        flight = _flights.get(key)
+        leader = flight is None
+        if leader:
+            flight = _flights[key] = threading.Event()
+
+    if not leader:
+        if not block:
+            return _MISSING
+        flight.wait(COMPUTE_WAIT)
+        entry = cache.get(key)
+        return entry[0] if entry is not None else compute()
+
+    try:
+        # The cache-wide lock extends single flight to other workers
+        lock_key = f"compute_lock_{key}"
+        locked = cache.add(lock_key, 1, COMPUTE_LOCK_TIMEOUT)
+        if not locked:
+            if not block:
+                return _MISSING
+            value = _wait_for(key)
+            if value is not _MISSING:
+                return value
+            logger.warning(f"Gave up waiting for {key}, computing it here")
+        try:
+            started = time.monotonic()
+            value = compute()
+            cost = time.monotonic() - started
+            cache.set(key, (value, time.time() + timeout, cost), timeout + STALE_TIMEOUT)
+            return value
+        finally:
+            if locked:
+                cache.delete(lock_key)
+    finally:
+        with _flights_lock:
+            _flights.pop(key, None)
+        flight.set()
+
+
+def get_or_compute(key, compute, timeout, beta=XFETCH_BETA):
+    """
+    Read a cached value, computing it once however many requests miss together.
+
+    On a miss one caller computes the value while concurrent callers, in this
+    process or others, wait for its result. Once the value is due for refresh,
+    one caller recomputes it while the others keep getting the old value for
+    up to STALE_TIMEOUT more seconds. Refreshes start a little early at random
+    so that a popular key doesn't expire under load.
+
+    Args:
+        key (str): Cache key
+        compute (callable): Returns the value; exceptions propagate uncached
+        timeout (int): Seconds the value counts as fresh
+        beta (float): Eagerness of early refreshes, 0 to disable them
+
+    Returns:
+        The cached or freshly computed value
+    """
+    entry = cache.get(key)
+    if entry is None:
+        return _compute(key, compute, timeout, block=True)
+
+    value, expires_at, cost = entry
+    if _should_refresh(expires_at, cost, beta):
+        try:
+            refreshed = _compute(key, compute, timeout, block=False)
+        except Exception as e:
+            # The old value is still within its stale window
+            logger.warning(f"Refreshing {key} failed, serving the cached value: {str(e)}")
+            return value
+        if refreshed is not _MISSING:
+            return refreshed
+    return value
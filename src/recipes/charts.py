@@ -0,0 +1,64 @@
+# src/recipes/charts.py
+import logging
+from concurrent.futures import TimeoutError
+from django.conf import settings
+from django.core.cache import cache
+from . import stats
+from . import rendering
+from .caching import CATALOG, get_version, jittered
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPES = {"png": "image/png", "svg": "image/svg+xml"}
+
+# Keys carry the dataset version, so entries only need evicting for space
+CHART_CACHE_TIMEOUT = 60 * 60 * 24
+
+
+class RenderPending(Exception):
+    """Raised when a chart is still being rendered after the wait timeout."""
+
+
+def chart_cache_key(analysis_type, chart_type, fmt, version):
+    return f"chart_{analysis_type}_{chart_type}_{fmt}_{settings.CHART_DPI}_{version}"
+
+
+def get_chart(analysis_type, chart_type, fmt, version=None):
+    """
+    Return a rendered chart for the given dataset version, rendering at most once.
+
+    Rendering runs in the render pool. The caller waits up to
+    CHART_RENDER_WAIT seconds for it; the render carries on and fills the
+    cache if the wait runs out, so polling again picks the result up.
+
+    Args:
+        analysis_type (str): One of the RecipeAnalyticsForm analysis choices
+        chart_type (str): "bar", "pie" or "line"
+        fmt (str): "png" or "svg"
+        version (int): Catalog version, the current one if omitted
+
+    Returns:
+        bytes: Image data, or None if there is nothing to chart
+
+    Raises:
+        RenderPending: If the render didn't finish within the wait
+    """
+    if version is None:
+        version = get_version(CATALOG)
+    key = chart_cache_key(analysis_type, chart_type, fmt, version)
+    image = cache.get(key)
+    if image is not None:
+        logger.debug(f"Using cached chart {key}")
+        return image
+
+    data = stats.get_series(analysis_type)
+    if not data:
+        return None
+    future = rendering.submit(
+        key, chart_type, data, analysis_type, fmt, settings.CHART_DPI,
+        on_done=lambda image: cache.set(key, image, jittered(CHART_CACHE_TIMEOUT)),
+    )
+    try:
+        return future.result(timeout=settings.CHART_RENDER_WAIT)
+    except TimeoutError:
+        raise RenderPending(key)
@@ -0,0 +1,142 @@
+# src/recipes/circuit.py
+import time
+import logging
+from django.conf import settings
+from django.core.cache import cache
+from django.db import InterfaceError, OperationalError
+
+logger = logging.getLogger(__name__)
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half-open"
+
+# Errors meaning the database is unreachable or overloaded, as opposed to
+# bugs such as bad SQL, which shouldn't trip the breaker
+DATABASE_ERRORS = (OperationalError, InterfaceError)
+
+# Last known good values are kept this long for serving during outages
+SNAPSHOT_TIMEOUT = 60 * 60 * 24 * 7
+
+
+class CircuitOpen(Exception):
+    """Raised instead of calling the database while the breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Stop calling a failing dependency for a while, then probe it.
+
+    After failure_threshold failures within failure_window seconds the
+    breaker opens and calls fail fast with CircuitOpen for reset_timeout
+    seconds. Then it is half-open: a single call is let through as a probe.
+    Success closes the breaker, failure opens it for another reset_timeout.
+
+    State lives in the shared cache, so all workers trip and recover together
+    and recycled workers don't start out hammering a database that is down.
+    """
+
+    def __init__(self, name, failure_threshold=5, failure_window=30, reset_timeout=30):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.failure_window = failure_window
+        self.reset_timeout = reset_timeout
+        self.failures_key = f"circuit_{name}_failures"
+        self.open_until_key = f"circuit_{name}_open_until"
+        self.probe_key = f"circuit_{name}_probe"
+
+    def state(self):
+        open_until = cache.get(self.open_until_key)
+        if open_until is None:
+            return CLOSED
+        return OPEN if time.time() < open_until else HALF_OPEN
+
+    def allow(self):
+        """Return True if a call may go ahead now."""
+        state = self.state()
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN:
+            # Only the first caller after the cool-down gets to probe
+            return cache.add(self.probe_key, 1, self.reset_timeout)
+        return False
+
+    def record_success(self):
+        if self.state() != CLOSED:
+            logger.info(f"Circuit {self.name} closed")
+            cache.delete_many([self.open_until_key, self.probe_key, self.failures_key])
+
+    def record_failure(self):
+        if self.state() != CLOSED:
+            # The half-open probe failed
+            self.trip()
+            return
+        cache.add(self.failures_key, 0, self.failure_window)
+        try:
+            failures = cache.incr(self.failures_key)
+        except ValueError:
+            # The counter expired in between
+            failures = 1
+        if failures >= self.failure_threshold:
+            self.trip()
+
+    def trip(self):
+        logger.warning(f"Circuit {self.name} open for {self.reset_timeout}s")
+        cache.set(self.open_until_key, time.time() + self.reset_timeout, None)
+        cache.delete_many([self.probe_key, self.failures_key])
+
+    def call(self, func):
+        """
+        Call func through the breaker.
+
+        Raises:
+            CircuitOpen: If the breaker is open
+        """
+        if not self.allow():
+            raise CircuitOpen(f"Circuit {self.name} is open")
+        try:
+            result = func()
+        except DATABASE_ERRORS:
+            self.record_failure()
+            raise
+        self.record_success()
+        return result
+
+
+database = CircuitBreaker("database", **{
+    name.lower(): value for name, value in settings.CIRCUIT_BREAKER.items()
+})
+
+
+def snapshot_key(key):
+    return f"snapshot_{key}"
+
+
+def fetch_and_remember(key, compute, remember=True):
+    """
+    Run a database read through the breaker, keeping the result as a snapshot.
+
+    Snapshots outlive every cached version, so only remember values from a
+    bounded set of keys, such as default pages and detail pages; keys built
+    from arbitrary client input would fill the cache with them.
+
+    Args:
+        key (str): Unversioned name of the value, shared by every version
+        compute (callable): Reads the value from the database
+        remember (bool): Keep the result as key's snapshot
+
+    Returns:
+        Whatever compute returns
+
+    Raises:
+        CircuitOpen: If the breaker is open
+    """
+    value = database.call(compute)
+    if remember:
+        cache.set(snapshot_key(key), value, SNAPSHOT_TIMEOUT)
+    return value
+
+
+def last_known_good(key):
+    """Return the last value fetch_and_remember got for key, or None."""
+    return cache.get(snapshot_key(key))
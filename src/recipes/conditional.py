@@ -0,0 +1,179 @@
+# src/recipes/conditional.py
+import hashlib
+import logging
+from datetime import datetime, timezone
+from functools import wraps
+from django.conf import settings
+from django.urls import Resolver404, resolve
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import condition
+from .caching import CATALOG, get_version, recipe_namespace
+from .saved import saved_version
+
+logger = logging.getLogger(__name__)
+
+# Routes whose pages are validated from cache versions alone
+LIST_ROUTE = "recipes:list"
+DETAIL_ROUTE = "recipes:recipe_detail"
+
+
+def _cookie_fingerprint(request):
+    # Pages show the login state and embed the CSRF token, so the cookies
+    # behind them are part of the representation. Hashed, never echoed.
+    return "|".join(
+        request.COOKIES.get(name, "")
+        for name in (settings.SESSION_COOKIE_NAME, settings.CSRF_COOKIE_NAME)
+    )
+
+
+def _etag(request, *versions):
+    parts = [request.get_full_path(), _cookie_fingerprint(request), *map(str, versions)]
+    return quote_etag(hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32])
+
+
+def _as_datetime(version):
+    # Versions are millisecond timestamps of the last change
+    return datetime.fromtimestamp(version / 1000, tz=timezone.utc)
+
+
+def list_etag(request, *args, **kwargs):
+    # Cards are marked with the user's saved state
+    return _etag(request, get_version(CATALOG), saved_version(request))
+
+
+def list_last_modified(request, *args, **kwargs):
+    # Versions are millisecond timestamps, so the later one is the last change
+    return _as_datetime(max(get_version(CATALOG), saved_version(request)))
+
+
+def detail_etag(request, pk, *args, **kwargs):
+    return _etag(request, get_version(recipe_namespace(pk)))
+
+
+def detail_last_modified(request, pk, *args, **kwargs):
+    # Not updated_at: the page also shows saved state, which bumps the
+    # recipe's version without touching its row
+    return _as_datetime(get_version(recipe_namespace(pk)))
+
+
+def _public_etag(request, *versions):
+    # For responses holding nothing per user, such as exports and the JSON
+    # API, so cookies don't change them and shared caches may keep them
+    parts = [request.get_full_path(), *map(str, versions)]
+    return quote_etag(hashlib.sha256("\n".join(parts).encode()).hexdigest()[:32])
+
+
+def catalog_etag(request, *args, **kwargs):
+    return _public_etag(request, get_version(CATALOG))
+
+
+def catalog_last_modified(request, *args, **kwargs):
+    return _as_datetime(get_version(CATALOG))
+
+
+def recipe_etag(request, pk, *args, **kwargs):
+    return _public_etag(request, get_version(recipe_namespace(pk)))
+
+
+VALIDATORS = {
+    LIST_ROUTE: (list_etag, list_last_modified),
+    DETAIL_ROUTE: (detail_etag, detail_last_modified),
+}
+
+
+def page_validators(request):
+    """
+    Compute the validators of a list or detail page without touching the database.
+
+    Returns:
+        tuple: (ETag, Last-Modified datetime), or (None, None) for other routes
+    """
+    try:
+        match = resolve(request.path_info)
+    except Resolver404:
+        return None, None
+    funcs = VALIDATORS.get(match.view_name)
+    if funcs is None:
+        return None, None
+    etag_func, last_modified_func = funcs
+    return (
+        etag_func(request, *match.args, **match.kwargs),
+        last_modified_func(request, *match.args, **match.kwargs),
+    )
+
+
+def not_modified(request, etag, last_modified):
+    """Return a 304 response if the client's copy is current, else None."""
+    if request.method not in ("GET", "HEAD"):
+        return None
+    return get_conditional_response(
+        request, etag=etag, last_modified=int(last_modified.timestamp())
+    )
+
+
+def require_revalidation(response, public=False):
+    """
+    Make browsers and proxies revalidate a page before every reuse.
+
+    Public responses may also be kept by shared caches, such as a CDN.
+    """
+    # Replaces the fixed lifetime cache_page adds; validators keep copies fresh
+    if response.has_header("Expires"):
+        del response["Expires"]
+    if public:
+        patch_cache_control(response, public=True, no_cache=True, max_age=0)
+    else:
+        patch_cache_control(response, private=True, no_cache=True, max_age=0)
+    return response
+
+
+def set_validators(response, etag, last_modified):
+    """Attach a page's validators and revalidation headers to a response."""
+    if not response.has_header("ETag"):
+        response["ETag"] = etag
+    if not response.has_header("Last-Modified"):
+        response["Last-Modified"] = http_date(last_modified.timestamp())
+    return require_revalidation(response)
+
+
+def conditional_page(etag_func, last_modified_func, public=False):
+    """
+    View decorator serving strong ETags, Last-Modified and 304 responses.
+
+    Both functions only read cache versions, so a conditional GET for an
+    unchanged page is answered before the view renders or queries anything.
+    Apply it outside cache_page so the 304 check runs first. Set public for
+    responses that are the same for every user.
+    """
+    def decorator(view):
+        conditional_view = condition(
+            etag_func=etag_func, last_modified_func=last_modified_func
+        )(view)
+
+        @wraps(view)
+        def wrapped(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            # condition() validates every response; errors mustn't carry the
+            # page's validators, and fallback pages mustn't be revalidated
+            # into outliving an outage
+            if (response.status_code not in (200, 304)
+                    or "no-store" in response.get("Cache-Control", "")):
+                for header in ("ETag", "Last-Modified"):
+                    if response.has_header(header):
+                        del response[header]
+                return response
+            if request.method in ("GET", "HEAD") and response.status_code in (200, 304):
+                if getattr(response, "is_rendered", True):
+                    require_revalidation(response, public)
+                else:
+                    # Run after cache_page stores the page, which also waits
+                    # for rendering, so the stored copy keeps its lifetime
+                    response.add_post_render_callback(
+                        lambda response: require_revalidation(response, public)
+                    )
+            return response
+
+        return wrapped
+
+    return decorator
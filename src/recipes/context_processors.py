@@ -0,0 +1,19 @@
+# src/recipes/context_processors.py
+from django.utils.functional import SimpleLazyObject
+from .saved import saved_recipe_ids, session_user_id
+
+
+def saved_recipes(request):
+    """
+    Add saved_recipe_ids, the set of recipe ids the current user has saved.
+
+    Lazy: pages that never check it don't read the cache, and logged out
+    visitors get an empty set without touching it.
+    """
+    def load():
+        user_id = session_user_id(request)
+        if user_id is None:
+            return frozenset()
+        return frozenset(saved_recipe_ids(user_id))
+
+    return {"saved_recipe_ids": SimpleLazyObject(load)}
@@ -0,0 +1,74 @@
+# src/recipes/export.py
+import csv
+from django.core.serializers.json import DjangoJSONEncoder
+from .models import Recipe
+
+# Columns of every export, in order; NDJSON exports read back with import_recipes
+FIELDS = ("id", "name", "ingredients", "cooking_time", "difficulty", "pic", "updated_at")
+
+CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson; charset=utf-8",
+    "csv": "text/csv; charset=utf-8",
+}
+
+# Rows fetched from the database cursor at a time
+CHUNK_SIZE = 2000
+# Characters gathered before a piece of output is handed on
+WRITE_SIZE = 64 * 1024
+
+
+def export_rows(queryset=None, chunk_size=CHUNK_SIZE):
+    """
+    Return an iterator over recipes as dicts of FIELDS, in id order.
+
+    values() skips building model instances, and iterator() reads through
+    a server-side cursor on PostgreSQL, chunk_size rows at a time, so
+    exporting the whole table takes bounded memory.
+    """
+    if queryset is None:
+        queryset = Recipe.objects.all()
+    return queryset.order_by("pk").values(*FIELDS).iterator(chunk_size=chunk_size)
+
+
+class _Echo:
+    """File-like object handing back what is written, so csv.writer output can be streamed."""
+
+    def write(self, value):
+        return value
+
+
+def ndjson_lines(rows):
+    encoder = DjangoJSONEncoder(ensure_ascii=False)
+    for row in rows:
+        yield encoder.encode(row) + "\n"
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        row["updated_at"] = row["updated_at"].isoformat()
+        yield writer.writerow([row[name] for name in FIELDS])
+
+
+def stream(fmt, rows):
+    """
+    Encode rows as NDJSON or CSV text, in pieces of about WRITE_SIZE characters.
+
+    Args:
+        fmt (str): "ndjson" or "csv"
+        rows (iterable): Dicts from export_rows
+
+    Yields:
+        str: Consecutive pieces of the export
+    """
+    lines = ndjson_lines(rows) if fmt == "ndjson" else csv_lines(rows)
+    pending, size = [], 0
+    for line in lines:
+        pending.append(line)
+        size += len(line)
+        if size >= WRITE_SIZE:
+            yield "".join(pending)
+            pending, size = [], 0
+    if pending:
+        yield "".join(pending)
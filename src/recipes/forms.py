@@ -2,8 +2,14 @@ from django import forms
 
 DIFFICULTY_CHOICES = (("5", "5"), ("4", "4"), ("3", "3"), ("2", "2"), ("1", "1"))
 
+INGREDIENT_MATCH_CHOICES = (("any", "Any ingredient"), ("all", "All ingredients"))
+
+SORT_CHOICES = (("name", "Name"), ("cooking_time", "Cooking Time"))
+
 CHART_CHOICES = (("bar", "Bar Chart"), ("pie", "Pie Chart"), ("line", "Line Chart"))
 
+FORMAT_CHOICES = (("png", "PNG"), ("svg", "SVG"))
+
 ANALYSIS_CHOICES = (
     ("ingredients", "Most Common Ingredients"),
     ("difficulty", "Difficulty Distribution"),
@@ -17,6 +23,11 @@ class RecipesSearchForm(forms.Form):
         widget=forms.TextInput(attrs={"placeholder": "Enter recipe title"}),
         required=False,
     )
+    full_text = forms.BooleanField(
+        required=False,
+        label="Full-text search",
+        help_text="Match the title text against recipe names and ingredients, best matches first",
+    )
     recipe_ingredients = forms.CharField(
         max_length=300,
         required=False,
@@ -25,8 +36,18 @@ class RecipesSearchForm(forms.Form):
         ),
         help_text="Separate ingredients with commas (e.g., salt, pepper, olive oil)",
     )
-    difficulty_level = forms.ChoiceField(
-        choices=DIFFICULTY_CHOICES, required=False, label="Max Difficulty"
+    ingredient_match = forms.ChoiceField(
+        choices=INGREDIENT_MATCH_CHOICES,
+        required=False,
+        initial="any",
+        label="Match",
+    )
+    difficulty_level = forms.TypedChoiceField(
+        choices=DIFFICULTY_CHOICES,
+        coerce=int,
+        empty_value=None,
+        required=False,
+        label="Max Difficulty",
     )
     cooking_time = forms.IntegerField(
         min_value=0,
@@ -43,6 +64,9 @@ class RecipesSearchForm(forms.Form):
         initial=360,
         label="Max Cooking Time",
     )
+    sort = forms.ChoiceField(
+        choices=SORT_CHOICES, required=False, initial="name", label="Sort By"
+    )
 
     def clean_recipe_ingredients(self):
         ingredients = self.cleaned_data.get("recipe_ingredients", "")
@@ -71,3 +95,6 @@ class RecipeAnalyticsForm(forms.Form):
     chart_type = forms.ChoiceField(
         choices=CHART_CHOICES, required=True, label="Select Chart Type"
     )
+    output_format = forms.ChoiceField(
+        choices=FORMAT_CHOICES, required=False, initial="png", label="Image Format"
+    )
@@ -0,0 +1,175 @@
+# src/recipes/fts.py
+import re
+import logging
+from django.db import connections
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "recipes_recipe_fts"
+
+_WORD_RE = re.compile(r"[^\W_]+")
+
+# PostgreSQL keeps the weighted vector current itself as a generated column
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(ingredients, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_idx "
+    "ON recipes_recipe USING GIN (search_vector)",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS recipes_recipe_search_vector_idx",
+    "ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector",
+]
+
+# SQLite uses an external-content FTS5 table fed by triggers
+SQLITE_TABLE = f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, ingredients, content='recipes_recipe', content_rowid='id'
+    )
+"""
+
+SQLITE_TRIGGERS = [
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, ingredients)
+        VALUES (new.id, new.name, new.ingredients);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, ingredients)
+        VALUES ('delete', old.id, old.name, old.ingredients);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, ingredients)
+        VALUES ('delete', old.id, old.name, old.ingredients);
+        INSERT INTO {FTS_TABLE}(rowid, name, ingredients)
+        VALUES (new.id, new.name, new.ingredients);
+    END
+    """,
+]
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _sqlite_triggers_installed(cursor):
+    cursor.execute(
+        "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' AND name LIKE %s",
+        [f"{FTS_TABLE}_%"],
+    )
+    return cursor.fetchone()[0] == len(SQLITE_TRIGGERS)
+
+
+def install(connection):
+    """
+    Create the full-text search structures for the connection's database.
+
+    Safe to call repeatedly. On SQLite, Django rebuilds tables when altering
+    columns, which drops their triggers, so this also restores the triggers
+    and re-syncs the FTS table after later migrations.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == "postgresql":
+            for statement in POSTGRES_INSTALL:
+                cursor.execute(statement)
+        elif connection.vendor == "sqlite":
+            if _sqlite_triggers_installed(cursor):
+                return
+            cursor.execute(SQLITE_TABLE)
+            for statement in SQLITE_TRIGGERS:
+                cursor.execute(statement)
+            cursor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+            logger.info("Installed SQLite full-text index")
+
+
+def uninstall(connection):
+    """Drop the full-text search structures created by install()."""
+    statements = {
+        "postgresql": POSTGRES_UNINSTALL,
+        "sqlite": SQLITE_UNINSTALL,
+    }.get(connection.vendor, [])
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def restore(connection):
+    """Reinstall SQLite triggers dropped by a table rebuild, if FTS is in use."""
+    if connection.vendor != "sqlite":
+        return
+    if FTS_TABLE in connection.introspection.table_names():
+        install(connection)
+
+
+def query_terms(query):
+    """Split a user query into plain words, dropping any search syntax."""
+    return _WORD_RE.findall((query or "").lower())
+
+
+def full_text_filter(queryset, query):
+    """
+    Restrict a Recipe queryset to full-text matches on name and ingredients.
+
+    Matches are prefix matches on every word of the query. The queryset is
+    annotated with ``search_rank`` (higher is better) and ordered by it, so
+    filtering, ranking and ordering run as a single indexed query.
+
+    Args:
+        queryset (QuerySet): Recipe queryset to filter
+        query (str): User search text
+
+    Returns:
+        QuerySet: Filtered and rank-ordered queryset
+    """
+    terms = query_terms(query)
+    if not terms:
+        return queryset.none()
+
+    vendor = connections[queryset.db].vendor
+    if vendor == "postgresql":
+        tsquery = " & ".join(f"{term}:*" for term in terms)
+        rank = RawSQL(
+            "ts_rank(recipes_recipe.search_vector, to_tsquery('english', %s))",
+            (tsquery,),
+            output_field=FloatField(),
+        )
+        match = RawSQL(
+            "recipes_recipe.search_vector @@ to_tsquery('english', %s)",
+            (tsquery,),
+            output_field=BooleanField(),
+        )
+        queryset = queryset.filter(match)
+    elif vendor == "sqlite":
+        fts_query = " ".join('"{}"*'.format(term.replace('"', '""')) for term in terms)
+        # bm25 scores are negative, lower meaning more relevant
+        rank = RawSQL(
+            f"(SELECT -rank FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s "
+            f"AND rowid = recipes_recipe.id)",
+            (fts_query,),
+            output_field=FloatField(),
+        )
+        queryset = queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s",
+                (fts_query,),
+            )
+        )
+    else:
+        raise NotImplementedError(f"Full-text search is not supported on {vendor}")
+
+    return queryset.annotate(search_rank=rank).order_by("-search_rank", "pk")
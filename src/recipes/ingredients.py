@@ -0,0 +1,188 @@
+# src/recipes/ingredients.py
+import re
+import logging
+from collections import namedtuple
+from fractions import Fraction
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from .models import Ingredient, Recipe, RecipeIngredient
+
+logger = logging.getLogger(__name__)
+
+ParsedIngredient = namedtuple("ParsedIngredient", "quantity unit name text")
+
+NAME_MAX_LENGTH = 120
+TEXT_MAX_LENGTH = 255
+
+# Spellings mapped to the stored unit
+UNITS = {
+    "cup": "cup", "cups": "cup",
+    "tbsp": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp",
+    "tsp": "tsp", "teaspoon": "tsp", "teaspoons": "tsp",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "g": "g", "gram": "g", "grams": "g",
+    "kg": "kg", "ml": "ml", "l": "l", "liter": "l", "liters": "l",
+    "clove": "clove", "cloves": "clove",
+    "pinch": "pinch", "bunch": "bunch", "can": "can", "cans": "can",
+}
+
+# Words describing preparation or size rather than the ingredient itself
+DESCRIPTORS = {
+    "large", "medium", "small", "fresh", "ground", "chopped", "minced",
+    "sliced", "diced", "dried", "finely", "roughly", "of",
+}
+
+UNICODE_FRACTIONS = {"½": "1/2", "¼": "1/4", "¾": "3/4", "⅓": "1/3", "⅔": "2/3"}
+
+_BULLET_RE = re.compile(r"^\s*[-*•]\s*")
+_PAREN_RE = re.compile(r"\([^)]*\)")
+_QUANTITY_RE = re.compile(r"^(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)(?:\s*-\s*[\d./]+)?\s*")
+_TRAILING_RE = re.compile(r"\b(to taste|as needed|optional|for garnish|for serving)\b.*$")
+_SPACE_RE = re.compile(r"\s+")
+
+
+def singularize(word):
+    """Strip simple English plural endings from a lowercase word."""
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def parse_quantity(text):
+    """
+    Read a leading quantity such as "2", "1/2", "1 1/2" or "2-3".
+
+    Returns:
+        tuple: (quantity as float or None, remaining text)
+    """
+    for symbol, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, f" {fraction}")
+    text = text.strip()
+    match = _QUANTITY_RE.match(text)
+    if not match:
+        return None, text
+    quantity = sum(Fraction(part) for part in match.group(1).split())
+    return float(quantity), text[match.end():]
+
+
+def parse_ingredient_line(line):
+    """
+    Parse one ingredient line into quantity, unit and normalized name.
+
+    Args:
+        line (str): e.g. "- 2 lbs (900g) chicken thighs, bone-in and skin-on"
+
+    Returns:
+        ParsedIngredient: e.g. (2.0, "lb", "chicken thigh", <original line>),
+        with an empty name when nothing but quantities and units remain
+    """
+    text = _BULLET_RE.sub("", line).strip()
+    quantity, rest = parse_quantity(_PAREN_RE.sub(" ", text))
+
+    words = rest.lower().split()
+    unit = ""
+    if words and words[0].rstrip(".") in UNITS:
+        unit = UNITS[words.pop(0).rstrip(".")]
+
+    # Everything after the first comma describes preparation
+    name = " ".join(words).split(",")[0]
+    name = _TRAILING_RE.sub("", name)
+    words = [w for w in re.findall(r"[a-z][a-z0-9'-]*", name) if w not in DESCRIPTORS]
+    if words:
+        words[-1] = singularize(words[-1])
+    name = _SPACE_RE.sub(" ", " ".join(words)).strip()[:NAME_MAX_LENGTH]
+
+    return ParsedIngredient(quantity, unit, name, text[:TEXT_MAX_LENGTH])
+
+
+def split_ingredient_lines(text):
+    """
+    Split a recipe's ingredient text into one string per ingredient.
+
+    Bulleted or multi-line text has one ingredient per line, where commas
+    introduce preparation notes. Single-line text is a comma-separated list.
+    """
+    text = (text or "").strip()
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) > 1 or _BULLET_RE.match(text):
+        return lines
+    return [part for part in text.split(",") if part.strip()]
+
+
+def parse_ingredients(text):
+    """
+    Returns:
+        list: ParsedIngredient for every line of text with a usable name
+    """
+    parsed = (parse_ingredient_line(line) for line in split_ingredient_lines(text))
+    return [item for item in parsed if item.name]
+
+
+def sync_ingredients(recipes):
+    """
+    Replace the RecipeIngredient rows of the given recipes with freshly parsed ones.
+
+    Works on batches: one query to upsert ingredient names, one to look their
+    ids up, one delete and one bulk insert, however many recipes are passed.
+    Sends m2m_changed for the ingredients each recipe gained or lost, as
+    Recipe.structured_ingredients.add()/remove() would.
+
+    Args:
+        recipes (list): Recipe instances with ingredients loaded
+
+    Returns:
+        int: Number of RecipeIngredient rows written
+    """
+    parsed = {recipe.pk: parse_ingredients(recipe.ingredients) for recipe in recipes}
+    names = {item.name for items in parsed.values() for item in items}
+
+    with transaction.atomic():
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name) for name in names], ignore_conflicts=True
+        )
+        ingredient_ids = dict(
+            Ingredient.objects.filter(name__in=names).values_list("name", "id")
+        )
+        previous = {}
+        old_lines = RecipeIngredient.objects.filter(recipe_id__in=parsed.keys())
+        for recipe_id, ingredient_id in old_lines.values_list("recipe_id", "ingredient_id"):
+            previous.setdefault(recipe_id, set()).add(ingredient_id)
+        old_lines.delete()
+        rows = [
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_ids[item.name],
+                position=position,
+                quantity=item.quantity,
+                unit=item.unit,
+                text=item.text,
+            )
+            for recipe_id, items in parsed.items()
+            for position, item in enumerate(items)
+        ]
+        RecipeIngredient.objects.bulk_create(rows)
+
+        for recipe in recipes:
+            old_ids = previous.get(recipe.pk, set())
+            new_ids = {ingredient_ids[item.name] for item in parsed[recipe.pk]}
+            _send_changed(recipe, "post_remove", old_ids - new_ids)
+            _send_changed(recipe, "post_add", new_ids - old_ids)
+    return len(rows)
+
+
+def _send_changed(recipe, action, ingredient_ids):
+    if ingredient_ids:
+        m2m_changed.send(
+            sender=Recipe.structured_ingredients.through,
+            instance=recipe,
+            action=action,
+            reverse=False,
+            model=Ingredient,
+            pk_set=ingredient_ids,
+            using=RecipeIngredient.objects.db,
+        )
@@ -0,0 +1,216 @@
+# src/recipes/jobs.py
+import os
+import random
+import socket
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+# Task name -> function, filled in by @task as recipes/tasks.py is imported
+registry = {}
+
+# Due jobs read per poll; workers race for them with a conditional UPDATE
+CLAIM_BATCH = 10
+
+
+def task(name):
+    """
+    Register a function as the task run for jobs called name.
+
+    The job's args are passed as keyword arguments, and whatever the function
+    returns is stored as the job's result, so both must be JSON values.
+    Raising makes the job retry later.
+    """
+    def register(func):
+        registry[name] = func
+        return func
+    return register
+
+
+def worker_name():
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def enqueue(name, args=None, dedupe_key=None, delay=0, max_attempts=None):
+    """
+    Queue a job for the worker and return straight away.
+
+    The row is written in the caller's transaction, so the job only becomes
+    visible to workers if that commits. With a dedupe_key, a job already
+    queued under the same key is returned instead of adding another; a job
+    that is already running doesn't count, as it may have read stale data.
+
+    Args:
+        name (str): Registered task name
+        args (dict): Keyword arguments for the task
+        dedupe_key (str): Identifies equivalent jobs, e.g. "thumbnails_12"
+        delay (float): Seconds to wait before the job may run
+        max_attempts (int): Runs before giving up, JOBS["MAX_ATTEMPTS"] if omitted
+
+    Returns:
+        Job: The queued job
+    """
+    if name not in registry:
+        raise ValueError(f"Unknown job task {name}")
+    for _ in range(2):
+        job = Job(
+            name=name,
+            args=args or {},
+            dedupe_key=dedupe_key,
+            max_attempts=max_attempts or settings.JOBS['MAX_ATTEMPTS'],
+            run_at=timezone.now() + timedelta(seconds=delay),
+        )
+        try:
+            with transaction.atomic():
+                job.save()
+            return job
+        except IntegrityError:
+            if dedupe_key is None:
+                raise
+        existing = Job.objects.filter(dedupe_key=dedupe_key, status=Job.QUEUED).first()
+        if existing is not None:
+            logger.debug(f"Job {dedupe_key} is already queued as #{existing.pk}")
+            return existing
+        # A worker claimed the queued job in between; queue a fresh one
+    raise IntegrityError(f"Could not queue job {dedupe_key}")
+
+
+def retry_delay(attempts):
+    """Seconds to wait before retrying a job that failed attempts times: doubling, capped, jittered."""
+    delay = min(settings.JOBS['MAX_RETRY_DELAY'], settings.JOBS['RETRY_DELAY'] * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1)
+
+
+def claim(worker=None):
+    """
+    Take the next due job, marking it running under this worker's lease.
+
+    Jobs whose worker died while running them come back once their lease
+    runs out. Each claim is a compare-and-set UPDATE on the job's status and
+    attempt count, so two workers never take the same job and no row lock
+    is held while it runs.
+
+    Returns:
+        Job: The claimed job, or None if nothing is due
+    """
+    worker = worker or worker_name()
+    now = timezone.now()
+    due = Job.objects.filter(
+        Q(status=Job.QUEUED, run_at__lte=now) | Q(status=Job.RUNNING, locked_until__lt=now)
+    ).order_by("run_at", "id")
+    for job in due[:CLAIM_BATCH]:
+        locked_until = now + timedelta(seconds=settings.JOBS['LEASE_SECONDS'])
+        claimed = Job.objects.filter(
+            pk=job.pk, status=job.status, attempts=job.attempts
+        ).update(
+            status=Job.RUNNING,
+            attempts=F("attempts") + 1,
+            locked_by=worker,
+            locked_until=locked_until,
+        )
+        if claimed:
+            job.status = Job.RUNNING
+            job.attempts += 1
+            job.locked_by = worker
+            job.locked_until = locked_until
+            return job
+    return None
+
+
+def run(job):
+    """
+    Run a claimed job and record how it went.
+
+    Returns:
+        bool: True if the task succeeded
+    """
+    try:
+        if job.attempts > job.max_attempts:
+            raise RuntimeError("Worker stopped while running the job")
+        func = registry.get(job.name)
+        if func is None:
+            raise LookupError(f"No task registered as {job.name}")
+        result = func(**job.args)
+    except Exception as e:
+        _record_failure(job, e)
+        return False
+
+    _finish(job, status=Job.SUCCEEDED, result=result, last_error="")
+    logger.info(f"Job {job.name} #{job.pk} succeeded on attempt {job.attempts}")
+    return True
+
+
+def _finish(job, **fields):
+    # Only the worker holding the lease may record the outcome
+    Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+        finished_at=timezone.now(), locked_until=None, **fields
+    )
+
+
+def _record_failure(job, error):
+    message = f"{type(error).__name__}: {error}"
+    if job.attempts >= job.max_attempts:
+        logger.error(f"Job {job.name} #{job.pk} failed for good after {job.attempts} attempts: {message}")
+        _finish(job, status=Job.FAILED, last_error=message)
+        return
+
+    delay = retry_delay(job.attempts)
+    logger.warning(
+        f"Job {job.name} #{job.pk} failed (attempt {job.attempts}/{job.max_attempts}), "
+        f"retrying in {delay:.0f}s: {message}"
+    )
+    try:
+        with transaction.atomic():
+            Job.objects.filter(pk=job.pk, locked_by=job.locked_by).update(
+                status=Job.QUEUED,
+                run_at=timezone.now() + timedelta(seconds=delay),
+                locked_by="",
+                locked_until=None,
+                last_error=message,
+            )
+    except IntegrityError:
+        # A newer job with the same dedupe key is queued and will do the work
+        _finish(job, status=Job.FAILED, last_error=f"{message} (superseded by a queued job)")
+
+
+def work_off(limit=None, worker=None):
+    """
+    Run due jobs one after another until none are left.
+
+    Args:
+        limit (int): Stop after this many jobs
+        worker (str): Name recorded on claimed jobs
+
+    Returns:
+        int: Number of jobs run
+    """
+    worker = worker or worker_name()
+    count = 0
+    while limit is None or count < limit:
+        job = claim(worker)
+        if job is None:
+            break
+        run(job)
+        count += 1
+    return count
+
+
+def prune(days=None):
+    """
+    Delete succeeded and failed jobs finished more than days ago.
+
+    Returns:
+        int: Number of jobs deleted
+    """
+    days = settings.JOBS['RETENTION_DAYS'] if days is None else days
+    deleted, _ = Job.objects.filter(
+        status__in=[Job.SUCCEEDED, Job.FAILED],
+        finished_at__lt=timezone.now() - timedelta(days=days),
+    ).delete()
+    return deleted
@@ -0,0 +1,40 @@
+import time
+from django.core.management.base import BaseCommand
+from recipes.ingredients import sync_ingredients
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = "Parse every recipe's ingredient text into Ingredient/RecipeIngredient rows"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=500,
+            help="Number of recipes parsed and written per transaction",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        started = time.monotonic()
+        recipes = Recipe.objects.only("id", "ingredients").order_by("pk")
+
+        total_recipes = 0
+        total_rows = 0
+        batch = []
+        for recipe in recipes.iterator(chunk_size=batch_size):
+            batch.append(recipe)
+            if len(batch) >= batch_size:
+                total_rows += sync_ingredients(batch)
+                total_recipes += len(batch)
+                batch = []
+                self.stdout.write(f"Parsed {total_recipes} recipes")
+        if batch:
+            total_rows += sync_ingredients(batch)
+            total_recipes += len(batch)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Wrote {total_rows} ingredient rows for {total_recipes} recipes in {elapsed:.1f}s"
+        ))
@@ -0,0 +1,324 @@
+import json
+import math
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, setup_test_environment
+from django.urls import reverse
+from recipes.forms import ANALYSIS_CHOICES, CHART_CHOICES
+from recipes.models import Ingredient, Recipe
+
+SCENARIOS = ("list", "search", "detail", "analytics", "save")
+
+BENCHMARK_USER = "benchmark"
+
+
+def percentile(values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not values:
+        return None
+    rank = max(1, math.ceil(pct / 100 * len(values)))
+    return values[rank - 1]
+
+
+def summarize(samples, elapsed):
+    """
+    Reduce (status, seconds, queries) samples to the JSON report of a scenario.
+
+    Args:
+        samples (list): One tuple per measured request, queries None when unknown
+        elapsed (float): Wall time of the whole scenario, in seconds
+
+    Returns:
+        dict: Request and error counts, throughput, latency and query statistics
+    """
+    latencies = sorted(seconds * 1000 for _, seconds, _ in samples)
+    statuses = {}
+    for status, _, _ in samples:
+        statuses[str(status)] = statuses.get(str(status), 0) + 1
+    queries = sorted(count for _, _, count in samples if count is not None)
+    report = {
+        "requests": len(samples),
+        "errors": sum(1 for status, _, _ in samples if status >= 500),
+        "status_codes": statuses,
+        "throughput_rps": round(len(samples) / elapsed, 2) if elapsed else None,
+        "latency_ms": {
+            "p50": percentile(latencies, 50),
+            "p95": percentile(latencies, 95),
+            "p99": percentile(latencies, 99),
+            "mean": sum(latencies) / len(latencies) if latencies else None,
+            "max": latencies[-1] if latencies else None,
+        },
+        "queries": None,
+    }
+    if queries:
+        report["queries"] = {
+            "mean": sum(queries) / len(queries),
+            "p95": percentile(queries, 95),
+            "max": queries[-1],
+        }
+    for name, value in report["latency_ms"].items():
+        if value is not None:
+            report["latency_ms"][name] = round(value, 3)
+    return report
+
+
+class InProcessTarget:
+    """
+    Sends requests through the Django test client, counting queries per request.
+
+    Requests run against the configured database, so the save scenario
+    really saves recipes. close() puts the benchmark user's saved recipes
+    back as they were, and deletes the user if it was made for this run.
+    """
+
+    name = "in-process"
+
+    def __init__(self):
+        self.user, self.created = User.objects.get_or_create(username=BENCHMARK_USER)
+        self.saved = set(self.user.saved_recipes.values_list("pk", flat=True))
+        self.clients = []
+
+    def client(self, authenticated):
+        client = Client(raise_request_exception=False)
+        if authenticated:
+            client.force_login(self.user)
+            self.clients.append(client)
+        return client
+
+    def request(self, client, method, path, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            started = time.perf_counter()
+            response = getattr(client, method)(path, data or {})
+            if getattr(response, "streaming", False):
+                b"".join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        return response.status_code, elapsed, len(queries)
+
+    def close(self):
+        """Undo what the requests wrote: sessions, saved recipes and the user."""
+        for client in self.clients:
+            client.logout()
+        # set() sends the m2m signals, so counters and cached pages follow
+        self.user.saved_recipes.set(self.saved)
+        if self.created:
+            self.user.delete()
+
+
+class LiveTarget:
+    """Sends requests to a running server, whose query counts show up in its /metrics."""
+
+    def __init__(self, base_url, username, password):
+        import requests
+        self.requests = requests
+        self.name = base_url
+        self.base_url = base_url.rstrip("/")
+        self.username = username
+        self.password = password
+
+    def client(self, authenticated):
+        session = self.requests.Session()
+        session.get(self.base_url + reverse("login"))
+        if authenticated:
+            if not self.username:
+                raise CommandError("Benchmarking save against a server needs --username and --password")
+            response = session.post(self.base_url + reverse("login"), data={
+                "username": self.username,
+                "password": self.password,
+                "csrfmiddlewaretoken": session.cookies.get("csrftoken", ""),
+            }, headers={"Referer": self.base_url + reverse("login")})
+            if "sessionid" not in session.cookies:
+                raise CommandError(f"Could not log in as {self.username} ({response.status_code})")
+        return session
+
+    def request(self, session, method, path, data=None):
+        headers = {}
+        if method == "post":
+            # The CSRF middleware also checks the Referer on HTTPS
+            headers = {"X-CSRFToken": session.cookies.get("csrftoken", ""), "Referer": self.base_url + path}
+        started = time.perf_counter()
+        if method == "post":
+            response = session.post(self.base_url + path, data=data or {}, headers=headers)
+        else:
+            response = session.get(self.base_url + path, params=data or {})
+        return response.status_code, time.perf_counter() - started, None
+
+    def close(self):
+        pass
+
+
+class Command(BaseCommand):
+    help = "Benchmark the main pages and report latency percentiles, throughput and query counts as JSON"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--requests",
+            type=int,
+            default=200,
+            help="Measured requests per scenario",
+        )
+        parser.add_argument(
+            "--warmup",
+            type=int,
+            default=20,
+            help="Unmeasured requests per scenario sent first",
+        )
+        parser.add_argument(
+            "--concurrency",
+            type=int,
+            default=1,
+            help="Number of clients sending requests at once",
+        )
+        parser.add_argument(
+            "--scenarios",
+            default=",".join(SCENARIOS),
+            help=f"Comma-separated scenarios to run, out of {', '.join(SCENARIOS)}",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed for the pages, searches and recipes requested",
+        )
+        parser.add_argument(
+            "--cold",
+            action="store_true",
+            help="Clear the cache before each scenario",
+        )
+        parser.add_argument(
+            "--url",
+            help="Benchmark a running server at this URL instead of the in-process test client",
+        )
+        parser.add_argument("--username", help="User the save scenario logs in as with --url")
+        parser.add_argument("--password", help="Password for --username")
+        parser.add_argument(
+            "--output",
+            help="Write the JSON report to this file instead of standard output",
+        )
+        parser.add_argument(
+            "--compare",
+            help="Earlier JSON report to print p50/p95/p99 changes against",
+        )
+
+    def handle(self, *args, **options):
+        scenarios = [name.strip() for name in options["scenarios"].split(",") if name.strip()]
+        unknown = set(scenarios) - set(SCENARIOS)
+        if unknown:
+            raise CommandError(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+        if options["requests"] < 1 or options["concurrency"] < 1:
+            raise CommandError("--requests and --concurrency must be positive")
+
+        pks = list(Recipe.objects.order_by("pk").values_list("pk", flat=True))
+        if not pks:
+            raise CommandError("No recipes to benchmark; run generate_catalog first")
+        terms = list(Ingredient.objects.order_by("name").values_list("name", flat=True)[:200])
+
+        if options["url"]:
+            target = LiveTarget(options["url"], options["username"], options["password"])
+        else:
+            # Lets the test client build requests
+            try:
+                setup_test_environment()
+            except RuntimeError:
+                pass  # Already set up, e.g. by the test runner
+            target = InProcessTarget()
+
+        report = {
+            "meta": {
+                "started": datetime.now(timezone.utc).isoformat(),
+                "target": target.name,
+                "recipes": len(pks),
+                "requests": options["requests"],
+                "warmup": options["warmup"],
+                "concurrency": options["concurrency"],
+                "seed": options["seed"],
+                "cold": options["cold"],
+            },
+            "scenarios": {},
+        }
+        try:
+            for scenario in scenarios:
+                if options["cold"]:
+                    cache.clear()
+                rng = random.Random(f"{options['seed']}-{scenario}")
+                plan = [
+                    self.plan_request(scenario, rng, pks, terms)
+                    for _ in range(options["warmup"] + options["requests"])
+                ]
+                report["scenarios"][scenario] = self.run(
+                    target, scenario, plan, options["warmup"], options["concurrency"]
+                )
+                self.stderr.write(
+                    f"{scenario}: p95 {report['scenarios'][scenario]['latency_ms']['p95']}ms"
+                )
+        finally:
+            target.close()
+
+        output = json.dumps(report, indent=2)
+        if options["output"]:
+            with open(options["output"], "w") as f:
+                f.write(output + "\n")
+        else:
+            self.stdout.write(output)
+        if options["compare"]:
+            self.compare(options["compare"], report)
+
+    def plan_request(self, scenario, rng, pks, terms):
+        """Return (method, path, data) for one request of a scenario."""
+        if scenario == "list":
+            return "get", reverse("recipes:list"), None
+        if scenario == "search":
+            data = {"recipe_ingredients": ", ".join(rng.sample(terms, min(2, len(terms))))}
+            if rng.random() < 0.5:
+                data["difficulty_level"] = str(rng.randint(1, 5))
+            return "post", reverse("recipes:list"), data
+        if scenario == "detail":
+            return "get", reverse("recipes:recipe_detail", kwargs={"pk": rng.choice(pks)}), None
+        if scenario == "analytics":
+            return "post", reverse("recipes:analytics"), {
+                "analysis_type": rng.choice(ANALYSIS_CHOICES)[0],
+                "chart_type": rng.choice(CHART_CHOICES)[0],
+            }
+        return "post", reverse("recipes:save_recipe", kwargs={"recipe_id": rng.choice(pks)}), None
+
+    def run(self, target, scenario, plan, warmup, concurrency):
+        authenticated = scenario == "save"
+
+        def work(share):
+            client = target.client(authenticated)
+            return [target.request(client, *request) for request in share]
+
+        work(plan[:warmup])
+        measured = plan[warmup:]
+        # Each worker sends every concurrency-th request with its own client
+        shares = [measured[i::concurrency] for i in range(concurrency)]
+        started = time.perf_counter()
+        if concurrency == 1:
+            samples = work(measured)
+        else:
+            with ThreadPoolExecutor(concurrency) as executor:
+                samples = [sample for result in executor.map(work, shares) for sample in result]
+        return summarize(samples, time.perf_counter() - started)
+
+    def compare(self, path, report):
+        try:
+            with open(path) as f:
+                previous = json.load(f)
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read {path}: {e}")
+        for scenario, current in report["scenarios"].items():
+            before = previous.get("scenarios", {}).get(scenario)
+            if before is None:
+                continue
+            changes = []
+            for name in ("p50", "p95", "p99"):
+                old, new = before["latency_ms"][name], current["latency_ms"][name]
+                if old and new is not None:
+                    changes.append(f"{name} {old:.1f} -> {new:.1f}ms ({(new - old) / old:+.0%})")
+            self.stderr.write(f"{scenario}: " + ", ".join(changes))
@@ -0,0 +1,96 @@
+import os
+import re
+import sys
+import subprocess
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+# What a fresh gunicorn worker imports before it can answer a request
+STARTUP_CODE = (
+    "from recipe_app.wsgi import application; "
+    "from django.urls import get_resolver; "
+    "get_resolver().url_patterns"
+)
+
+_LINE_RE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)")
+
+
+def parse_import_times(output):
+    """
+    Read the report written by ``python -X importtime``.
+
+    Returns:
+        list: (module, self µs, cumulative µs, depth) per imported module
+    """
+    modules = []
+    for line in output.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            modules.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return modules
+
+
+class Command(BaseCommand):
+    help = "Measure the imports a fresh web worker pays at startup and enforce a budget"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--budget",
+            type=float,
+            default=settings.IMPORT_TIME_BUDGET_MS,
+            help="Fail if total startup import time exceeds this many milliseconds",
+        )
+        parser.add_argument(
+            "--top",
+            type=int,
+            default=15,
+            help="Number of slowest packages to report",
+        )
+        parser.add_argument(
+            "--forbid",
+            default="matplotlib,pandas",
+            help="Comma-separated modules that must not be imported at startup",
+        )
+
+    def handle(self, *args, **options):
+        env = dict(os.environ)
+        # Measure the plain worker, not the warmed preload mode
+        env.pop("PRELOAD_APP", None)
+        result = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", STARTUP_CODE],
+            cwd=settings.BASE_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+        )
+        if result.returncode:
+            raise CommandError(f"Startup imports failed:\n{result.stderr[-2000:]}")
+
+        modules = parse_import_times(result.stderr)
+        total_ms = sum(cumulative for _, _, cumulative, depth in modules if depth == 0) / 1000
+
+        # Self time summed per top-level package shows who the cost belongs to
+        packages = {}
+        for module, self_us, _, _ in modules:
+            package = module.split(".")[0]
+            count, package_us = packages.get(package, (0, 0))
+            packages[package] = (count + 1, package_us + self_us)
+
+        self.stdout.write(f"{'package':<40} {'modules':>8} {'ms':>9}")
+        slowest = sorted(packages.items(), key=lambda item: item[1][1], reverse=True)
+        for package, (count, package_us) in slowest[: options["top"]]:
+            self.stdout.write(f"{package:<40} {count:>8} {package_us / 1000:>9.1f}")
+        self.stdout.write(f"{len(modules)} modules imported in {total_ms:.1f}ms")
+
+        forbidden = {name.strip() for name in options["forbid"].split(",") if name.strip()}
+        loaded = sorted(forbidden & set(packages))
+        if loaded:
+            raise CommandError(f"Heavy modules imported at startup: {', '.join(loaded)}")
+        if total_ms > options["budget"]:
+            raise CommandError(
+                f"Startup imports took {total_ms:.1f}ms, over the {options['budget']:.0f}ms budget"
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f"Startup imports within the {options['budget']:.0f}ms budget"
+        ))
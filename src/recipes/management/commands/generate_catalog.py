@@ -0,0 +1,180 @@
+import json
+import random
+import re
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from recipes import stats
+from recipes.caching import CATALOG, bump_version
+from recipes.ingredients import parse_ingredient_line, split_ingredient_lines
+from recipes.models import Ingredient, IngredientToken, Recipe, RecipeIngredient
+from recipes.search import tokenize
+
+DEFAULT_FIXTURE = settings.BASE_DIR.parent / "moroccan-recipes-fixture.json"
+
+# Dropped from fixture names so they recombine into new ones
+_NAME_NOISE_RE = re.compile(r"\([^)]*\)|\b(Moroccan|Authentic)\b")
+
+STYLES = ["Classic", "Fez-Style", "Marrakech", "Rif Mountain", "Spiced", "Slow-Cooked",
+          "Weeknight", "Festive", "Coastal", "Saffron", "Smoky", "Herbed", "Rustic"]
+
+
+class Vocabulary:
+    """
+    Ingredient lines and dish names to draw synthetic recipes from.
+
+    Lines and names come from the fixture, so quantities, units and spellings
+    look like real data. Names recombine a fixture dish, e.g. "Lamb Tagine",
+    with a style and sometimes another recipe's "with ..." part. Popular lines are drawn more often, following a Zipf-like
+    curve, so a few spices show up everywhere like they do in practice.
+    """
+
+    def __init__(self, fixture_recipes, rng):
+        lines = []
+        dishes = set()
+        sides = set()
+        for item in fixture_recipes:
+            fields = item["fields"]
+            # Bullets are normalized so every generated recipe parses the same way
+            lines.extend(
+                "- " + line.strip().lstrip("-*•").strip()
+                for line in split_ingredient_lines(fields["ingredients"])
+            )
+            dish, _, side = _NAME_NOISE_RE.sub("", fields["name"]).partition(" with ")
+            dishes.add(" ".join(dish.split()))
+            if side.strip():
+                sides.add(side.strip())
+
+        self.lines = sorted(set(lines))
+        if not self.lines:
+            raise CommandError("The fixture has no ingredient lines to draw from")
+        rng.shuffle(self.lines)
+        self.rank = {line: rank for rank, line in enumerate(self.lines)}
+        self.weights = [1 / (rank + 1) ** 0.8 for rank in range(len(self.lines))]
+        self.dishes = sorted(dish for dish in dishes if dish) or ["Tagine"]
+        self.sides = sorted(sides)
+        self.parsed = {line: parse_ingredient_line(line) for line in self.lines}
+
+    def recipe(self, rng, number):
+        count = rng.randint(6, min(18, len(self.lines)))
+        lines = set()
+        while len(lines) < count:
+            lines.update(rng.choices(self.lines, weights=self.weights, k=count - len(lines)))
+        lines = sorted(lines, key=self.rank.get)
+        name = f"{rng.choice(STYLES)} {rng.choice(self.dishes)}"
+        if self.sides and rng.random() < 0.5:
+            name += f" with {rng.choice(self.sides)}"
+        # Numbered so names stay distinct however large the catalog
+        name = f"{name} #{number}"
+        return Recipe(
+            name=name[:120],
+            ingredients="\n".join(lines),
+            # Most recipes take under two hours, a few simmer much longer
+            cooking_time=min(360, max(10, int(rng.lognormvariate(4.2, 0.5)) // 5 * 5)),
+            difficulty=rng.choices([1, 2, 3, 4, 5], weights=[10, 25, 35, 20, 10])[0],
+        )
+
+
+class Command(BaseCommand):
+    help = "Generate a synthetic recipe catalog for load testing and benchmarks"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--count",
+            type=int,
+            default=1000,
+            help="Number of recipes to generate, e.g. 1000 to 1000000",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of recipes written per transaction",
+        )
+        parser.add_argument(
+            "--seed",
+            type=int,
+            default=0,
+            help="Random seed; the same seed and count give the same catalog",
+        )
+        parser.add_argument(
+            "--fixture",
+            default=str(DEFAULT_FIXTURE),
+            help="Fixture whose recipes provide the ingredient vocabulary",
+        )
+        parser.add_argument(
+            "--clear",
+            action="store_true",
+            help="Delete every existing recipe first",
+        )
+
+    def handle(self, *args, **options):
+        count = options["count"]
+        batch_size = options["batch_size"]
+        if count < 1 or batch_size < 1:
+            raise CommandError("--count and --batch-size must be positive")
+        try:
+            with open(options["fixture"]) as f:
+                fixture = [item for item in json.load(f) if item["model"] == "recipes.recipe"]
+        except (OSError, ValueError) as e:
+            raise CommandError(f"Could not read fixture {options['fixture']}: {e}")
+
+        rng = random.Random(options["seed"])
+        vocabulary = Vocabulary(fixture, rng)
+        started = time.monotonic()
+
+        if options["clear"]:
+            Recipe.objects.all().delete()
+            self.stdout.write("Deleted existing recipes")
+
+        # Ingredient names are known upfront, so each batch only inserts
+        names = {item.name for item in vocabulary.parsed.values() if item.name}
+        Ingredient.objects.bulk_create(
+            [Ingredient(name=name) for name in names], ignore_conflicts=True
+        )
+        ingredient_ids = dict(Ingredient.objects.filter(name__in=names).values_list("name", "id"))
+
+        written = 0
+        while written < count:
+            size = min(batch_size, count - written)
+            recipes = [vocabulary.recipe(rng, written + i + 1) for i in range(size)]
+            self.write_batch(recipes, vocabulary, ingredient_ids)
+            written += size
+            self.stdout.write(f"Generated {written} recipes")
+
+        # bulk_create skips the signals that keep these current
+        counters = stats.rebuild()
+        bump_version(CATALOG)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated {written} recipes and {counters} counters in {elapsed:.1f}s"
+        ))
+
+    def write_batch(self, recipes, vocabulary, ingredient_ids):
+        with transaction.atomic():
+            recipes = Recipe.objects.bulk_create(recipes)
+            lines = []
+            tokens = []
+            for recipe in recipes:
+                position = 0
+                for line in split_ingredient_lines(recipe.ingredients):
+                    item = vocabulary.parsed.get(line) or parse_ingredient_line(line)
+                    if not item.name:
+                        continue
+                    lines.append(RecipeIngredient(
+                        recipe_id=recipe.pk,
+                        ingredient_id=ingredient_ids[item.name],
+                        position=position,
+                        quantity=item.quantity,
+                        unit=item.unit,
+                        text=item.text,
+                    ))
+                    position += 1
+                tokens.extend(
+                    IngredientToken(token=token, recipe_id=recipe.pk)
+                    for token in tokenize(recipe.ingredients)
+                )
+            RecipeIngredient.objects.bulk_create(lines)
+            IngredientToken.objects.bulk_create(tokens, ignore_conflicts=True)
@@ -0,0 +1,65 @@
+import time
+from django.core.management.base import BaseCommand
+from recipes import jobs
+from recipes.caching import CATALOG, bump_version
+from recipes.models import Recipe
+from recipes.tasks import thumbnails_key
+from recipes.thumbnails import generate_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Generate resized WebP/JPEG copies of recipe pictures and record their sizes"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Regenerate thumbnails for recipes that already have them",
+        )
+        parser.add_argument(
+            "--enqueue",
+            action="store_true",
+            help="Queue a job per recipe for run_jobs workers instead of resizing here",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=100,
+            help="Number of recipes loaded per query",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        recipes = Recipe.objects.only("id", "pic", "pic_variants").order_by("pk")
+        if not options["force"]:
+            recipes = recipes.filter(pic_variants={})
+
+        done = failed = 0
+        if options["enqueue"]:
+            queued = 0
+            for pk in recipes.values_list("pk", flat=True).iterator(chunk_size=options["batch_size"]):
+                jobs.enqueue(
+                    "generate_thumbnails",
+                    {"recipe_id": pk, "force": options["force"]},
+                    dedupe_key=thumbnails_key(pk),
+                )
+                queued += 1
+            self.stdout.write(self.style.SUCCESS(f"Queued thumbnail jobs for {queued} recipes"))
+            return
+
+        for recipe in recipes.iterator(chunk_size=options["batch_size"]):
+            if generate_thumbnails(recipe, force=options["force"]):
+                done += 1
+            else:
+                failed += 1
+            if (done + failed) % options["batch_size"] == 0:
+                self.stdout.write(f"Processed {done + failed} recipes")
+        if done:
+            # List cards show the copies too; bumped once for the whole run
+            bump_version(CATALOG)
+
+        elapsed = time.monotonic() - started
+        self.stdout.write(self.style.SUCCESS(
+            f"Generated thumbnails for {done} recipes in {elapsed:.1f}s"
+            + (f", {failed} pictures could not be read" if failed else "")
+        ))
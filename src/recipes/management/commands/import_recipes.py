@@ -0,0 +1,387 @@
+import json
+import os
+import sys
+import time
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils import timezone
+from recipes import stats
+from recipes.caching import CATALOG, bump_on_commit, bump_version, recipe_namespace
+from recipes.ingredients import parse_ingredients
+from recipes.models import Ingredient, IngredientToken, Recipe, RecipeIngredient
+from recipes.saved import SavedRecipe, saved_namespace
+from recipes.search import tokenize
+
+# Characters read from the input at a time
+READ_SIZE = 64 * 1024
+# A single recipe object larger than this is taken to be malformed input
+MAX_OBJECT_SIZE = 16 * 1024 * 1024
+# Invalid rows described individually before only being counted
+MAX_REPORTED_ERRORS = 20
+
+# Recipe fields an input row may set; updated_at is ignored as it is set on write
+IMPORT_FIELDS = {"name", "ingredients", "cooking_time", "difficulty", "pic",
+                 "pic_width", "pic_height", "pic_variants"}
+IGNORED_FIELDS = {"updated_at"}
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    """
+    Yield the elements of a top-level JSON array one at a time.
+
+    Only the element being decoded and one read's worth of input are held
+    in memory, so arrays of any length stream in constant memory.
+
+    Raises:
+        ValueError: If the input is not a JSON array
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    state = "start"
+
+    while True:
+        while pos < len(buffer) and buffer[pos].isspace():
+            pos += 1
+        if pos == len(buffer):
+            if eof:
+                raise ValueError("Unexpected end of input inside the JSON array")
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+
+        char = buffer[pos]
+        if state == "start":
+            if char != "[":
+                raise ValueError("Expected a JSON array of recipes")
+            pos += 1
+            state = "first"
+            continue
+        if state in ("first", "next") and char == "]":
+            if state == "next":
+                raise ValueError("Trailing comma in the JSON array")
+            return
+        if state == "after":
+            if char == "]":
+                return
+            if char != ",":
+                raise ValueError(f"Expected ',' or ']' between recipes, found {char!r}")
+            pos += 1
+            state = "next"
+            continue
+
+        try:
+            item, end = decoder.raw_decode(buffer, pos)
+            complete = end < len(buffer) or eof or isinstance(item, (dict, list, str))
+        except json.JSONDecodeError:
+            if eof or len(buffer) - pos > MAX_OBJECT_SIZE:
+                raise
+            complete = False
+        if not complete:
+            # The element continues past what has been read so far
+            chunk = stream.read(read_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + chunk, 0
+            continue
+        pos = end
+        state = "after"
+        yield item
+
+
+def iter_ndjson(stream):
+    """Yield one decoded object per non-blank line."""
+    for number, line in enumerate(stream, 1):
+        if line.strip():
+            try:
+                yield json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"Line {number}: {e}")
+
+
+def detect_format(path, stream):
+    """Guess "json" or "ndjson" from the file extension, else the first character."""
+    extension = os.path.splitext(path)[1].lower()
+    if extension in (".ndjson", ".jsonl"):
+        return "ndjson"
+    if extension == ".json" or not stream.seekable():
+        return "json"
+    start = stream.read(READ_SIZE).lstrip()
+    stream.seek(0)
+    return "json" if start.startswith("[") else "ndjson"
+
+
+def parse_row(item):
+    """
+    Split an input object into its recipe pk, fields and saved_by list.
+
+    Takes both Django fixture objects ({"model", "pk", "fields"}) and plain
+    recipe objects with an optional "id".
+
+    Returns:
+        tuple: (pk or None, fields dict, saved_by list or None), or None for
+            fixture objects of other models
+
+    Raises:
+        ValidationError: If the object can't be a recipe
+    """
+    if not isinstance(item, dict):
+        raise ValidationError("expected an object")
+    if "fields" in item:
+        if str(item.get("model", "recipes.recipe")).lower() != "recipes.recipe":
+            return None
+        pk, fields = item.get("pk"), item["fields"]
+        if not isinstance(fields, dict):
+            raise ValidationError("fields must be an object")
+        fields = dict(fields)
+    else:
+        fields = dict(item)
+        pk = fields.pop("id", None)
+
+    if pk is not None and (not isinstance(pk, int) or isinstance(pk, bool) or pk < 1):
+        raise ValidationError(f"invalid id {pk!r}")
+    saved_by = fields.pop("saved_by", None)
+    if saved_by is not None and not isinstance(saved_by, list):
+        raise ValidationError("saved_by must be a list")
+    for name in IGNORED_FIELDS:
+        fields.pop(name, None)
+    unknown = set(fields) - IMPORT_FIELDS
+    if unknown:
+        raise ValidationError(f"unknown fields {', '.join(sorted(unknown))}")
+    return pk, fields, saved_by
+
+
+class Command(BaseCommand):
+    help = "Stream recipes from a JSON fixture or NDJSON file into the database in bulk batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            help="File to import, e.g. moroccan-recipes-fixture.json, or - for standard input",
+        )
+        parser.add_argument(
+            "--format",
+            choices=["auto", "json", "ndjson"],
+            default="auto",
+            help="Input format; a JSON array of objects or one object per line",
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of recipes written per transaction",
+        )
+
+    def handle(self, *args, **options):
+        if options["batch_size"] < 1:
+            raise CommandError("--batch-size must be positive")
+        path = options["path"]
+        try:
+            stream = sys.stdin if path == "-" else open(path, encoding="utf-8")
+        except OSError as e:
+            raise CommandError(f"Could not read {path}: {e}")
+
+        self.counts = {"created": 0, "updated": 0, "invalid": 0, "skipped": 0}
+        self.inserted_pks = False
+        started = time.monotonic()
+        try:
+            fmt = options["format"]
+            if fmt == "auto":
+                fmt = detect_format(path, stream)
+            items = iter_ndjson(stream) if fmt == "ndjson" else iter_json_array(stream)
+
+            batch = []
+            for number, item in enumerate(items, 1):
+                try:
+                    row = parse_row(item)
+                except ValidationError as e:
+                    self.invalid(number, e)
+                    continue
+                if row is None:
+                    self.counts["skipped"] += 1
+                    continue
+                batch.append((number,) + row)
+                if len(batch) >= options["batch_size"]:
+                    self.write_batch(batch)
+                    batch = []
+                    self.progress(started)
+            if batch:
+                self.write_batch(batch)
+        except ValueError as e:
+            raise CommandError(f"Could not parse {path}: {e}")
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+            # Batches written before a failure are committed, so they're
+            # finished off either way
+            counters = self.finish()
+
+        elapsed = time.monotonic() - started
+        written = self.counts["created"] + self.counts["updated"]
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {written} recipes ({self.counts['created']} created, "
+            f"{self.counts['updated']} updated, {self.counts['invalid']} invalid, "
+            f"{self.counts['skipped']} skipped) and {counters} counters in {elapsed:.1f}s "
+            f"({written / elapsed if elapsed else 0:.0f} rows/s)"
+        ))
+
+    def finish(self):
+        """
+        Bring what bulk writes skip up to date after the batches.
+
+        Returns:
+            int: Number of stats counters rebuilt
+        """
+        if self.inserted_pks:
+            # Rows were inserted with explicit ids, which don't advance
+            # PostgreSQL's sequence
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(no_style(), [Recipe]):
+                    cursor.execute(sql)
+        # bulk_create skips the signals that keep these current
+        counters = stats.rebuild()
+        bump_version(CATALOG)
+        return counters
+
+    def invalid(self, number, error):
+        self.counts["invalid"] += 1
+        if self.counts["invalid"] <= MAX_REPORTED_ERRORS:
+            messages = "; ".join(
+                f"{field}: {' '.join(errors)}" for field, errors in error.message_dict.items()
+            ) if hasattr(error, "error_dict") else " ".join(error.messages)
+            self.stderr.write(f"Row {number}: {messages}")
+        elif self.counts["invalid"] == MAX_REPORTED_ERRORS + 1:
+            self.stderr.write("Further invalid rows are counted but not shown")
+
+    def progress(self, started):
+        written = self.counts["created"] + self.counts["updated"]
+        elapsed = time.monotonic() - started
+        self.stdout.write(f"Imported {written} recipes ({written / elapsed if elapsed else 0:.0f} rows/s)")
+
+    def write_batch(self, batch):
+        """
+        Validate and write one batch of parsed rows in a transaction.
+
+        Rows with the id of an existing recipe update only the fields they
+        give; the rest are created. Ingredient lines, search tokens and
+        saved_by rows of the batch are replaced with a few bulk queries.
+        """
+        # The last row wins when an id repeats within the batch
+        rows = {}
+        for number, pk, fields, saved_by in batch:
+            rows[pk if pk is not None else ("new", number)] = (number, pk, fields, saved_by)
+
+        with transaction.atomic():
+            existing = Recipe.objects.in_bulk([pk for _, pk, _, _ in rows.values() if pk is not None])
+            created, updated, reindex, saved = [], [], [], {}
+            update_fields = set()
+            for number, pk, fields, saved_by in rows.values():
+                recipe = existing.get(pk)
+                if recipe is None:
+                    recipe = Recipe(pk=pk)
+                for name, value in fields.items():
+                    setattr(recipe, name, value)
+                try:
+                    recipe.clean_fields(exclude=["id", "saved_by", "updated_at"])
+                except ValidationError as e:
+                    self.invalid(number, e)
+                    continue
+                if pk in existing:
+                    updated.append(recipe)
+                    update_fields.update(fields)
+                    if "ingredients" in fields:
+                        reindex.append(recipe)
+                else:
+                    created.append(recipe)
+                    self.inserted_pks = self.inserted_pks or pk is not None
+                if saved_by is not None:
+                    saved[id(recipe)] = saved_by
+
+            created = Recipe.objects.bulk_create(created)
+            if updated and update_fields:
+                # bulk_update doesn't run auto_now
+                now = timezone.now()
+                for recipe in updated:
+                    recipe.updated_at = now
+                Recipe.objects.bulk_update(updated, sorted(update_fields | {"updated_at"}))
+            for recipe in updated:
+                bump_on_commit(recipe_namespace(recipe.pk))
+
+            self.index(created, reindex)
+            self.save_users(
+                {recipe.pk: saved[id(recipe)] for recipe in created + updated if id(recipe) in saved},
+                replace={recipe.pk for recipe in updated},
+            )
+        self.counts["created"] += len(created)
+        self.counts["updated"] += len(updated)
+
+    def index(self, created, changed):
+        """Write the ingredient lines and search tokens of new and changed recipes."""
+        recipes = created + changed
+        if not recipes:
+            return
+        parsed = {recipe.pk: parse_ingredients(recipe.ingredients) for recipe in recipes}
+        names = {item.name for items in parsed.values() for item in items}
+        Ingredient.objects.bulk_create([Ingredient(name=name) for name in names], ignore_conflicts=True)
+        ingredient_ids = dict(Ingredient.objects.filter(name__in=names).values_list("name", "id"))
+
+        changed_pks = [recipe.pk for recipe in changed]
+        if changed_pks:
+            RecipeIngredient.objects.filter(recipe_id__in=changed_pks).delete()
+            IngredientToken.objects.filter(recipe_id__in=changed_pks).delete()
+        RecipeIngredient.objects.bulk_create([
+            RecipeIngredient(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_ids[item.name],
+                position=position,
+                quantity=item.quantity,
+                unit=item.unit,
+                text=item.text,
+            )
+            for recipe_id, items in parsed.items()
+            for position, item in enumerate(items)
+        ])
+        IngredientToken.objects.bulk_create([
+            IngredientToken(token=token, recipe_id=recipe.pk)
+            for recipe in recipes
+            for token in tokenize(recipe.ingredients)
+        ], ignore_conflicts=True)
+
+    def save_users(self, saved, replace):
+        """
+        Write saved_by rows, given as user ids or usernames, for a batch.
+
+        Updated recipes lose users missing from their new list. Users that
+        don't exist are left out.
+        """
+        if not saved:
+            return
+        ids = {value for users in saved.values() for value in users if isinstance(value, int)}
+        # Natural keys, as dumpdata --natural-foreign writes them, are [username]
+        names = {
+            value[0] if isinstance(value, list) and len(value) == 1 else value
+            for users in saved.values() for value in users if not isinstance(value, int)
+        }
+        names = {name for name in names if isinstance(name, str)}
+        users = User.objects.filter(Q(pk__in=ids) | Q(username__in=names)).values_list("pk", "username")
+        by_name = {username: pk for pk, username in users}
+        known = set(by_name.values())
+
+        rows = []
+        for recipe_id, values in saved.items():
+            for value in values:
+                if isinstance(value, list) and len(value) == 1:
+                    value = value[0]
+                user_id = value if isinstance(value, int) else by_name.get(value)
+                if user_id in known:
+                    rows.append(SavedRecipe(recipe_id=recipe_id, user_id=user_id))
+
+        stale = SavedRecipe.objects.filter(recipe_id__in=replace & saved.keys())
+        affected = set(stale.values_list("user_id", flat=True)) | {row.user_id for row in rows}
+        stale.delete()
+        SavedRecipe.objects.bulk_create(rows, ignore_conflicts=True)
+        for user_id in affected:
+            bump_on_commit(saved_namespace(user_id))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe
+from recipes.search import rebuild_index
+
+
+class Command(BaseCommand):
+    help = "Rebuild the inverted ingredient index for every recipe"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=1000,
+            help="Number of index rows written per bulk insert",
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options["batch_size"]
+        recipes = Recipe.objects.only("id", "ingredients").iterator(
+            chunk_size=batch_size
+        )
+        count = rebuild_index(recipes, batch_size=batch_size)
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} recipes"))
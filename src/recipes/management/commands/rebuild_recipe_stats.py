@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from recipes import stats
+
+
+class Command(BaseCommand):
+    help = "Recompute the analytics counters from the recipe tables"
+
+    def handle(self, *args, **options):
+        count = stats.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Wrote {count} counters"))
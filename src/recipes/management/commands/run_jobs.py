@@ -0,0 +1,76 @@
+import signal
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from recipes import jobs
+from recipes.caching import versions_are_local
+
+# Seconds between deletions of old finished jobs
+PRUNE_INTERVAL = 60 * 60
+
+
+class Command(BaseCommand):
+    help = "Run queued background jobs, such as thumbnail generation, until stopped"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--once",
+            action="store_true",
+            help="Exit once no jobs are due instead of waiting for more",
+        )
+        parser.add_argument(
+            "--max-jobs",
+            type=int,
+            help="Exit after running this many jobs",
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        # Finish the job in hand on shutdown; its lease covers a hard kill
+        previous = {
+            signum: signal.signal(signum, self.stop) for signum in (signal.SIGTERM, signal.SIGINT)
+        }
+        try:
+            self.work(options)
+        finally:
+            for signum, handler in previous.items():
+                signal.signal(signum, handler)
+
+    def work(self, options):
+        worker = jobs.worker_name()
+        self.stdout.write(f"Job worker {worker} started")
+        if versions_are_local():
+            # Jobs invalidate pages by bumping versions, which web workers
+            # on other machines would never see
+            self.stderr.write(self.style.WARNING(
+                "Cache versions are kept on this machine only; run the worker next to "
+                "the web server or use the database or memcached for the versions cache"
+            ))
+        ran = 0
+        pruned_at = None
+        while not self.stopping:
+            if options["max_jobs"] is not None and ran >= options["max_jobs"]:
+                break
+            # Long-lived workers drop connections the database has closed
+            close_old_connections()
+            if pruned_at is None or time.monotonic() - pruned_at >= PRUNE_INTERVAL:
+                pruned_at = time.monotonic()
+                deleted = jobs.prune()
+                if deleted:
+                    self.stdout.write(f"Deleted {deleted} finished jobs")
+
+            job = jobs.claim(worker)
+            if job is not None:
+                jobs.run(job)
+                ran += 1
+                continue
+            if options["once"]:
+                break
+            time.sleep(settings.JOBS['POLL_INTERVAL'])
+
+        close_old_connections()
+        self.stdout.write(self.style.SUCCESS(f"Job worker {worker} ran {ran} jobs"))
+
+    def stop(self, signum, frame):
+        self.stopping = True
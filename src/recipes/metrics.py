@@ -0,0 +1,280 @@
+# src/recipes/metrics.py
+import os
+import time
+import logging
+import threading
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connections
+from django.template.backends.django import DjangoTemplates, Template
+from recipe_app import cache_backends
+
+logger = logging.getLogger(__name__)
+
+TOTALS_KEY = "metrics_totals"
+LOCK_KEY = "metrics_lock"
+LOCK_TIMEOUT = 5
+
+# Histogram bucket upper bounds
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 25, 50, 100)
+
+# Name -> (type, help) of everything exported at /metrics
+METRICS = {
+    "recipe_http_requests_total": (
+        "counter", "Requests served, by route, method and status code."),
+    "recipe_http_request_duration_seconds": (
+        "histogram", "Time from the first middleware to the response, by route."),
+    "recipe_db_queries_per_request": (
+        "histogram", "Database queries run by one request, by route."),
+    "recipe_db_query_duration_seconds_total": (
+        "counter", "Time spent executing database queries, by route."),
+    "recipe_cache_lookups_total": (
+        "counter", "Cache reads, by route and result: local_hit, shared_hit or miss."),
+    "recipe_template_render_duration_seconds": (
+        "histogram", "Time spent rendering templates, by route."),
+}
+
+# What the request being served on this thread or greenlet has done so far
+_current = ContextVar("request_metrics", default=None)
+
+
+class RequestMetrics:
+    """Database, cache and template work done while serving one request."""
+
+    def __init__(self):
+        self.queries = 0
+        self.query_time = 0.0
+        self.render_time = None
+        self.cache_lookups = Counter()
+
+    def time_query(self, execute, sql, params, many, context):
+        """connection.execute_wrapper hook timing every query."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries += 1
+            self.query_time += time.perf_counter() - started
+
+    def instrument(self):
+        """Return a context manager timing queries on every database connection."""
+        stack = ExitStack()
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(self.time_query))
+        return stack
+
+    def activate(self):
+        return _current.set(self)
+
+    @staticmethod
+    def deactivate(token):
+        _current.reset(token)
+
+
+def _record_cache_lookup(result):
+    current = _current.get()
+    if current is not None:
+        current.cache_lookups[result] += 1
+
+
+cache_backends.lookup_hooks.append(_record_cache_lookup)
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        current = _current.get()
+        if current is None:
+            return super().render(context, request)
+        started = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            current.render_time = (current.render_time or 0.0) + time.perf_counter() - started
+
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """The Django template backend, timing each render for the current request."""
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+
+class Registry:
+    """
+    Counters and histograms keyed by metric name and label values.
+
+    Histograms are stored as a list of per-bucket counts followed by the
+    +Inf count and the sum, so registries merge by adding values.
+    """
+
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, name, labels, amount=1):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def observe(self, name, labels, value, buckets):
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            counts = self.values.get(key)
+            if counts is None:
+                counts = self.values[key] = [0] * (len(buckets) + 2)
+            for i, bound in enumerate(buckets):
+                if value <= bound:
+                    counts[i] += 1
+                    break
+            else:
+                counts[len(buckets)] += 1
+            counts[-1] += value
+
+    def drain(self):
+        """Return everything recorded so far and start again from zero."""
+        with self.lock:
+            values, self.values = self.values, {}
+        return values
+
+    def restore(self, values):
+        """Put drained values back, e.g. after a failed flush."""
+        with self.lock:
+            merge(self.values, values)
+
+
+def merge(into, values):
+    for key, value in values.items():
+        current = into.get(key)
+        if current is None:
+            into[key] = list(value) if isinstance(value, list) else value
+        elif isinstance(value, list):
+            into[key] = [a + b for a, b in zip(current, value)]
+        else:
+            into[key] = current + value
+    return into
+
+
+registry = Registry()
+_flushed_at = time.monotonic()
+_flush_lock = threading.Lock()
+
+
+def record(route, method, status, duration, request_metrics):
+    """Add one served request to this process's registry."""
+    registry.inc("recipe_http_requests_total", {
+        "route": route, "method": method, "status": str(status),
+    })
+    labels = {"route": route}
+    registry.observe("recipe_http_request_duration_seconds", labels, duration, LATENCY_BUCKETS)
+    registry.observe(
+        "recipe_db_queries_per_request", labels, request_metrics.queries, QUERY_COUNT_BUCKETS
+    )
+    if request_metrics.query_time:
+        registry.inc("recipe_db_query_duration_seconds_total", labels, request_metrics.query_time)
+    for result, count in request_metrics.cache_lookups.items():
+        registry.inc("recipe_cache_lookups_total", {"route": route, "result": result}, count)
+    if request_metrics.render_time is not None:
+        registry.observe(
+            "recipe_template_render_duration_seconds", labels,
+            request_metrics.render_time, LATENCY_BUCKETS,
+        )
+
+
+def flush(force=False):
+    """
+    Add this process's metrics to the totals in the shared cache.
+
+    Workers are recycled every few requests, so metrics only kept in memory
+    would keep resetting. Each worker flushes at most every
+    METRICS_FLUSH_INTERVAL seconds, and on exit from gunicorn's worker_exit
+    hook. If another worker holds the lock, values wait for the next flush.
+
+    Returns:
+        bool: False if values were left for a later flush
+    """
+    global _flushed_at
+    if not force and time.monotonic() - _flushed_at < settings.METRICS_FLUSH_INTERVAL:
+        return True
+    with _flush_lock:
+        _flushed_at = time.monotonic()
+        values = registry.drain()
+        if not values:
+            return True
+        deadline = time.monotonic() + (LOCK_TIMEOUT if force else 0)
+        while not cache.add(LOCK_KEY, os.getpid(), LOCK_TIMEOUT):
+            if time.monotonic() >= deadline:
+                registry.restore(values)
+                return False
+            time.sleep(0.05)
+        try:
+            totals = cache.get(TOTALS_KEY) or {}
+            cache.set(TOTALS_KEY, merge(totals, values), None)
+        except Exception as e:
+            logger.warning(f"Could not flush metrics: {str(e)}")
+            registry.restore(values)
+            return False
+        finally:
+            cache.delete(LOCK_KEY)
+    return True
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(labels, **extra):
+    pairs = list(labels) + list(extra.items())
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+def _buckets_for(name):
+    if name == "recipe_db_queries_per_request":
+        return QUERY_COUNT_BUCKETS
+    return LATENCY_BUCKETS
+
+
+def render_text(values):
+    """
+    Render metric values in the Prometheus text exposition format.
+
+    Args:
+        values (dict): (name, labels) -> value, as kept by Registry
+
+    Returns:
+        str: One block per metric with HELP and TYPE lines
+    """
+    lines = []
+    for name, (kind, help_text) in METRICS.items():
+        lines.append(f"# HELP {name} {help_text}")
+        lines.append(f"# TYPE {name} {kind}")
+        series = sorted((labels, value) for (metric, labels), value in values.items() if metric == name)
+        for labels, value in series:
+            if kind != "histogram":
+                lines.append(f"{name}{_format_labels(labels)} {value}")
+                continue
+            buckets = _buckets_for(name)
+            cumulative = 0
+            for bound, count in zip(buckets, value):
+                cumulative += count
+                lines.append(f"{name}_bucket{_format_labels(labels, le=bound)} {cumulative}")
+            cumulative += value[len(buckets)]
+            lines.append(f'{name}_bucket{_format_labels(labels, le="+Inf")} {cumulative}')
+            lines.append(f"{name}_sum{_format_labels(labels)} {value[-1]}")
+            lines.append(f"{name}_count{_format_labels(labels)} {cumulative}")
+    return "\n".join(lines) + "\n"
+
+
+def collect():
+    """Flush this worker and return the totals of every worker as text."""
+    flush(force=True)
+    return render_text(cache.get(TOTALS_KEY) or {})
@@ -1,40 +1,176 @@
 # src/recipes/middleware.py
-from django.core.cache import cache
 from django.http import HttpResponse
+from django.middleware.cache import CacheMiddleware
+from django.urls import Resolver404, resolve
+from django.utils.decorators import decorator_from_middleware_with_args
+from .admission import limiter_for, route_class
+from .caching import CATALOG, get_version, jittered
+from .conditional import not_modified, page_validators, set_validators
+from .saved import saved_version
+from . import metrics
+import math
 import time
 import logging
+import threading
 
 logger = logging.getLogger(__name__)
 
+class MetricsMiddleware:
+    """
+    Record latency, database queries, cache lookups and template render time per route.
+
+    Place it first so its latency covers every other middleware. Streamed
+    responses are timed until their first byte is ready.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        request_metrics = metrics.RequestMetrics()
+        token = request_metrics.activate()
+        started = time.perf_counter()
+        try:
+            with request_metrics.instrument():
+                response = self.get_response(request)
+        finally:
+            metrics.RequestMetrics.deactivate(token)
+
+        metrics.record(
+            self.route(request), request.method, response.status_code,
+            time.perf_counter() - started, request_metrics,
+        )
+        metrics.flush()
+        return response
+
+    def route(self, request):
+        # Views may name a finer route, e.g. searches on the list view
+        route = getattr(request, 'metrics_route', None)
+        if route is not None:
+            return route
+        # Responses from the page cache never reach URL resolution
+        match = getattr(request, 'resolver_match', None)
+        if match is None:
+            try:
+                match = resolve(request.path_info)
+            except Resolver404:
+                return 'unmatched'
+        return match.view_name
+
+
 class RateLimitMiddleware:
     """
-    Middleware to handle Neon rate limits by caching some responses
-    and adding delay between requests.
+    Middleware to handle Neon rate limits by answering revalidations of
+    cached pages without the database and admitting a bounded number of
+    database-bound requests at a time.
     """
     def __init__(self, get_response):
         self.get_response = get_response
 
     def __call__(self, request):
-        # For recipe list page and recipe detail pages, check cache first
-        if request.path.startswith('/list/'):
-            cache_key = f"page_cache_{request.path}"
-            cached_response = cache.get(cache_key)
-            
-            if cached_response:
-                logger.debug(f"Serving cached response for {request.path}")
-                return HttpResponse(cached_response, content_type='text/html')
-            
-            # Add slight delay to prevent rate limits
-            time.sleep(0.3)
-            
-            # Process the request
-            response = self.get_response(request)
-            
-            # Cache the response for 60 seconds if successful
-            if response.status_code == 200:
-                logger.debug(f"Caching response for {request.path}")
-                cache.set(cache_key, response.content, 60)
-            
+        # For recipe list page and recipe detail pages, check the client's copy
+        # first. The views cache list pages and recipe data themselves, keyed
+        # by version rather than by visitor, so no bodies are stored here.
+        if request.method == 'GET' and request.path.startswith('/list/'):
+            # Validators come from cache versions, so they cost no queries
+            etag, last_modified = page_validators(request)
+            if etag is not None:
+                response = not_modified(request, etag, last_modified)
+                if response is not None:
+                    logger.debug(f"Client copy of {request.path} is current")
+                    return set_validators(response, etag, last_modified)
+
+        return self.admit(request)
+
+    def admit(self, request):
+        # Requests wait only while their route class is at its limit
+        limiter = limiter_for(route_class(request))
+        if limiter is None:
+            return self.get_response(request)
+
+        if not limiter.acquire():
+            logger.warning(f"Shedding {request.path}: {limiter.name} limit reached")
+            response = HttpResponse("The server is busy, please retry shortly.", status=503)
+            response['Retry-After'] = str(max(1, math.ceil(limiter.max_wait)))
             return response
-        
-        return self.get_response(request)
+        try:
+            response = self.get_response(request)
+        except BaseException:
+            limiter.release()
+            raise
+        if response.streaming:
+            # Streamed bodies keep reading the database after the view returns
+            response.streaming_content = self.release_after(
+                response.streaming_content, limiter
+            )
+        else:
+            limiter.release()
+        return response
+
+    @staticmethod
+    def release_after(content, limiter):
+        # Runs once the body is sent, or when the server closes it early
+        try:
+            yield from content
+        finally:
+            limiter.release()
+
+
+class VersionedCacheMiddleware(CacheMiddleware):
+    """
+    CacheMiddleware whose keys carry a cache namespace version.
+
+    The version is read once when the request arrives and reused when the
+    response is stored, so a page rendered before a bump is never stored
+    under the new version. With per_user, keys also carry the version of
+    the user's saved set, for pages showing saved state. Timeouts are
+    jittered per entry.
+    """
+    def __init__(self, get_response, namespace=CATALOG, per_user=False, **kwargs):
+        self.namespace = namespace
+        self.per_user = per_user
+        self._request = threading.local()
+        super().__init__(get_response, **kwargs)
+
+    @property
+    def key_prefix(self):
+        version = getattr(self._request, 'version', None)
+        if version is None:
+            version = get_version(self.namespace)
+        return f"{self.base_key_prefix}v{version}"
+
+    @key_prefix.setter
+    def key_prefix(self, value):
+        self.base_key_prefix = value
+
+    @property
+    def page_timeout(self):
+        if self.base_page_timeout is None:
+            return None
+        return jittered(self.base_page_timeout)
+
+    @page_timeout.setter
+    def page_timeout(self, value):
+        self.base_page_timeout = value
+
+    def process_request(self, request):
+        version = get_version(self.namespace)
+        if self.per_user:
+            version = f"{version}s{saved_version(request)}"
+        self._request.version = version
+        response = super().process_request(request)
+        if response is not None:
+            self._request.version = None
+        return response
+
+    def process_response(self, request, response):
+        try:
+            return super().process_response(request, response)
+        finally:
+            self._request.version = None
+
+
+def versioned_cache_page(timeout, namespace=CATALOG, per_user=False):
+    """cache_page keyed by the version of a cache namespace."""
+    return decorator_from_middleware_with_args(VersionedCacheMiddleware)(
+        page_timeout=timeout, namespace=namespace, per_user=per_user
+    )
@@ -0,0 +1,87 @@
+# Generated by Django 4.2.17 on 2026-10-18 13:56
+
+import re
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+# The tokenizer as it stood when the index was created, kept here so later
+# changes to recipes.search cannot change what this migration does
+STOP_WORDS = {
+    "a", "an", "and", "or", "of", "to", "the", "for", "with", "taste",
+    "cup", "cups", "tbsp", "tsp", "tablespoon", "tablespoons", "teaspoon",
+    "teaspoons", "lb", "lbs", "oz", "g", "kg", "ml", "l", "pinch",
+}
+
+TOKEN_RE = re.compile(r"[a-z][a-z0-9]*")
+
+
+def normalize_token(word):
+    if word in STOP_WORDS:
+        return ""
+    if len(word) > 4 and word.endswith("ies"):
+        word = word[:-3] + "y"
+    elif len(word) > 4 and word.endswith("oes"):
+        word = word[:-2]
+    elif len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+        word = word[:-1]
+    if word in STOP_WORDS:
+        return ""
+    return word[:64]
+
+
+def tokenize(text):
+    tokens = {normalize_token(word) for word in TOKEN_RE.findall((text or "").lower())}
+    tokens.discard("")
+    return tokens
+
+
+def build_index(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    IngredientToken = apps.get_model("recipes", "IngredientToken")
+    rows = [
+        IngredientToken(token=token, recipe_id=recipe.pk)
+        for recipe in Recipe.objects.only("id", "ingredients").iterator()
+        for token in tokenize(recipe.ingredients)
+    ]
+    IngredientToken.objects.bulk_create(rows, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0003_recipe_saved_by"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="IngredientToken",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("token", models.CharField(max_length=64)),
+                (
+                    "recipe",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="ingredient_tokens",
+                        to="recipes.recipe",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="ingredienttoken",
+            constraint=models.UniqueConstraint(
+                fields=("token", "recipe"), name="unique_ingredient_token"
+            ),
+        ),
+        migrations.RunPython(build_index, migrations.RunPython.noop),
+    ]
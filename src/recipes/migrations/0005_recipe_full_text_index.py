@@ -0,0 +1,90 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:20
+
+from django.db import migrations
+
+# The full-text structures as recipes.fts defined them when this migration
+# was written. recipes.fts.restore() reinstalls the SQLite triggers after
+# later table rebuilds, so the two must stay in step.
+FTS_TABLE = "recipes_recipe_fts"
+
+POSTGRES_INSTALL = [
+    """
+    ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector tsvector
+    GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(name, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(ingredients, '')), 'B')
+    ) STORED
+    """,
+    "CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_idx "
+    "ON recipes_recipe USING GIN (search_vector)",
+]
+
+POSTGRES_UNINSTALL = [
+    "DROP INDEX IF EXISTS recipes_recipe_search_vector_idx",
+    "ALTER TABLE recipes_recipe DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_INSTALL = [
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, ingredients, content='recipes_recipe', content_rowid='id'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, ingredients)
+        VALUES (new.id, new.name, new.ingredients);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, ingredients)
+        VALUES ('delete', old.id, old.name, old.ingredients);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, ingredients)
+        VALUES ('delete', old.id, old.name, old.ingredients);
+        INSERT INTO {FTS_TABLE}(rowid, name, ingredients)
+        VALUES (new.id, new.name, new.ingredients);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def run_statements(schema_editor, statements):
+    with schema_editor.connection.cursor() as cursor:
+        for statement in statements.get(schema_editor.connection.vendor, []):
+            cursor.execute(statement)
+
+
+def install_full_text_index(apps, schema_editor):
+    run_statements(
+        schema_editor, {"postgresql": POSTGRES_INSTALL, "sqlite": SQLITE_INSTALL}
+    )
+
+
+def uninstall_full_text_index(apps, schema_editor):
+    run_statements(
+        schema_editor, {"postgresql": POSTGRES_UNINSTALL, "sqlite": SQLITE_UNINSTALL}
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0004_ingredienttoken"),
+    ]
+
+    operations = [
+        migrations.RunPython(install_full_text_index, uninstall_full_text_index),
+    ]
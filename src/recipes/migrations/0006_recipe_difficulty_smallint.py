@@ -0,0 +1,53 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:41
+
+import django.core.validators
+from django.db import migrations, models
+
+# Named levels used by the Moroccan recipes fixture, on the 1-5 search scale
+NAMED_LEVELS = {"easy": 1, "medium": 3, "hard": 5}
+
+
+def difficulty_to_level(value):
+    value = (value or "").strip().lower()
+    if value in NAMED_LEVELS:
+        return NAMED_LEVELS[value]
+    try:
+        return min(max(int(value), 1), 5)
+    except ValueError:
+        return NAMED_LEVELS["medium"]
+
+
+def normalize_difficulty(apps, schema_editor):
+    # Rewrite the text column to digits so it can be cast in place
+    Recipe = apps.get_model("recipes", "Recipe")
+    for value in Recipe.objects.values_list("difficulty", flat=True).distinct():
+        Recipe.objects.filter(difficulty=value).update(
+            difficulty=str(difficulty_to_level(value))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0005_recipe_full_text_index"),
+    ]
+
+    operations = [
+        migrations.RunPython(normalize_difficulty, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name="recipe",
+            name="difficulty",
+            field=models.PositiveSmallIntegerField(
+                validators=[
+                    django.core.validators.MinValueValidator(1),
+                    django.core.validators.MaxValueValidator(5),
+                ]
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="recipe",
+            index=models.Index(
+                fields=["difficulty", "cooking_time"], name="recipe_difficulty_time_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,97 @@
+# Generated by Django 4.2.17 on 2026-10-18 14:04
+
+from django.db import migrations, models
+from django.db.models import Count
+
+# Upper bound (inclusive) in minutes and label for each cooking time bucket,
+# as recipes.stats defined them when the counters were introduced
+COOKING_TIME_BUCKETS = (
+    (30, "0-30"),
+    (60, "31-60"),
+    (90, "61-90"),
+    (120, "91-120"),
+    (180, "121-180"),
+    (240, "181-240"),
+    (None, "241+"),
+)
+
+
+def cooking_time_bucket(minutes):
+    for upper, label in COOKING_TIME_BUCKETS:
+        if upper is None or minutes <= upper:
+            return label
+
+
+def count_buckets(Recipe, RecipeIngredient):
+    counts = {}
+    per_difficulty = Recipe.objects.values_list("difficulty").annotate(
+        recipe_count=Count("id")
+    ).order_by()
+    for difficulty, recipe_count in per_difficulty:
+        counts[("difficulty", str(difficulty))] = recipe_count
+
+    per_minutes = Recipe.objects.values_list("cooking_time").annotate(
+        recipe_count=Count("id")
+    ).order_by()
+    for minutes, recipe_count in per_minutes:
+        key = ("cooking_time", cooking_time_bucket(minutes))
+        counts[key] = counts.get(key, 0) + recipe_count
+
+    per_ingredient = RecipeIngredient.objects.values_list(
+        "ingredient__name"
+    ).annotate(recipe_count=Count("recipe_id", distinct=True)).order_by()
+    for name, recipe_count in per_ingredient:
+        counts[("ingredients", name)] = recipe_count
+    return counts
+
+
+def fill_stats(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    RecipeIngredient = apps.get_model("recipes", "RecipeIngredient")
+    RecipeStat = apps.get_model("recipes", "RecipeStat")
+    RecipeStat.objects.bulk_create(
+        [
+            RecipeStat(kind=kind, bucket=bucket, count=count)
+            for (kind, bucket), count in count_buckets(Recipe, RecipeIngredient).items()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0008_ingredient_recipeingredient"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RecipeStat",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("kind", models.CharField(max_length=20)),
+                ("bucket", models.CharField(max_length=120)),
+                ("count", models.IntegerField(default=0)),
+            ],
+            options={
+                "indexes": [
+                    models.Index(fields=["kind", "-count"], name="recipe_stat_top_idx")
+                ],
+            },
+        ),
+        migrations.AddConstraint(
+            model_name="recipestat",
+            constraint=models.UniqueConstraint(
+                fields=("kind", "bucket"), name="unique_recipe_stat"
+            ),
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,118 @@
+import re
+
+from django.db import migrations
+
+# The tokenizer as recipes.search defines it since ingredient parsing was
+# added: only the parsed ingredient names are indexed, so units and
+# preparation notes no longer produce tokens. Copied here so later changes
+# to the app cannot change what this migration does.
+STOP_WORDS = {
+    "a", "an", "and", "or", "of", "to", "the", "for", "with", "taste",
+    "cup", "cups", "tbsp", "tsp", "tablespoon", "tablespoons", "teaspoon",
+    "teaspoons", "lb", "lbs", "oz", "g", "kg", "ml", "l", "pinch",
+}
+
+UNITS = {
+    "cup", "cups", "tbsp", "tablespoon", "tablespoons", "tsp", "teaspoon",
+    "teaspoons", "lb", "lbs", "pound", "pounds", "oz", "ounce", "ounces",
+    "g", "gram", "grams", "kg", "ml", "l", "liter", "liters", "clove",
+    "cloves", "pinch", "bunch", "can", "cans",
+}
+
+DESCRIPTORS = {
+    "large", "medium", "small", "fresh", "ground", "chopped", "minced",
+    "sliced", "diced", "dried", "finely", "roughly", "of",
+}
+
+UNICODE_FRACTIONS = {"½": "1/2", "¼": "1/4", "¾": "3/4", "⅓": "1/3", "⅔": "2/3"}
+
+TOKEN_RE = re.compile(r"[a-z][a-z0-9]*")
+BULLET_RE = re.compile(r"^\s*[-*•]\s*")
+PAREN_RE = re.compile(r"\([^)]*\)")
+QUANTITY_RE = re.compile(r"^(\d+\s+\d+/\d+|\d+/\d+|\d+(?:\.\d+)?)(?:\s*-\s*[\d./]+)?\s*")
+TRAILING_RE = re.compile(r"\b(to taste|as needed|optional|for garnish|for serving)\b.*$")
+SPACE_RE = re.compile(r"\s+")
+
+BATCH_SIZE = 1000
+
+
+def singularize(word):
+    if len(word) > 4 and word.endswith("ies"):
+        return word[:-3] + "y"
+    if len(word) > 4 and word.endswith("oes"):
+        return word[:-2]
+    if len(word) > 3 and word.endswith("s") and not word.endswith(("ss", "us")):
+        return word[:-1]
+    return word
+
+
+def ingredient_name(line):
+    text = PAREN_RE.sub(" ", BULLET_RE.sub("", line).strip())
+    for symbol, fraction in UNICODE_FRACTIONS.items():
+        text = text.replace(symbol, f" {fraction}")
+    text = text.strip()
+    text = QUANTITY_RE.sub("", text, count=1)
+
+    words = text.lower().split()
+    if words and words[0].rstrip(".") in UNITS:
+        words.pop(0)
+
+    name = " ".join(words).split(",")[0]
+    name = TRAILING_RE.sub("", name)
+    words = [w for w in re.findall(r"[a-z][a-z0-9'-]*", name) if w not in DESCRIPTORS]
+    if words:
+        words[-1] = singularize(words[-1])
+    return SPACE_RE.sub(" ", " ".join(words)).strip()[:120]
+
+
+def split_ingredient_lines(text):
+    text = (text or "").strip()
+    lines = [line for line in text.splitlines() if line.strip()]
+    if len(lines) > 1 or BULLET_RE.match(text):
+        return lines
+    return [part for part in text.split(",") if part.strip()]
+
+
+def normalize_token(word):
+    if word in STOP_WORDS:
+        return ""
+    word = singularize(word)
+    if word in STOP_WORDS:
+        return ""
+    return word[:64]
+
+
+def tokenize(text):
+    tokens = set()
+    for line in split_ingredient_lines(text):
+        for word in TOKEN_RE.findall(ingredient_name(line)):
+            tokens.add(normalize_token(word))
+    tokens.discard("")
+    return tokens
+
+
+def rebuild_index(apps, schema_editor):
+    Recipe = apps.get_model("recipes", "Recipe")
+    IngredientToken = apps.get_model("recipes", "IngredientToken")
+    IngredientToken.objects.all().delete()
+    rows = []
+    for recipe in Recipe.objects.only("id", "ingredients").iterator(chunk_size=BATCH_SIZE):
+        rows.extend(
+            IngredientToken(token=token, recipe_id=recipe.pk)
+            for token in tokenize(recipe.ingredients)
+        )
+        if len(rows) >= BATCH_SIZE:
+            IngredientToken.objects.bulk_create(rows, ignore_conflicts=True)
+            rows = []
+    IngredientToken.objects.bulk_create(rows, ignore_conflicts=True)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("recipes", "0013_cache_versions_table"),
+    ]
+
+    operations = [
+        migrations.RunPython(rebuild_index, migrations.RunPython.noop),
+    ]
@@ -1,7 +1,9 @@
 # src/recipes/models.py
 from django.db import models
 from django.urls import reverse
+from django.utils import timezone
 from django.contrib.auth.models import User
+from django.core.validators import MaxValueValidator, MinValueValidator
 
 
 class Recipe(models.Model):
@@ -9,11 +11,172 @@ class Recipe(models.Model):
     name = models.CharField(max_length=120)
     ingredients = models.TextField()
     cooking_time = models.IntegerField()
-    difficulty = models.CharField(max_length=20)
+    difficulty = models.PositiveSmallIntegerField(
+        validators=[MinValueValidator(1), MaxValueValidator(5)]
+    )
     pic = models.ImageField(upload_to="recipes", default="no_image.jpg")
+    # Filled in by recipes/thumbnails.py rather than width_field/height_field,
+    # which would open the image whenever a recipe without them is loaded
+    pic_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    pic_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    # Format -> width -> storage name of each resized copy of pic
+    pic_variants = models.JSONField(default=dict, blank=True, editable=False)
+    structured_ingredients = models.ManyToManyField(
+        "Ingredient", through="RecipeIngredient", related_name="recipes", blank=True
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Serves difficulty-only lookups as well as combined search filters
+            models.Index(
+                fields=["difficulty", "cooking_time"],
+                name="recipe_difficulty_time_idx",
+            ),
+            # Keyset pagination walks these in (sort key, pk) order
+            models.Index(fields=["name", "id"], name="recipe_name_id_idx"),
+            models.Index(fields=["cooking_time", "id"], name="recipe_time_id_idx"),
+        ]
 
     def __str__(self):
         return self.name
 
     def get_absolute_url(self):
         return reverse("recipes:recipe_detail", kwargs={"pk": self.pk})
+
+
+class Ingredient(models.Model):
+    """A normalized ingredient name shared by every recipe that uses it."""
+    name = models.CharField(max_length=120, unique=True)
+
+    def __str__(self):
+        return self.name
+
+
+class RecipeIngredient(models.Model):
+    """
+    One parsed line of a recipe's ingredients. Rows are written once when the
+    recipe is saved (see recipes/ingredients.py), never parsed per request.
+    """
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="ingredient_lines"
+    )
+    ingredient = models.ForeignKey(
+        Ingredient, on_delete=models.CASCADE, related_name="recipe_lines"
+    )
+    position = models.PositiveSmallIntegerField()
+    quantity = models.FloatField(null=True, blank=True)
+    unit = models.CharField(max_length=20, blank=True)
+    text = models.CharField(max_length=255)
+
+    class Meta:
+        ordering = ["recipe", "position"]
+        constraints = [
+            models.UniqueConstraint(
+                fields=["recipe", "position"], name="unique_recipe_ingredient_position"
+            )
+        ]
+        indexes = [
+            models.Index(
+                fields=["ingredient", "recipe"], name="recipe_ingredient_lookup_idx"
+            )
+        ]
+
+    def __str__(self):
+        return self.text
+
+
+class IngredientToken(models.Model):
+    """
+    Inverted index entry mapping a normalized ingredient token to a recipe.
+    Rows are maintained by the signal handlers in recipes/signals.py.
+    """
+    token = models.CharField(max_length=64)
+    recipe = models.ForeignKey(
+        Recipe, on_delete=models.CASCADE, related_name="ingredient_tokens"
+    )
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["token", "recipe"], name="unique_ingredient_token"
+            )
+        ]
+
+    def __str__(self):
+        return f"{self.token} -> {self.recipe_id}"
+
+
+class RecipeStat(models.Model):
+    """
+    Running recipe count for one analytics bucket, e.g. difficulty "3" or
+    ingredient "cumin". Kept current incrementally by recipes/stats.py.
+    """
+    kind = models.CharField(max_length=20)
+    bucket = models.CharField(max_length=120)
+    count = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["kind", "bucket"], name="unique_recipe_stat")
+        ]
+        indexes = [
+            # Top-N ingredient lookups read this index in order
+            models.Index(fields=["kind", "-count"], name="recipe_stat_top_idx")
+        ]
+
+    def __str__(self):
+        return f"{self.kind} {self.bucket}: {self.count}"
+
+
+class Job(models.Model):
+    """
+    A unit of background work run by the run_jobs worker, see recipes/jobs.py.
+    """
+    QUEUED = "queued"
+    RUNNING = "running"
+    SUCCEEDED = "succeeded"
+    FAILED = "failed"
+    STATUS_CHOICES = [
+        (QUEUED, "Queued"),
+        (RUNNING, "Running"),
+        (SUCCEEDED, "Succeeded"),
+        (FAILED, "Failed"),
+    ]
+
+    name = models.CharField(max_length=100)
+    # Keyword arguments for the task, so only JSON values
+    args = models.JSONField(default=dict, blank=True)
+    # At most one queued job per key; e.g. "thumbnails_12"
+    dedupe_key = models.CharField(max_length=200, null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    # Earliest time the job may start, pushed back after each failure
+    run_at = models.DateTimeField(default=timezone.now)
+    # Worker holding a running job, until its lease runs out
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_until = models.DateTimeField(null=True, blank=True)
+    result = models.JSONField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["dedupe_key"],
+                condition=models.Q(status="queued"),
+                name="unique_queued_job",
+            )
+        ]
+        indexes = [
+            # The worker polls for due jobs in run_at order
+            models.Index(fields=["status", "run_at"], name="job_due_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} #{self.pk} ({self.status})"
+
+    def get_absolute_url(self):
+        return reverse("recipes:job_status", kwargs={"job_id": self.pk})
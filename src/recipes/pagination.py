@@ -0,0 +1,134 @@
+# src/recipes/pagination.py
+import logging
+from django.core import signing
+from django.db.models import Q
+
+logger = logging.getLogger(__name__)
+
+CURSOR_SALT = "recipes.pagination.cursor"
+
+NEXT = "n"
+PREV = "p"
+
+
+class InvalidCursor(Exception):
+    """Raised when a pagination token is malformed or was tampered with."""
+
+
+class KeysetPage:
+    """A page of results with opaque tokens for its neighbouring pages."""
+
+    def __init__(self, object_list, next_cursor=None, prev_cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Cursor pagination ordered on (sort_key, pk).
+
+    Each page is fetched with a WHERE clause that starts right after the last
+    row of the previous page, so page 1000 costs the same index range scan as
+    page 1. Tokens are signed, so clients can't forge positions.
+    """
+
+    def __init__(self, queryset, sort_key="name", page_size=20):
+        """
+        Args:
+            queryset (QuerySet): Rows to paginate, unordered; models or values() rows
+            sort_key (str): Field or annotation to order by, "-" prefix for descending
+            page_size (int): Rows per page
+        """
+        self.queryset = queryset
+        self.sort_key = sort_key
+        self.descending = sort_key.startswith("-")
+        self.field = sort_key.lstrip("-")
+        self.page_size = page_size
+
+    def encode(self, obj, direction):
+        """
+        Build an opaque token pointing just past obj in the given direction.
+
+        obj is a model instance, or a values() row holding "id" and the sort key.
+        The token names the sort key, so it can't be replayed against another order.
+        """
+        if isinstance(obj, dict):
+            value, pk = obj[self.field], obj["id"]
+        else:
+            value, pk = getattr(obj, self.field), obj.pk
+        return signing.dumps(
+            {"s": self.sort_key, "k": value, "pk": pk, "d": direction},
+            salt=CURSOR_SALT, compress=True,
+        )
+
+    def decode(self, cursor):
+        """
+        Returns:
+            tuple: (sort value, pk, direction)
+
+        Raises:
+            InvalidCursor: If the token is not one we issued, or was issued
+                for another sort key
+        """
+        try:
+            data = signing.loads(cursor, salt=CURSOR_SALT)
+            sort_key, value, pk, direction = data["s"], data["k"], data["pk"], data["d"]
+        except (signing.BadSignature, KeyError, TypeError) as e:
+            raise InvalidCursor(str(e))
+        if sort_key != self.sort_key:
+            raise InvalidCursor(f"Cursor is for sort key {sort_key}, not {self.sort_key}")
+        return value, pk, direction
+
+    def _ordering(self, reverse):
+        descending = self.descending != reverse
+        prefix = "-" if descending else ""
+        return [f"{prefix}{self.field}", f"{prefix}pk"], descending
+
+    def _after(self, value, pk, descending):
+        op = "lt" if descending else "gt"
+        return Q(**{f"{self.field}__{op}": value}) | Q(
+            **{self.field: value, f"pk__{op}": pk}
+        )
+
+    def page(self, cursor=None):
+        """
+        Fetch the page a token points to, or the first page.
+
+        Raises:
+            InvalidCursor: If the token is not one we issued, or was issued
+                for another sort key
+        """
+        direction = NEXT
+        queryset = self.queryset
+        if cursor:
+            value, pk, direction = self.decode(cursor)
+            ordering, descending = self._ordering(reverse=direction == PREV)
+            queryset = queryset.filter(self._after(value, pk, descending))
+        else:
+            ordering, _ = self._ordering(reverse=False)
+
+        # One extra row tells us whether another page exists
+        rows = list(queryset.order_by(*ordering)[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+
+        if direction == PREV:
+            rows.reverse()
+            has_next, has_prev = True, has_more
+        else:
+            has_next, has_prev = has_more, bool(cursor)
+
+        if not rows:
+            return KeysetPage([])
+        return KeysetPage(
+            rows,
+            next_cursor=self.encode(rows[-1], NEXT) if has_next else None,
+            prev_cursor=self.encode(rows[0], PREV) if has_prev else None,
+        )
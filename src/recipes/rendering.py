@@ -0,0 +1,133 @@
+# src/recipes/rendering.py
+import os
+import logging
+import threading
+import multiprocessing
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+_executor = None
+_executor_pid = None
+
+# Renders in flight, keyed by chart cache key, so a chart is drawn once
+# however many requests ask for it at the same time
+_pending = {}
+
+# Modules the forkserver imports once, so every pool worker forks ready to draw
+PRELOAD_MODULES = ["matplotlib", "matplotlib.figure", "matplotlib.backends.backend_agg"]
+
+
+def preload():
+    """Pay matplotlib's import cost now instead of on the first chart."""
+    import matplotlib
+    matplotlib.use("Agg")
+    from matplotlib.figure import Figure  # noqa: F401
+    from matplotlib.backends import backend_agg  # noqa: F401
+
+
+def _render(chart_type, data, analysis_type, fmt, dpi):
+    from .utils import create_chart
+    return create_chart(chart_type, data, analysis_type, fmt=fmt, dpi=dpi)
+
+
+def get_executor():
+    """
+    Return this process's render pool, starting it on first use.
+
+    Workers come from a forkserver, so they don't inherit the gevent hub or
+    open database connections of the web worker. Each gunicorn worker gets
+    its own pool, including after a fork from a preloaded master. The pool
+    starts on the first chart request, as workers recycle every few
+    requests and most never draw a chart.
+
+    Returns:
+        ProcessPoolExecutor: The pool, or None when rendering runs inline
+    """
+    global _executor, _executor_pid
+    processes = settings.CHART_RENDER_PROCESSES
+    if processes <= 0:
+        return None
+    with _lock:
+        if _executor is None or _executor_pid != os.getpid():
+            context = multiprocessing.get_context("forkserver")
+            context.set_forkserver_preload(PRELOAD_MODULES)
+            _executor = ProcessPoolExecutor(
+                max_workers=processes, mp_context=context, initializer=preload
+            )
+            _executor_pid = os.getpid()
+            logger.info(f"Started chart render pool with {processes} processes")
+        return _executor
+
+
+def _discard_executor(executor):
+    global _executor
+    with _lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False)
+
+
+def submit(key, chart_type, data, analysis_type, fmt, dpi, on_done=None):
+    """
+    Queue a chart render, joining one already running for the same key.
+
+    Args:
+        key (str): Identifies the chart, e.g. its cache key
+        chart_type, data, analysis_type, fmt, dpi: Passed to create_chart
+        on_done (callable): Called with the image bytes once rendered, before
+            the returned future resolves
+
+    Returns:
+        Future: Resolves to the image bytes
+    """
+    with _lock:
+        future = _pending.get(key)
+        if future is not None:
+            return future
+        future = Future()
+        _pending[key] = future
+
+    def finish(result=None, error=None):
+        with _lock:
+            _pending.pop(key, None)
+        if error is not None:
+            future.set_exception(error)
+            return
+        if on_done is not None:
+            try:
+                on_done(result)
+            except Exception as e:
+                logger.error(f"Could not store rendered chart {key}: {str(e)}")
+        future.set_result(result)
+
+    executor = get_executor()
+    args = (chart_type, data, analysis_type, fmt, dpi)
+    if executor is None:
+        try:
+            finish(_render(*args))
+        except Exception as e:
+            finish(error=e)
+        return future
+
+    def collect(job):
+        try:
+            finish(job.result())
+        except BrokenProcessPool as e:
+            # A worker died; start a fresh pool for the next render
+            logger.error(f"Chart render pool broke: {str(e)}")
+            _discard_executor(executor)
+            finish(error=e)
+        except Exception as e:
+            finish(error=e)
+
+    try:
+        executor.submit(_render, *args).add_done_callback(collect)
+    except (BrokenProcessPool, RuntimeError) as e:
+        logger.error(f"Chart render pool unavailable: {str(e)}")
+        _discard_executor(executor)
+        finish(error=e)
+    return future
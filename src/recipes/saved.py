@@ -0,0 +1,146 @@
+# src/recipes/saved.py
+from django.contrib.auth import SESSION_KEY
+from django.db import transaction
+from django.db.models.signals import m2m_changed
+from .caching import VERSIONED_TIMEOUT, get_or_compute, get_version, jittered, versioned_key
+from .models import Recipe
+
+SavedRecipe = Recipe.saved_by.through
+
+# Most recipe ids one batch request may save or unsave
+MAX_BATCH_SIZE = 500
+
+
+def saved_namespace(user_id):
+    """Cache namespace of one user's saved set, bumped by recipes/signals.py."""
+    return f"saved_{user_id}"
+
+
+def saved_recipe_ids(user_id):
+    """
+    Return the ids of a user's saved recipes, most recently saved first.
+
+    Loaded with one values_list query and cached until the user's saved set
+    changes, so pages can mark saved recipes and paginate favourites
+    without querying per recipe.
+
+    Returns:
+        tuple: Recipe ids
+    """
+    return get_or_compute(
+        versioned_key(saved_namespace(user_id), f"saved_ids_{user_id}"),
+        lambda: tuple(
+            SavedRecipe.objects.filter(user_id=user_id)
+            .order_by("-id")
+            .values_list("recipe_id", flat=True)
+        ),
+        jittered(VERSIONED_TIMEOUT),
+    )
+
+
+def session_user_id(request):
+    """Return the id of the logged in user from the session, without loading the user."""
+    session = getattr(request, "session", None)
+    if session is None:
+        return None
+    return session.get(SESSION_KEY)
+
+
+def saved_version(request):
+    """Return the version of the requesting user's saved set, 0 when logged out."""
+    user_id = session_user_id(request)
+    if user_id is None:
+        return 0
+    return get_version(saved_namespace(user_id))
+
+
+def toggle_saved(user, recipe_id):
+    """
+    Save a recipe for a user, or unsave it if it was already saved.
+
+    Runs a DELETE on the through table and, only if it removed nothing, an
+    indexed existence check on the recipe and an INSERT. No Recipe or User
+    rows are loaded, and the cost doesn't grow with the user's saved set.
+    Sends m2m_changed as user.saved_recipes.add()/remove() would.
+
+    Args:
+        user (User): The user saving the recipe
+        recipe_id (int): Id of the recipe
+
+    Returns:
+        bool: True if the recipe is now saved, False if unsaved, None if it
+            doesn't exist
+    """
+    with transaction.atomic():
+        deleted, _ = SavedRecipe.objects.filter(user_id=user.pk, recipe_id=recipe_id).delete()
+        if deleted:
+            _send_changed(user, "post_remove", {recipe_id})
+            return False
+        if not Recipe.objects.filter(pk=recipe_id).exists():
+            return None
+        # A concurrent save of the same recipe is not an error
+        SavedRecipe.objects.bulk_create(
+            [SavedRecipe(user_id=user.pk, recipe_id=recipe_id)], ignore_conflicts=True
+        )
+        _send_changed(user, "post_add", {recipe_id})
+    return True
+
+
+def save_many(user, save_ids=(), unsave_ids=()):
+    """
+    Save and unsave many recipes for a user in one transaction.
+
+    Ids already in the wanted state are skipped, and ids of recipes that
+    don't exist are reported rather than failing the batch. An id in both
+    lists ends up saved.
+
+    Args:
+        user (User): The user saving the recipes
+        save_ids (iterable): Ids of recipes to save
+        unsave_ids (iterable): Ids of recipes to unsave
+
+    Returns:
+        dict: Sorted id lists under "saved" and "unsaved" for what changed
+            and "missing" for unknown recipes
+    """
+    save_ids = set(save_ids)
+    unsave_ids = set(unsave_ids) - save_ids
+    with transaction.atomic():
+        existing = set(
+            Recipe.objects.filter(pk__in=save_ids).values_list("pk", flat=True)
+        )
+        already_saved = set(
+            SavedRecipe.objects.filter(user_id=user.pk, recipe_id__in=existing)
+            .values_list("recipe_id", flat=True)
+        )
+        added = existing - already_saved
+        SavedRecipe.objects.bulk_create(
+            [SavedRecipe(user_id=user.pk, recipe_id=pk) for pk in added],
+            ignore_conflicts=True,
+        )
+
+        to_remove = SavedRecipe.objects.filter(user_id=user.pk, recipe_id__in=unsave_ids)
+        removed = set(to_remove.values_list("recipe_id", flat=True))
+        if removed:
+            to_remove.delete()
+
+        _send_changed(user, "post_add", added)
+        _send_changed(user, "post_remove", removed)
+    return {
+        "saved": sorted(added),
+        "unsaved": sorted(removed),
+        "missing": sorted(save_ids - existing),
+    }
+
+
+def _send_changed(user, action, recipe_ids):
+    if recipe_ids:
+        m2m_changed.send(
+            sender=SavedRecipe,
+            instance=user,
+            action=action,
+            reverse=True,
+            model=Recipe,
+            pk_set=set(recipe_ids),
+            using=SavedRecipe.objects.db,
+        )
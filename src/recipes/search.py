@@ -0,0 +1,188 @@
+# src/recipes/search.py
+import re
+import logging
+from django.db import transaction
+from django.db.models import Count, Q
+from .models import IngredientToken
+from .fts import full_text_filter
+from .ingredients import parse_ingredients, singularize
+
+logger = logging.getLogger(__name__)
+
+MATCH_ANY = "any"
+MATCH_ALL = "all"
+
+TOKEN_MAX_LENGTH = 64
+
+# Units and filler words that carry no meaning on their own
+STOP_WORDS = {
+    "a", "an", "and", "or", "of", "to", "the", "for", "with", "taste",
+    "cup", "cups", "tbsp", "tsp", "tablespoon", "tablespoons", "teaspoon",
+    "teaspoons", "lb", "lbs", "oz", "g", "kg", "ml", "l", "pinch",
+}
+
+_TOKEN_RE = re.compile(r"[a-z][a-z0-9]*")
+
+
+def normalize_token(word):
+    """
+    Reduce a lowercase word to its index form by stripping simple plurals.
+
+    Returns:
+        str: Normalized token, or an empty string for stop words
+    """
+    if word in STOP_WORDS:
+        return ""
+    word = singularize(word)
+    if word in STOP_WORDS:
+        return ""
+    return word[:TOKEN_MAX_LENGTH]
+
+
+def tokenize(text):
+    """
+    Split ingredient text into a set of normalized tokens.
+
+    Text goes through the ingredient parser first, so quantities, units and
+    preparation notes never reach the index. Search terms are tokenized the
+    same way, so "ground cumin" finds recipes listing "1 tsp ground cumin".
+
+    Args:
+        text (str): Ingredient text, e.g. "- 2 lbs (900g) chicken thighs"
+
+    Returns:
+        set: Normalized tokens, e.g. {"chicken", "thigh"}
+    """
+    tokens = set()
+    for item in parse_ingredients(text):
+        for word in _TOKEN_RE.findall(item.name):
+            token = normalize_token(word)
+            if token:
+                tokens.add(token)
+    return tokens
+
+
+def index_recipe(recipe):
+    """Bring the IngredientToken rows of a single recipe in line with its text."""
+    tokens = tokenize(recipe.ingredients)
+    with transaction.atomic():
+        existing = set(
+            IngredientToken.objects.filter(recipe_id=recipe.pk).values_list(
+                "token", flat=True
+            )
+        )
+        stale = existing - tokens
+        if stale:
+            IngredientToken.objects.filter(
+                recipe_id=recipe.pk, token__in=stale
+            ).delete()
+        IngredientToken.objects.bulk_create(
+            [IngredientToken(token=t, recipe_id=recipe.pk) for t in tokens - existing],
+            ignore_conflicts=True,
+        )
+
+
+def rebuild_index(recipes, batch_size=1000):
+    """
+    Rebuild the index from scratch for an iterable of recipes.
+
+    Returns:
+        int: Number of recipes indexed
+    """
+    count = 0
+    rows = []
+    with transaction.atomic():
+        IngredientToken.objects.all().delete()
+        for recipe in recipes:
+            rows.extend(
+                IngredientToken(token=t, recipe_id=recipe.pk)
+                for t in tokenize(recipe.ingredients)
+            )
+            count += 1
+            if len(rows) >= batch_size:
+                IngredientToken.objects.bulk_create(rows, ignore_conflicts=True)
+                rows = []
+        IngredientToken.objects.bulk_create(rows, ignore_conflicts=True)
+    logger.info(f"Rebuilt ingredient index for {count} recipes")
+    return count
+
+
+def ingredient_filter(terms, match=MATCH_ANY):
+    """
+    Build a Q object selecting recipes whose ingredients match the search terms.
+
+    Every token of a term must be present for the term to match. With
+    MATCH_ALL every term must match, with MATCH_ANY at least one. Lookups only
+    touch the (token, recipe) index, never the ingredients TextField.
+
+    Args:
+        terms (list): Ingredient search terms, e.g. ["olive oil", "cumin"]
+        match (str): MATCH_ANY or MATCH_ALL
+
+    Returns:
+        Q: Filter for Recipe querysets, or None if no term yields a token
+    """
+    groups = [tokens for tokens in (tokenize(term) for term in terms) if tokens]
+    if not groups:
+        return None
+    if match == MATCH_ALL:
+        groups = [set().union(*groups)]
+
+    condition = Q()
+    for tokens in groups:
+        matching_ids = (
+            IngredientToken.objects.filter(token__in=tokens)
+            .values("recipe_id")
+            .annotate(matched=Count("token"))
+            .filter(matched=len(tokens))
+            .values("recipe_id")
+        )
+        condition |= Q(pk__in=matching_ids)
+    return condition
+
+
+def search_sort_key(cleaned_data, default="name"):
+    """Return the KeysetPaginator sort key for a search; full-text title searches rank best matches first."""
+    if cleaned_data.get("full_text") and cleaned_data.get("recipe_title"):
+        return "-search_rank"
+    return cleaned_data.get("sort") or default
+
+
+def apply_search_filters(queryset, cleaned_data):
+    """
+    Apply RecipesSearchForm filters to a Recipe queryset as one WHERE clause.
+
+    Difficulty and cooking time hit the (difficulty, cooking_time) index,
+    ingredients the inverted index, and full-text titles the FTS index.
+
+    Args:
+        queryset (QuerySet): Recipe queryset to filter
+        cleaned_data (dict): Cleaned RecipesSearchForm data
+
+    Returns:
+        QuerySet: Filtered queryset
+    """
+    recipe_title = cleaned_data.get("recipe_title")
+    recipe_ingredients = cleaned_data.get("recipe_ingredients")
+    difficulty_level = cleaned_data.get("difficulty_level")
+    cooking_time = cleaned_data.get("cooking_time")
+
+    if difficulty_level:
+        queryset = queryset.filter(difficulty__lte=difficulty_level)
+    if cooking_time is not None:
+        queryset = queryset.filter(cooking_time__lte=cooking_time)
+
+    if recipe_title:
+        if cleaned_data.get("full_text"):
+            queryset = full_text_filter(queryset, recipe_title)
+        else:
+            queryset = queryset.filter(name__icontains=recipe_title)
+
+    if recipe_ingredients:
+        match = cleaned_data.get("ingredient_match") or MATCH_ANY
+        condition = ingredient_filter(recipe_ingredients.split(","), match)
+        if condition is None:
+            return queryset.none()
+        queryset = queryset.filter(condition)
+
+    return queryset
@@ -0,0 +1,175 @@
+# src/recipes/signals.py
+from django.db import connections
+from django.db.models.signals import (
+    m2m_changed, post_delete, post_migrate, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from . import fts, jobs, stats, tasks
+from .caching import CATALOG, bump_on_commit, recipe_namespace
+from .models import Recipe
+from .ingredients import sync_ingredients
+from .saved import saved_namespace
+from .search import index_recipe
+
+STAT_FIELDS = {"difficulty", "cooking_time"}
+
+
+@receiver(post_save, sender=Recipe)
+def update_ingredient_index(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Fixture loading saves raw rows; backfill_ingredients and
+    # rebuild_ingredient_index cover those
+    if raw:
+        return
+    if update_fields is not None and "ingredients" not in update_fields:
+        return
+    # Parse once at write time so reads use the structured rows
+    sync_ingredients([instance])
+    index_recipe(instance)
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_new_picture(sender, instance, raw=False, **kwargs):
+    # FileField commits uploads while saving, so only new files are uncommitted here
+    instance._pic_uploaded = (
+        not raw and bool(instance.pic) and not getattr(instance.pic, "_committed", True)
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def make_thumbnails(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    if getattr(instance, "_pic_uploaded", False):
+        # Resizing and uploading run in the job worker, not the request; the
+        # generate_thumbnails command backfills older recipes
+        jobs.enqueue(
+            "generate_thumbnails",
+            {"recipe_id": instance.pk},
+            dedupe_key=tasks.thumbnails_key(instance.pk),
+        )
+
+
+@receiver(pre_save, sender=Recipe)
+def remember_stat_buckets(sender, instance, update_fields=None, raw=False, **kwargs):
+    # Old values are read here so post_save can move the recipe between buckets
+    instance._stat_previous = None
+    if raw or instance.pk is None:
+        return
+    if update_fields is not None and not STAT_FIELDS & set(update_fields):
+        return
+    instance._stat_previous = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list("difficulty", "cooking_time")
+        .first()
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def update_stat_buckets(sender, instance, created, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    if update_fields is not None and not STAT_FIELDS & set(update_fields):
+        return
+    previous = getattr(instance, "_stat_previous", None)
+    new = stats.recipe_buckets(instance.difficulty, instance.cooking_time)
+    old = stats.recipe_buckets(*previous) if previous else []
+    for kind, bucket in old:
+        if (kind, bucket) not in new:
+            stats.adjust(kind, bucket, -1)
+    for kind, bucket in new:
+        if (kind, bucket) not in old:
+            stats.adjust(kind, bucket, 1)
+
+
+@receiver(pre_delete, sender=Recipe)
+def remember_deleted_recipe(sender, instance, **kwargs):
+    # Ingredient rows are cascade-deleted before post_delete runs
+    instance._stat_previous = (instance.difficulty, instance.cooking_time)
+    instance._stat_ingredient_ids = set(
+        instance.ingredient_lines.values_list("ingredient_id", flat=True)
+    )
+
+
+@receiver(post_delete, sender=Recipe)
+def remove_stat_buckets(sender, instance, **kwargs):
+    for kind, bucket in stats.recipe_buckets(*instance._stat_previous):
+        stats.adjust(kind, bucket, -1)
+    stats.adjust_ingredients(instance._stat_ingredient_ids, -1)
+
+
+@receiver(m2m_changed, sender=Recipe.structured_ingredients.through)
+def update_ingredient_stats(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        related = instance.recipes if reverse else instance.structured_ingredients
+        instance._stat_cleared = set(related.values_list("pk", flat=True))
+        return
+    if action == "post_clear":
+        action, pk_set = "post_remove", instance._stat_cleared
+    if action not in ("post_add", "post_remove") or not pk_set:
+        return
+
+    delta = 1 if action == "post_add" else -1
+    if reverse:
+        # instance is an Ingredient gaining or losing recipes
+        stats.adjust(stats.INGREDIENTS, instance.name, delta * len(pk_set))
+    else:
+        stats.adjust_ingredients(pk_set, delta)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.structured_ingredients.through)
+def bump_catalog_version(sender, raw=False, action=None, **kwargs):
+    if raw or (action is not None and not action.startswith("post_")):
+        return
+    bump_on_commit(CATALOG)
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.saved_by.through)
+@receiver(m2m_changed, sender=Recipe.structured_ingredients.through)
+def bump_recipe_versions(sender, instance, raw=False, action=None, reverse=False,
+                         pk_set=None, **kwargs):
+    # Detail pages show saved state too, so saved_by changes count
+    if raw:
+        return
+    if action is None or not reverse:
+        if action is None or action.startswith("post_"):
+            bump_on_commit(recipe_namespace(instance.pk))
+        return
+    # instance is a User or Ingredient; pk_set holds the affected recipes
+    if action == "pre_clear":
+        related = instance.saved_recipes if sender is Recipe.saved_by.through else instance.recipes
+        instance._version_cleared = set(related.values_list("pk", flat=True))
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_version_cleared", set())
+    if action.startswith("post_"):
+        for pk in pk_set or ():
+            bump_on_commit(recipe_namespace(pk))
+
+
+@receiver(m2m_changed, sender=Recipe.saved_by.through)
+def bump_saved_versions(sender, instance, action, reverse=False, pk_set=None, **kwargs):
+    # Cached saved-id sets and the list pages marking saved recipes
+    if reverse:
+        # instance is the User
+        if action.startswith("post_"):
+            bump_on_commit(saved_namespace(instance.pk))
+        return
+    # instance is a Recipe; pk_set holds the affected users
+    if action == "pre_clear":
+        instance._saved_cleared = set(instance.saved_by.values_list("pk", flat=True))
+        return
+    if action == "post_clear":
+        pk_set = getattr(instance, "_saved_cleared", set())
+    if action.startswith("post_"):
+        for pk in pk_set or ():
+            bump_on_commit(saved_namespace(pk))
+
+
+@receiver(post_migrate)
+def restore_full_text_index(sender, using="default", **kwargs):
+    if sender.name == "recipes":
+        fts.restore(connections[using])
@@ -0,0 +1,140 @@
+# src/recipes/stats.py
+import logging
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F
+from .models import Ingredient, Recipe, RecipeIngredient, RecipeStat
+
+logger = logging.getLogger(__name__)
+
+DIFFICULTY = "difficulty"
+COOKING_TIME = "cooking_time"
+INGREDIENTS = "ingredients"
+
+TOP_INGREDIENTS = 10
+
+# Upper bound (inclusive) in minutes and label for each cooking time bucket
+COOKING_TIME_BUCKETS = (
+    (30, "0-30"),
+    (60, "31-60"),
+    (90, "61-90"),
+    (120, "91-120"),
+    (180, "121-180"),
+    (240, "181-240"),
+    (None, "241+"),
+)
+
+
+def cooking_time_bucket(minutes):
+    """Return the label of the cooking time bucket holding minutes."""
+    for upper, label in COOKING_TIME_BUCKETS:
+        if upper is None or minutes <= upper:
+            return label
+
+
+def recipe_buckets(difficulty, cooking_time):
+    """Return the (kind, bucket) pairs a recipe with these values counts towards."""
+    return [
+        (DIFFICULTY, str(difficulty)),
+        (COOKING_TIME, cooking_time_bucket(cooking_time)),
+    ]
+
+
+def adjust(kind, bucket, delta):
+    """
+    Atomically add delta to one counter, creating its row on first use.
+
+    The increment runs as a single UPDATE ... SET count = count + delta, so
+    concurrent writers never lose each other's changes.
+    """
+    if not delta:
+        return
+    counters = RecipeStat.objects.filter(kind=kind, bucket=bucket)
+    if counters.update(count=F("count") + delta):
+        return
+    try:
+        with transaction.atomic():
+            RecipeStat.objects.create(kind=kind, bucket=bucket, count=delta)
+    except IntegrityError:
+        # Another writer created the row first
+        counters.update(count=F("count") + delta)
+
+
+def adjust_ingredients(ingredient_ids, delta):
+    """Move the recipe count of each ingredient by delta."""
+    if not ingredient_ids:
+        return
+    for name in Ingredient.objects.filter(pk__in=ingredient_ids).values_list("name", flat=True):
+        adjust(INGREDIENTS, name, delta)
+
+
+def get_series(kind):
+    """
+    Read the counters for one analysis type in display order.
+
+    Cost depends on the number of buckets only, never on catalog size.
+
+    Returns:
+        dict: Bucket label -> recipe count, empty buckets left out
+    """
+    counters = RecipeStat.objects.filter(kind=kind, count__gt=0)
+    if kind == INGREDIENTS:
+        rows = counters.order_by("-count", "bucket")[:TOP_INGREDIENTS]
+        return dict(rows.values_list("bucket", "count"))
+
+    data = dict(counters.values_list("bucket", "count"))
+    if kind == DIFFICULTY:
+        order = sorted(data, key=int)
+    else:
+        order = [label for _, label in COOKING_TIME_BUCKETS if label in data]
+    return {label: data[label] for label in order}
+
+
+def count_buckets(recipe_model, recipe_ingredient_model):
+    """
+    Aggregate every counter with GROUP BY queries over the given models.
+
+    Returns:
+        dict: (kind, bucket) -> recipe count
+    """
+    counts = {}
+    per_difficulty = recipe_model.objects.values_list("difficulty").annotate(
+        recipe_count=Count("id")
+    ).order_by()
+    for difficulty, recipe_count in per_difficulty:
+        counts[(DIFFICULTY, str(difficulty))] = recipe_count
+
+    per_minutes = recipe_model.objects.values_list("cooking_time").annotate(
+        recipe_count=Count("id")
+    ).order_by()
+    for minutes, recipe_count in per_minutes:
+        key = (COOKING_TIME, cooking_time_bucket(minutes))
+        counts[key] = counts.get(key, 0) + recipe_count
+
+    per_ingredient = recipe_ingredient_model.objects.values_list(
+        "ingredient__name"
+    ).annotate(recipe_count=Count("recipe_id", distinct=True)).order_by()
+    for name, recipe_count in per_ingredient:
+        counts[(INGREDIENTS, name)] = recipe_count
+    return counts
+
+
+def rebuild():
+    """
+    Recompute every counter from the recipe tables.
+
+    Used after bulk writes that bypass model signals, such as loaddata.
+
+    Returns:
+        int: Number of counter rows written
+    """
+    counts = count_buckets(Recipe, RecipeIngredient)
+
+    with transaction.atomic():
+        RecipeStat.objects.all().delete()
+        RecipeStat.objects.bulk_create(
+            [RecipeStat(kind=kind, bucket=bucket, count=count)
+             for (kind, bucket), count in counts.items()],
+            batch_size=1000,
+        )
+    logger.info(f"Rebuilt {len(counts)} recipe stat counters")
+    return len(counts)
@@ -0,0 +1,36 @@
+# src/recipes/tasks.py
+import logging
+from . import thumbnails
+from .caching import CATALOG, bump_version
+from .jobs import enqueue, task
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Thumbnail jobs finishing within this many seconds of each other share one
+# catalog bump, so a backfill doesn't empty the list caches once per recipe
+CATALOG_BUMP_DELAY = 30
+CATALOG_BUMP_KEY = "bump_catalog"
+
+
+def thumbnails_key(recipe_id):
+    return f"thumbnails_{recipe_id}"
+
+
+@task("generate_thumbnails")
+def generate_thumbnails(recipe_id, force=False):
+    """Resize a recipe's picture, uploading the copies to storage."""
+    recipe = Recipe.objects.only("id", "pic", "pic_variants").filter(pk=recipe_id).first()
+    if recipe is None:
+        logger.info(f"Recipe {recipe_id} was deleted before its thumbnails were made")
+        return {"updated": False}
+    updated = thumbnails.generate_thumbnails(recipe, force=force)
+    if updated:
+        enqueue("bump_catalog", dedupe_key=CATALOG_BUMP_KEY, delay=CATALOG_BUMP_DELAY)
+    return {"updated": updated}
+
+
+@task("bump_catalog")
+def bump_catalog():
+    """Move list pages to a new catalog version, e.g. to show new thumbnails."""
+    return {"version": bump_version(CATALOG)}
@@ -0,0 +1,37 @@
+# src/recipes/templatetags/recipe_images.py
+from django import template
+from django.utils.html import format_html
+from recipes.thumbnails import CONTENT_TYPES, fallback_url, srcset
+
+register = template.Library()
+
+# Cards fill their grid column, which is at most about 400px wide
+CARD_SIZES = "(max-width: 700px) 100vw, 400px"
+
+
+@register.simple_tag
+def recipe_picture(recipe, sizes=CARD_SIZES, css_class="recipe-image", loading="lazy"):
+    """
+    Render a recipe's picture as a <picture> letting the browser pick a size.
+
+    Usage: {% recipe_picture object %} or, for a wider image,
+    {% recipe_picture object sizes="(max-width: 900px) 100vw, 900px" loading="eager" %}
+    Falls back to the original picture until thumbnails are generated.
+    """
+    jpeg = srcset(recipe, "jpeg")
+    if not jpeg:
+        return format_html(
+            '<img src="{}" alt="{}" class="{}" loading="{}" decoding="async">',
+            recipe.pic.url, recipe.name, css_class, loading,
+        )
+    dimensions = ""
+    if recipe.pic_width and recipe.pic_height:
+        # Lets the browser reserve space before the image arrives
+        dimensions = format_html(' width="{}" height="{}"', recipe.pic_width, recipe.pic_height)
+    return format_html(
+        '<picture><source type="{}" srcset="{}" sizes="{}">'
+        '<img src="{}" srcset="{}" sizes="{}" alt="{}" class="{}"{} loading="{}" decoding="async">'
+        '</picture>',
+        CONTENT_TYPES["webp"], srcset(recipe, "webp"), sizes,
+        fallback_url(recipe), jpeg, sizes, recipe.name, css_class, dimensions, loading,
+    )
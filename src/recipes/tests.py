@@ -1,9 +1,68 @@
-from django.test import TestCase, Client
+import csv
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from concurrent.futures import Future
+from datetime import timedelta
+from io import BytesIO, StringIO
+from urllib.parse import parse_qs, urlparse
+from unittest import mock
+from django.conf import settings
+from django.core.management import CommandError, call_command
+from django.test import SimpleTestCase, TestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.db import connection
+from psycopg2 import OperationalError
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from recipe_app.db_backend.pool import ConnectionPool, PoolTimeout
+from recipe_app.db_utils import retry_with_backoff
 from django.urls import reverse
+from django.utils import timezone
+from django.utils.http import http_date
 from django.contrib.auth.models import User
+from django.core.cache import cache, caches
+from django import db
 from django.core.files.uploadedfile import SimpleUploadedFile
-from .models import Recipe
+from .models import Recipe, Ingredient, IngredientToken, Job
 from .forms import RecipesSearchForm, RecipeAnalyticsForm
+from .fts import full_text_filter
+from .ingredients import parse_ingredient_line, parse_ingredients
+from . import rendering, stats, views
+from .admission import ConcurrencyLimiter, limiter_for
+from .saved import save_many, saved_recipe_ids, toggle_saved
+from .management.commands import import_recipes
+from .templatetags.recipe_images import recipe_picture
+from . import api, caching, circuit, export, jobs, metrics, thumbnails
+from .caching import CATALOG, get_or_compute, get_version, recipe_namespace
+from .pagination import KeysetPaginator, InvalidCursor
+from .search import (
+    tokenize, ingredient_filter, apply_search_filters, MATCH_ANY, MATCH_ALL
+)
+
+
+# Tests clear the cache freely, so every tier behind the default cache is
+# process memory rather than the files a local server uses
+TEST_CACHES = {
+    alias: config if alias == 'default' else {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': f'test-{alias}',
+        'TIMEOUT': config.get('TIMEOUT', 300),
+    }
+    for alias, config in settings.CACHES.items()
+}
+test_caches = override_settings(CACHES=TEST_CACHES)
+
+
+def setUpModule():
+    test_caches.enable()
+
+
+def tearDownModule():
+    test_caches.disable()
+
 
 class RecipeModelTest(TestCase):
     @classmethod
@@ -30,7 +89,7 @@ class RecipeModelTest(TestCase):
         self.assertEqual(recipe.name, "Test Recipe")
         self.assertEqual(recipe.ingredients, "Test ingredient")
         self.assertEqual(recipe.cooking_time, 30)
-        self.assertEqual(recipe.difficulty, "3")
+        self.assertEqual(recipe.difficulty, 3)
         
         # Test field max lengths
         self.assertEqual(recipe._meta.get_field('name').max_length, 120)
@@ -101,6 +160,50 @@ class RecipeSearchFormTest(TestCase):
         self.assertEqual(form.cleaned_data['recipe_ingredients'], 'salt,pepper,olive oil')
         self.assertEqual(form.cleaned_data['recipe_title'], 'Test Recipe')
 
+class RecipeSearchFilterTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.couscous = Recipe.objects.create(
+            name="Seven Vegetable Couscous",
+            ingredients="couscous, carrots, turnips",
+            cooking_time=180,
+            difficulty=4
+        )
+        cls.mechoui = Recipe.objects.create(
+            name="Mechoui",
+            ingredients="lamb shoulder, cumin",
+            cooking_time=300,
+            difficulty=5
+        )
+
+    def search(self, **data):
+        form = RecipesSearchForm(data=data)
+        self.assertTrue(form.is_valid(), form.errors)
+        return set(apply_search_filters(Recipe.objects.all(), form.cleaned_data))
+
+    def test_cooking_time_uses_full_range(self):
+        """Test cooking times past two hours are no longer clamped"""
+        self.assertEqual(self.search(cooking_time=360), {self.couscous, self.mechoui})
+        self.assertEqual(self.search(cooking_time=200), {self.couscous})
+
+    def test_difficulty_compares_numerically(self):
+        """Test difficulty filters on the integer column"""
+        self.assertEqual(
+            self.search(cooking_time=360, difficulty_level='4'), {self.couscous}
+        )
+
+    def test_filters_combine_in_one_query(self):
+        """Test title, difficulty and time filters run as a single query"""
+        form = RecipesSearchForm(data={
+            'recipe_title': 'couscous', 'difficulty_level': '5', 'cooking_time': 360
+        })
+        self.assertTrue(form.is_valid())
+        with self.assertNumQueries(1):
+            results = list(apply_search_filters(
+                Recipe.objects.only('id', 'name', 'pic'), form.cleaned_data
+            ))
+        self.assertEqual(results, [self.couscous])
+
 class RecipeAnalyticsFormTest(TestCase):
     def test_analytics_form_fields(self):
         """Test analytics form fields"""
@@ -147,6 +250,7 @@ class RecipeViewsTest(TestCase):
 
     def setUp(self):
         self.client = Client()
+        cache.clear()
 
     def test_home_view(self):
         """Test recipe home view"""
@@ -222,7 +326,8 @@ class RecipeViewsTest(TestCase):
 
         # Test with saved recipe
         recipe = Recipe.objects.get(name="Test Recipe 1")
-        self.test_user.saved_recipes.add(recipe)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.test_user.saved_recipes.add(recipe)
         response = self.client.get(reverse('recipes:my_recipes'))
         self.assertEqual(len(response.context['recipes']), 1)
         self.assertIn(recipe, response.context['recipes'])
@@ -286,4 +391,1466 @@ class RecipeViewsTest(TestCase):
                 'difficulty_level': '3'
             }
         )
-        self.assertTrue(len(response.context['recipe_list']) >= 1)
\ No newline at end of file
+        self.assertTrue(len(response.context['recipe_list']) >= 1)
+
+class IngredientIndexTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tagine = Recipe.objects.create(
+            name="Chicken Tagine",
+            ingredients="- 2 lbs (900g) chicken thighs\n- 2 tbsp olive oil\n- 1 tsp ground cumin",
+            cooking_time=90,
+            difficulty="3"
+        )
+        cls.harira = Recipe.objects.create(
+            name="Harira",
+            ingredients="- 1 cup lentils\n- 2 tomatoes, chopped\n- 1 tsp ground cumin",
+            cooking_time=60,
+            difficulty="2"
+        )
+
+    def test_tokenize(self):
+        """Test tokens drop quantities and units and strip plurals"""
+        self.assertEqual(
+            tokenize("- 2 lbs (900g) chicken thighs"), {"chicken", "thigh"}
+        )
+        self.assertEqual(tokenize("2 tomatoes, chopped"), {"tomato"})
+        self.assertEqual(tokenize("ground cumin"), {"cumin"})
+
+    def test_index_maintained_on_save_and_delete(self):
+        """Test index rows follow recipe saves and deletes"""
+        tokens = set(self.harira.ingredient_tokens.values_list('token', flat=True))
+        self.assertIn('lentil', tokens)
+
+        self.harira.ingredients = "- 1 cup chickpeas"
+        self.harira.save()
+        tokens = set(self.harira.ingredient_tokens.values_list('token', flat=True))
+        self.assertEqual(tokens, {'chickpea'})
+
+        pk = self.harira.pk
+        self.harira.delete()
+        self.assertFalse(IngredientToken.objects.filter(recipe_id=pk).exists())
+
+    def test_ingredient_filter_any_and_all(self):
+        """Test AND/OR matching across several ingredients"""
+        any_match = Recipe.objects.filter(
+            ingredient_filter(['olive oil', 'lentils'], MATCH_ANY)
+        )
+        self.assertEqual(set(any_match), {self.tagine, self.harira})
+
+        all_match = Recipe.objects.filter(
+            ingredient_filter(['cumin', 'lentils'], MATCH_ALL)
+        )
+        self.assertEqual(list(all_match), [self.harira])
+
+        self.assertIsNone(ingredient_filter(['2 tbsp'], MATCH_ANY))
+
+
+class IngredientParserTest(TestCase):
+    def test_parse_line(self):
+        """Test quantity, unit and name are split out of a fixture line"""
+        parsed = parse_ingredient_line("- 2 lbs (900g) chicken thighs, bone-in and skin-on")
+        self.assertEqual(parsed.quantity, 2.0)
+        self.assertEqual(parsed.unit, "lb")
+        self.assertEqual(parsed.name, "chicken thigh")
+
+        parsed = parse_ingredient_line("- 1 1/2 cups couscous")
+        self.assertEqual((parsed.quantity, parsed.unit, parsed.name), (1.5, "cup", "couscous"))
+
+        parsed = parse_ingredient_line("- Salt and black pepper to taste")
+        self.assertEqual((parsed.quantity, parsed.name), (None, "salt and black pepper"))
+
+    def test_split_lines_and_comma_lists(self):
+        """Test bulleted text splits on lines and plain text on commas"""
+        self.assertEqual(
+            [p.name for p in parse_ingredients("- 2 onions, sliced\n- 1 tsp cumin")],
+            ["onion", "cumin"]
+        )
+        self.assertEqual(
+            [p.name for p in parse_ingredients("salt, pepper, olive oil")],
+            ["salt", "pepper", "olive oil"]
+        )
+
+    def test_rows_written_on_save(self):
+        """Test saving a recipe stores its parsed ingredient rows"""
+        recipe = Recipe.objects.create(
+            name="Harira",
+            ingredients="- 1 cup lentils\n- 2 tomatoes, chopped",
+            cooking_time=60,
+            difficulty=2
+        )
+        lines = list(recipe.ingredient_lines.select_related('ingredient'))
+        self.assertEqual(
+            [(l.quantity, l.unit, l.ingredient.name) for l in lines],
+            [(1.0, "cup", "lentil"), (2.0, "", "tomato")]
+        )
+
+        recipe.ingredients = "- 1 cup lentils"
+        recipe.save()
+        self.assertEqual(recipe.ingredient_lines.count(), 1)
+        self.assertEqual(Ingredient.objects.filter(name="lentil").count(), 1)
+
+class RecipeStatsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def create(self, name, ingredients, cooking_time, difficulty):
+        return Recipe.objects.create(
+            name=name, ingredients=ingredients, cooking_time=cooking_time, difficulty=difficulty
+        )
+
+    def assertStatsMatchRebuild(self):
+        incremental = {
+            kind: stats.get_series(kind)
+            for kind in (stats.DIFFICULTY, stats.COOKING_TIME, stats.INGREDIENTS)
+        }
+        stats.rebuild()
+        for kind, series in incremental.items():
+            self.assertEqual(series, stats.get_series(kind))
+
+    def test_counters_follow_saves_and_deletes(self):
+        """Test counters move between buckets as recipes change"""
+        tagine = self.create("Tagine", "- 2 onions, sliced\n- 1 tsp cumin", 90, 3)
+        harira = self.create("Harira", "- 1 large onion\n- salt", 45, 2)
+
+        self.assertEqual(stats.get_series(stats.DIFFICULTY), {"2": 1, "3": 1})
+        self.assertEqual(stats.get_series(stats.COOKING_TIME), {"31-60": 1, "61-90": 1})
+        self.assertEqual(stats.get_series(stats.INGREDIENTS)["onion"], 2)
+
+        tagine.cooking_time = 200
+        tagine.ingredients = "- 1 tsp cumin"
+        tagine.save()
+        self.assertEqual(stats.get_series(stats.COOKING_TIME), {"31-60": 1, "181-240": 1})
+        self.assertEqual(stats.get_series(stats.INGREDIENTS)["onion"], 1)
+
+        harira.delete()
+        self.assertEqual(stats.get_series(stats.DIFFICULTY), {"3": 1})
+        self.assertNotIn("onion", stats.get_series(stats.INGREDIENTS))
+        self.assertStatsMatchRebuild()
+
+    def test_m2m_changes_update_ingredient_counts(self):
+        """Test direct structured_ingredients edits are counted"""
+        recipe = self.create("Bread", "- flour", 30, 1)
+        flour = Ingredient.objects.get(name="flour")
+        recipe.structured_ingredients.clear()
+        self.assertEqual(stats.get_series(stats.INGREDIENTS), {})
+
+        flour.recipes.add(recipe, through_defaults={"position": 0, "text": "flour"})
+        self.assertEqual(stats.get_series(stats.INGREDIENTS), {"flour": 1})
+        self.assertStatsMatchRebuild()
+
+    def test_analytics_reads_counters(self):
+        """Test the analytics view charts the counters, not recipe rows"""
+        self.create("Bread", "- flour", 30, 1)
+        with self.assertNumQueries(1):
+            response = self.client.get(self.client.post(
+                reverse('recipes:analytics'),
+                {'analysis_type': 'difficulty', 'chart_type': 'pie'}
+            ).context['chart'])
+        self.assertEqual(response.status_code, 200)
+
+class ChartCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                name="Bread", ingredients="- flour", cooking_time=30, difficulty=1
+            )
+
+    def chart_url(self, **data):
+        data.setdefault('analysis_type', 'difficulty')
+        data.setdefault('chart_type', 'bar')
+        response = self.client.post(reverse('recipes:analytics'), data)
+        return response.context['chart']
+
+    def test_chart_served_with_long_lived_headers(self):
+        """Test charts are served by URL and rendered only once per version"""
+        url = self.chart_url()
+        response = self.client.get(url)
+        self.assertEqual(response['Content-Type'], 'image/png')
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('max-age=31536000', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url).content, response.content)
+
+    def test_svg_output(self):
+        """Test the optional SVG output mode"""
+        response = self.client.get(self.chart_url(output_format='svg'))
+        self.assertEqual(response['Content-Type'], 'image/svg+xml')
+        self.assertIn(b'<svg', response.content)
+
+    def test_version_bumps_when_recipes_change(self):
+        """Test recipe edits move charts to a new URL"""
+        url = self.chart_url()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.difficulty = 4
+            self.recipe.save()
+        new_url = self.chart_url()
+        self.assertNotEqual(url, new_url)
+        self.assertRedirects(self.client.get(url), new_url)
+
+    def test_pending_render_is_polled(self):
+        """Test a render outlasting the wait answers 202 for the client to retry"""
+        url = self.chart_url()
+        with override_settings(CHART_RENDER_WAIT=0), \
+                mock.patch.object(rendering, 'submit', return_value=Future()):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response['Retry-After'], '1')
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    @override_settings(CHART_RENDER_PROCESSES=1)
+    def test_render_pool(self):
+        """Test the pool renders with the Figure API and joins duplicate jobs"""
+        args = ('bar', {'1': 2, '3': 1}, 'difficulty', 'svg', 72)
+        first = rendering.submit('test_chart', *args)
+        second = rendering.submit('test_chart', *args)
+        self.assertIs(first, second)
+        self.assertIn(b'<svg', first.result(timeout=60))
+
+
+class FullTextSearchTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tagine = Recipe.objects.create(
+            name="Chicken Tagine",
+            ingredients="chicken thighs, preserved lemon, olives",
+            cooking_time=90,
+            difficulty="3"
+        )
+        cls.pastilla = Recipe.objects.create(
+            name="Pastilla",
+            ingredients="chicken, almonds, warqa pastry",
+            cooking_time=120,
+            difficulty="5"
+        )
+        cls.harira = Recipe.objects.create(
+            name="Harira",
+            ingredients="lentils, chickpeas, tomatoes",
+            cooking_time=60,
+            difficulty="2"
+        )
+
+    def test_matches_name_and_ingredients_by_rank(self):
+        """Test name matches rank above ingredient-only matches"""
+        results = list(full_text_filter(Recipe.objects.all(), 'chicken'))
+        self.assertEqual(results, [self.tagine, self.pastilla])
+
+    def test_prefix_and_multiple_terms(self):
+        """Test every word must match, as a prefix"""
+        results = full_text_filter(Recipe.objects.all(), 'chick alm')
+        self.assertEqual(list(results), [self.pastilla])
+        self.assertFalse(full_text_filter(Recipe.objects.all(), '"*').exists())
+
+    def test_index_follows_updates_and_deletes(self):
+        """Test the index stays current as recipes change"""
+        self.harira.name = "Harira Soup"
+        self.harira.save()
+        self.assertEqual(
+            list(full_text_filter(Recipe.objects.all(), 'soup')), [self.harira]
+        )
+        self.harira.delete()
+        self.assertFalse(full_text_filter(Recipe.objects.all(), 'soup').exists())
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        for i in range(25):
+            Recipe.objects.create(
+                name=f"Recipe {i:02d}",
+                ingredients="flour, water",
+                cooking_time=10 + (i % 3) * 10,
+                difficulty=1 + i % 5
+            )
+
+    def setUp(self):
+        cache.clear()
+
+    def test_walks_forward_and_back(self):
+        """Test next and prev cursors cover every row exactly once"""
+        paginator = KeysetPaginator(Recipe.objects.all(), 'cooking_time', page_size=10)
+        first = paginator.page()
+        self.assertIsNone(first.prev_cursor)
+
+        seen = list(first)
+        page = first
+        while page.next_cursor:
+            page = paginator.page(page.next_cursor)
+            seen.extend(page)
+        self.assertEqual(len(seen), 25)
+        self.assertEqual(len(set(seen)), 25)
+        self.assertEqual(
+            [(r.cooking_time, r.pk) for r in seen],
+            sorted((r.cooking_time, r.pk) for r in seen)
+        )
+
+        second = paginator.page(first.next_cursor)
+        self.assertEqual(list(paginator.page(second.prev_cursor)), list(first))
+
+    def test_rejects_tampered_cursor(self):
+        """Test forged tokens are refused"""
+        paginator = KeysetPaginator(Recipe.objects.all())
+        with self.assertRaises(InvalidCursor):
+            paginator.page('not-a-cursor')
+
+    def test_rejects_cursor_of_another_sort_key(self):
+        """Test a cursor only pages the order it was issued for"""
+        cursor = KeysetPaginator(Recipe.objects.all(), page_size=10).page().next_cursor
+        with self.assertRaises(InvalidCursor):
+            KeysetPaginator(Recipe.objects.all(), 'cooking_time', page_size=10).page(cursor)
+
+    def test_list_view_pages_filtered_search(self):
+        """Test filtered searches page through GET links and fragments"""
+        response = self.client.post(reverse('recipes:list'), {
+            'recipe_title': 'Recipe', 'cooking_time': 20, 'difficulty_level': ''
+        })
+        self.assertEqual(len(response.context['recipe_list']), 17)
+        self.assertNotIn('next_url', response.context)
+
+        response = self.client.get(reverse('recipes:list'))
+        self.assertEqual(len(response.context['recipe_list']), 20)
+        next_url = response.context['next_url']
+
+        response = self.client.get(reverse('recipes:list') + next_url + '&fragment=1')
+        self.assertTemplateUsed(response, 'recipes/_recipe_cards.html')
+        self.assertTemplateNotUsed(response, 'recipes/main.html')
+        self.assertEqual(len(response.context['recipe_list']), 5)
+        self.assertIn('prev_url', response.context)
+
+
+class StartupImportTest(TestCase):
+    def test_worker_startup_skips_heavy_imports(self):
+        """Test serving plain pages never loads the charting stack"""
+        out = StringIO()
+        call_command('check_import_time', budget=60000, stdout=out)
+        self.assertIn('within the 60000ms budget', out.getvalue())
+        self.assertNotIn('matplotlib', out.getvalue())
+
+
+class ConditionalRequestTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                name="Harira", ingredients="- lentils", cooking_time=60, difficulty=2
+            )
+
+    def test_list_revalidates_without_queries(self):
+        """Test an unchanged list answers conditional GETs with a bare 304"""
+        # The first visit sets the CSRF cookie the page is rendered for
+        self.client.get(reverse('recipes:list'))
+        response = self.client.get(reverse('recipes:list'))
+        self.assertTrue(response['ETag'].startswith('"'))
+        self.assertIn('Last-Modified', response)
+        self.assertIn('no-cache', response['Cache-Control'])
+
+        with self.assertNumQueries(0):
+            response = self.client.get(
+                reverse('recipes:list'), HTTP_IF_NONE_MATCH=response['ETag']
+            )
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+    def test_detail_etag_changes_with_recipe(self):
+        """Test edits and saved state move the detail page to a new ETag"""
+        url = self.recipe.get_absolute_url()
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.cooking_time = 75
+            self.recipe.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+        user = User.objects.create_user(username='cook', password='pw')
+        etag = response['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            user.saved_recipes.add(self.recipe)
+        self.assertNotEqual(self.client.get(url)['ETag'], etag)
+
+    def test_etag_depends_on_session(self):
+        """Test pages rendered for another session don't validate"""
+        self.client.get(reverse('recipes:list'))
+        etag = self.client.get(reverse('recipes:list'))['ETag']
+        self.client.cookies['sessionid'] = 'other'
+        response = self.client.get(reverse('recipes:list'), HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_no_page_copy_per_visitor(self):
+        """Test visitors with their own cookies don't each get a stored page body"""
+        with mock.patch.object(cache, 'set', wraps=cache.set) as cache_set:
+            for session in ('one', 'two'):
+                client = Client()
+                client.cookies['sessionid'] = session
+                client.get(reverse('recipes:list'))
+                client.get(reverse('recipes:list'))
+        keys = [call.args[0] for call in cache_set.call_args_list]
+        self.assertFalse([key for key in keys if key.startswith('page_cache_')])
+
+
+class AdmissionControlTest(TestCase):
+    def test_limiter_queues_then_sheds(self):
+        """Test requests queue for a free slot and are shed past the queue or wait"""
+        limiter = ConcurrencyLimiter('test', concurrency=1, queue=1, max_wait=0.05)
+        self.assertTrue(limiter.acquire())
+        # Queued, but nothing frees the slot within max_wait
+        self.assertFalse(limiter.acquire())
+
+        timer = threading.Timer(0.01, limiter.release)
+        timer.start()
+        limiter.max_wait = 5
+        self.assertTrue(limiter.acquire())
+        timer.join()
+
+        limiter.max_queue = 0
+        self.assertFalse(limiter.acquire())
+        self.assertEqual(limiter.stats()['shed'], 2)
+
+    @override_settings(ADMISSION_LIMITS={
+        'save': {'concurrency': 1, 'queue': 0, 'max_wait': 0.5},
+    })
+    def test_saturated_route_returns_503(self):
+        """Test a route class at its limit sheds with Retry-After, others still run"""
+        limiter = limiter_for('save')
+        self.assertTrue(limiter.acquire())
+        try:
+            response = self.client.get(reverse('recipes:save_recipe', args=[1]))
+            self.assertEqual(response.status_code, 503)
+            self.assertEqual(response['Retry-After'], '1')
+            # Routes without a configured limit are unaffected
+            self.assertEqual(self.client.get(reverse('recipes:home')).status_code, 200)
+        finally:
+            limiter.release()
+        response = self.client.get(reverse('recipes:save_recipe', args=[1]))
+        self.assertEqual(response.status_code, 200)
+
+
+class VersionedCacheTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = Recipe.objects.create(
+                name="Zaalouk", ingredients="- eggplant", cooking_time=40, difficulty=1
+            )
+
+    def test_edits_show_up_immediately(self):
+        """Test cached list and detail pages are replaced as soon as a recipe changes"""
+        self.client.get(reverse('recipes:list'))
+        self.assertContains(self.client.get(reverse('recipes:list')), 'Zaalouk')
+        self.assertContains(self.client.get(self.recipe.get_absolute_url()), '40')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.name = "Taktouka"
+            self.recipe.cooking_time = 35
+            self.recipe.save()
+        self.assertContains(self.client.get(reverse('recipes:list')), 'Taktouka')
+        self.assertContains(self.client.get(self.recipe.get_absolute_url()), '35')
+
+    def test_unreachable_version_store_misses(self):
+        """Test versions fall back to a fresh one when their store can't be read"""
+        started = caching._now_ms()
+        with mock.patch.object(caching.cache, 'get', side_effect=db.OperationalError('down')):
+            self.assertGreaterEqual(get_version(CATALOG), started)
+
+    def test_saved_by_changes_bump_the_recipe(self):
+        """Test saving a recipe invalidates its detail entries but not the list"""
+        catalog = get_version(CATALOG)
+        recipe_version = get_version(recipe_namespace(self.recipe.pk))
+        user = User.objects.create_user(username='cook', password='pw')
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.saved_by.add(user)
+        self.assertEqual(get_version(CATALOG), catalog)
+        self.assertGreater(get_version(recipe_namespace(self.recipe.pk)), recipe_version)
+
+        recipe_version = get_version(recipe_namespace(self.recipe.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            user.saved_recipes.clear()
+        self.assertGreater(get_version(recipe_namespace(self.recipe.pk)), recipe_version)
+
+
+TWO_TIER_CACHES = {
+    'default': {
+        'BACKEND': 'recipe_app.cache_backends.TwoTierCache',
+        'LOCATION': 'two-tier-test',
+        'OPTIONS': {
+            'SHARED': 'shared',
+            'MAX_ENTRIES': 2,
+            'LOCAL_BYPASS_PREFIXES': ['version_', 'circuit_'],
+            'ROUTES': {'circuit_': 'control'},
+        },
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-shared',
+    },
+    'control': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'two-tier-control',
+    },
+}
+
+
+@override_settings(CACHES=TWO_TIER_CACHES)
+class TwoTierCacheTest(TestCase):
+    def setUp(self):
+        caches['default'].clear()
+        self.baseline = caches['default'].stats()
+
+    def stats(self):
+        # Counters are process-wide, so compare against the start of the test
+        stats = caches['default'].stats()
+        return {
+            name: value - self.baseline[name] if name.endswith(('hits', 'misses')) else value
+            for name, value in stats.items()
+        }
+
+    def test_reads_fall_back_to_shared_tier(self):
+        """Test local hits, shared hits after local eviction, and the LRU bound"""
+        cache = caches['default']
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(self.stats()['local_hits'], 1)
+
+        cache.set('b', 2)
+        cache.set('c', 3)
+        self.assertEqual(self.stats()['local_entries'], 2)
+        # 'a' was evicted locally but survives in the shared tier
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(self.stats()['shared_hits'], 1)
+        self.assertIsNone(cache.get('missing'))
+        self.assertEqual(self.stats()['shared_misses'], 1)
+
+    def test_bypassed_keys_stay_coherent(self):
+        """Test version keys always read the shared tier, so other workers' bumps show"""
+        cache = caches['default']
+        cache.set('version_catalog', 1)
+        caches['shared'].set('version_catalog', 2)
+        self.assertEqual(cache.get('version_catalog'), 2)
+        self.assertEqual(self.stats()['local_entries'], 0)
+
+        self.assertFalse(cache.add('version_catalog', 3))
+        cache.delete('version_catalog')
+        self.assertIsNone(caches['shared'].get('version_catalog'))
+
+    def test_routed_keys_use_their_own_cache(self):
+        """Test routed keys go to their own cache instead of the shared tier"""
+        cache = caches['default']
+        cache.set('circuit_database_open_until', 1, None)
+        self.assertEqual(caches['control'].get('circuit_database_open_until'), 1)
+        self.assertIsNone(caches['shared'].get('circuit_database_open_until'))
+        self.assertEqual(self.stats()['local_entries'], 0)
+        self.assertEqual(cache.incr('circuit_database_open_until'), 2)
+        self.assertEqual(cache.get('circuit_database_open_until'), 2)
+
+        cache.clear()
+        self.assertIsNone(caches['control'].get('circuit_database_open_until'))
+
+
+class GetOrComputeTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.calls = 0
+
+    def compute(self):
+        self.calls += 1
+        time.sleep(0.05)
+        return self.calls
+
+    def test_concurrent_misses_compute_once(self):
+        """Test requests missing together share a single computation"""
+        results = []
+        threads = [
+            threading.Thread(target=lambda: results.append(get_or_compute('k', self.compute, 60)))
+            for _ in range(5)
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(results, [1] * 5)
+
+    def test_stale_value_served_while_refreshing(self):
+        """Test an expired value keeps being served while another request refreshes it"""
+        cache.set('k', ('old', time.time() - 1, 0.01), 60)
+        cache.add('compute_lock_k', 1)
+        self.assertEqual(get_or_compute('k', self.compute, 60), 'old')
+        self.assertEqual(self.calls, 0)
+
+        cache.delete('compute_lock_k')
+        self.assertEqual(get_or_compute('k', self.compute, 60), 1)
+        self.assertEqual(get_or_compute('k', self.compute, 60), 1)
+
+    def test_early_refresh(self):
+        """Test values close to expiry may be refreshed before they expire"""
+        cache.set('k', ('old', time.time() + 1, 10.0), 60)
+        with mock.patch.object(caching.random, 'random', return_value=0.5):
+            self.assertEqual(get_or_compute('k', self.compute, 60), 1)
+        self.assertEqual(get_or_compute('k', self.compute, 60, beta=0), 1)
+
+
+class CircuitBreakerTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.breaker = circuit.CircuitBreaker(
+            "test", failure_threshold=2, failure_window=30, reset_timeout=30
+        )
+
+    def fail(self, *args):
+        raise db.OperationalError("rate limit exceeded")
+
+    def test_trips_and_recovers(self):
+        """Test repeated failures open the breaker until a probe succeeds"""
+        for _ in range(2):
+            with self.assertRaises(db.OperationalError):
+                self.breaker.call(self.fail)
+        self.assertEqual(self.breaker.state(), circuit.OPEN)
+        compute = mock.Mock(return_value=1)
+        with self.assertRaises(circuit.CircuitOpen):
+            self.breaker.call(compute)
+        compute.assert_not_called()
+
+        later = time.time() + 31
+        with mock.patch.object(circuit.time, 'time', return_value=later):
+            self.assertEqual(self.breaker.state(), circuit.HALF_OPEN)
+            self.assertTrue(self.breaker.allow())
+            # Only one probe at a time
+            self.assertFalse(self.breaker.allow())
+            cache.delete(self.breaker.probe_key)
+            self.assertEqual(self.breaker.call(compute), 1)
+        self.assertEqual(self.breaker.state(), circuit.CLOSED)
+
+    def test_failed_probe_reopens(self):
+        """Test a failing half-open probe opens the breaker for another cool-down"""
+        self.breaker.trip()
+        later = time.time() + 31
+        with mock.patch.object(circuit.time, 'time', return_value=later):
+            with self.assertRaises(db.OperationalError):
+                self.breaker.call(self.fail)
+            self.assertEqual(self.breaker.state(), circuit.OPEN)
+
+    def test_list_serves_snapshot_when_database_fails(self):
+        """Test the list falls back to its last good page, marked stale and uncached"""
+        Recipe.objects.create(name="Harira", ingredients="- lentils", cooking_time=60, difficulty=2)
+        self.client.get(reverse('recipes:list'))
+
+        caching.bump_version(CATALOG)
+        with mock.patch.object(views.RecipeListView, 'fetch_page', side_effect=self.fail):
+            response = self.client.get(reverse('recipes:list'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.context['stale'])
+        self.assertContains(response, "Harira")
+        self.assertContains(response, "may be out of date")
+        self.assertIn('no-store', response['Cache-Control'])
+        self.assertNotIn('ETag', response)
+
+        # Nothing from the outage was cached
+        response = self.client.get(reverse('recipes:list'))
+        self.assertFalse(response.context['stale'])
+
+    def test_unavailable_without_snapshot(self):
+        """Test a failure with no snapshot to fall back to answers 503"""
+        Recipe.objects.create(name="Harira", ingredients="- lentils", cooking_time=60, difficulty=2)
+        with mock.patch.object(views.RecipeListView, 'fetch_page', side_effect=self.fail):
+            response = self.client.get(reverse('recipes:list'))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('Retry-After', response)
+        self.assertContains(response, "temporarily unavailable", status_code=503)
+
+
+class MetricsTest(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.drain()
+        Recipe.objects.create(name="Harira", ingredients="- lentils", cooking_time=60, difficulty=2)
+
+    def test_requests_are_measured_per_route(self):
+        """Test latency, queries, cache lookups and render time are exported per route"""
+        self.client.get(reverse('recipes:list'))
+        self.client.get(reverse('recipes:list'), {'recipe_title': 'harira'})
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+        text = response.content.decode()
+
+        self.assertIn(
+            'recipe_http_requests_total{method="GET",route="recipes:list",status="200"} 1', text
+        )
+        self.assertIn('recipe_http_request_duration_seconds_count{route="recipes:search"} 1', text)
+        self.assertIn('recipe_http_request_duration_seconds_bucket{route="recipes:list",le="+Inf"} 1', text)
+        self.assertIn('recipe_db_query_duration_seconds_total{route="recipes:list"}', text)
+        self.assertIn('recipe_cache_lookups_total{result="miss",route="recipes:list"}', text)
+        self.assertIn('recipe_template_render_duration_seconds_count{route="recipes:list"} 1', text)
+        self.assertNotIn('recipe_db_queries_per_request_bucket{route="recipes:list",le="0"} 1', text)
+
+    def test_histogram_format(self):
+        """Test histograms render cumulative buckets, sum and count"""
+        registry = metrics.Registry()
+        for value in (0, 3, 200):
+            registry.observe('recipe_db_queries_per_request', {'route': 'x'}, value,
+                             metrics.QUERY_COUNT_BUCKETS)
+        text = metrics.render_text(registry.drain())
+        self.assertIn('# TYPE recipe_db_queries_per_request histogram', text)
+        self.assertIn('recipe_db_queries_per_request_bucket{route="x",le="0"} 1', text)
+        self.assertIn('recipe_db_queries_per_request_bucket{route="x",le="5"} 2', text)
+        self.assertIn('recipe_db_queries_per_request_bucket{route="x",le="100"} 2', text)
+        self.assertIn('recipe_db_queries_per_request_bucket{route="x",le="+Inf"} 3', text)
+        self.assertIn('recipe_db_queries_per_request_sum{route="x"} 203', text)
+        self.assertIn('recipe_db_queries_per_request_count{route="x"} 3', text)
+
+    def test_flush_merges_into_shared_totals(self):
+        """Test workers add their metrics to the shared totals"""
+        metrics.registry.inc('recipe_http_requests_total', {'route': 'x'}, 2)
+        self.assertTrue(metrics.flush(force=True))
+        metrics.registry.inc('recipe_http_requests_total', {'route': 'x'}, 3)
+        self.assertTrue(metrics.flush(force=True))
+        totals = cache.get(metrics.TOTALS_KEY)
+        self.assertEqual(totals[('recipe_http_requests_total', (('route', 'x'),))], 5)
+
+    @override_settings(METRICS_TOKEN='secret')
+    def test_token_required(self):
+        """Test /metrics can be restricted to scrapers holding a token"""
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+
+class BenchmarkCommandTest(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_generate_catalog(self):
+        """Test synthetic recipes come with ingredient rows, index tokens and counters"""
+        out = StringIO()
+        call_command('generate_catalog', count=25, batch_size=10, stdout=out)
+        self.assertEqual(Recipe.objects.count(), 25)
+        recipe = Recipe.objects.first()
+        self.assertTrue(recipe.ingredients.startswith('- '))
+        self.assertTrue(recipe.ingredient_lines.exists())
+        self.assertTrue(recipe.ingredient_tokens.exists())
+        self.assertEqual(
+            sum(stats.get_series(stats.DIFFICULTY).values()), 25
+        )
+
+        # The same seed gives the same catalog
+        names = list(Recipe.objects.order_by('pk').values_list('name', flat=True))
+        call_command('generate_catalog', count=25, clear=True, stdout=out)
+        self.assertEqual(list(Recipe.objects.order_by('pk').values_list('name', flat=True)), names)
+
+    def test_benchmark_report(self):
+        """Test the benchmark reports percentiles and query counts per scenario"""
+        call_command('generate_catalog', count=10, stdout=StringIO())
+        out = StringIO()
+        call_command(
+            'benchmark', requests=4, warmup=1, scenarios='list,detail,save',
+            stdout=out, stderr=StringIO(),
+        )
+        report = json.loads(out.getvalue())
+        self.assertEqual(set(report['scenarios']), {'list', 'detail', 'save'})
+        detail = report['scenarios']['detail']
+        self.assertEqual(detail['requests'], 4)
+        self.assertEqual(detail['errors'], 0)
+        self.assertLessEqual(detail['latency_ms']['p50'], detail['latency_ms']['p99'])
+        self.assertIsNotNone(detail['queries'])
+
+        # The save scenario's writes are undone
+        self.assertFalse(User.objects.filter(username='benchmark').exists())
+        self.assertFalse(Recipe.saved_by.through.objects.exists())
+
+
+class SavedRecipeTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user(username='cook', password='pw')
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(name=f"Recipe {i}", ingredients="- salt", cooking_time=10, difficulty=1)
+            for i in range(30)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_toggle(self):
+        """Test the toggle saves, unsaves and bumps the recipe's detail version"""
+        recipe = self.recipes[0]
+        version = get_version(recipe_namespace(recipe.pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(toggle_saved(self.user, recipe.pk))
+        self.assertTrue(self.user.saved_recipes.filter(pk=recipe.pk).exists())
+        self.assertNotEqual(get_version(recipe_namespace(recipe.pk)), version)
+
+        self.assertFalse(toggle_saved(self.user, recipe.pk))
+        self.assertFalse(self.user.saved_recipes.exists())
+        self.assertIsNone(toggle_saved(self.user, 999999))
+
+    def test_toggle_cost_independent_of_saved_set(self):
+        """Test toggling runs the same few queries however many recipes are saved"""
+        recipe = self.recipes[0]
+        # Savepoint, delete, existence check, insert, release
+        with self.assertNumQueries(5):
+            toggle_saved(self.user, recipe.pk)
+        # Savepoint, delete, release
+        with self.assertNumQueries(3):
+            toggle_saved(self.user, recipe.pk)
+
+        self.user.saved_recipes.add(*self.recipes[1:])
+        with self.assertNumQueries(5):
+            toggle_saved(self.user, recipe.pk)
+        with self.assertNumQueries(3):
+            toggle_saved(self.user, recipe.pk)
+
+    def test_save_many(self):
+        """Test a batch saves and unsaves in one go, skipping no-ops and unknown ids"""
+        self.user.saved_recipes.add(self.recipes[0], self.recipes[1])
+        ids = [recipe.pk for recipe in self.recipes]
+        result = save_many(self.user, save_ids=[ids[1], ids[2], ids[3], 999999], unsave_ids=[ids[0], ids[4]])
+        self.assertEqual(result, {
+            'saved': [ids[2], ids[3]], 'unsaved': [ids[0]], 'missing': [999999],
+        })
+        self.assertEqual(
+            set(self.user.saved_recipes.values_list('pk', flat=True)), {ids[1], ids[2], ids[3]}
+        )
+
+    def test_saved_ids_cached_until_changed(self):
+        """Test the saved-id set loads in one query and reloads after a change"""
+        self.user.saved_recipes.add(self.recipes[0])
+        with self.assertNumQueries(1):
+            self.assertEqual(saved_recipe_ids(self.user.pk), (self.recipes[0].pk,))
+        with self.assertNumQueries(0):
+            saved_recipe_ids(self.user.pk)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.user.saved_recipes.add(self.recipes[1])
+        self.assertEqual(saved_recipe_ids(self.user.pk), (self.recipes[1].pk, self.recipes[0].pk))
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipes[1].saved_by.clear()
+        self.assertEqual(saved_recipe_ids(self.user.pk), (self.recipes[0].pk,))
+
+    def test_list_marks_saved_recipes(self):
+        """Test list cards show saved state, and cached pages follow toggles"""
+        self.client.force_login(self.user)
+        self.client.get(reverse('recipes:list'))
+        response = self.client.get(reverse('recipes:list'))
+        self.assertNotContains(response, 'saved-badge')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(reverse('recipes:save_recipe', args=[self.recipes[0].pk]))
+        response = self.client.get(reverse('recipes:list'))
+        self.assertContains(response, 'saved-badge', count=1)
+
+    def test_my_recipes_paginated(self):
+        """Test favourites are paginated newest first with a constant number of queries"""
+        self.client.force_login(self.user)
+        self.client.get(reverse('recipes:my_recipes'))
+        for recipe in self.recipes[:3]:
+            toggle_saved(self.user, recipe.pk)
+        cache.clear()
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('recipes:my_recipes'))
+
+        for recipe in self.recipes[3:15]:
+            toggle_saved(self.user, recipe.pk)
+        cache.clear()
+        with self.assertNumQueries(len(few)):
+            response = self.client.get(reverse('recipes:my_recipes'))
+        self.assertEqual(len(response.context['recipes']), 12)
+        self.assertEqual(response.context['recipes'][0], self.recipes[14])
+
+        response = self.client.get(reverse('recipes:my_recipes'), {'page': 2})
+        self.assertEqual(len(response.context['recipes']), 3)
+        self.assertContains(response, 'Page 2 of 2')
+
+    def test_batch_endpoint(self):
+        """Test the batch endpoint validates its JSON body and needs a login"""
+        url = reverse('recipes:save_recipes')
+        body = json.dumps({'save': [self.recipes[0].pk]})
+        self.assertEqual(self.client.post(url, body, content_type='application/json').status_code, 401)
+
+        self.client.force_login(self.user)
+        self.assertEqual(self.client.get(url).status_code, 405)
+        response = self.client.post(url, body, content_type='application/json')
+        self.assertEqual(response.json(), {
+            'status': 'ok', 'saved': [self.recipes[0].pk], 'unsaved': [], 'missing': [],
+        })
+        for invalid in ('not json', '[]', '{"save": ["1"]}', '{"unsave": 3}'):
+            response = self.client.post(url, invalid, content_type='application/json')
+            self.assertEqual(response.status_code, 400)
+
+        response = self.client.post(
+            url, json.dumps({'save': list(range(1, 502))}), content_type='application/json'
+        )
+        self.assertEqual(response.status_code, 400)
+
+
+class ThumbnailTest(TestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def upload(self, width=1200, height=800):
+        from PIL import Image
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), 'orange').save(buffer, 'JPEG')
+        return SimpleUploadedFile('tagine.jpg', buffer.getvalue(), content_type='image/jpeg')
+
+    def test_upload_generates_variants(self):
+        """Test uploading a picture stores each width in WebP and JPEG and records its size"""
+        recipe = Recipe.objects.create(
+            name='Tagine', ingredients='- lamb', cooking_time=90, difficulty=3, pic=self.upload()
+        )
+        job = Job.objects.get(name='generate_thumbnails')
+        self.assertEqual(job.args, {'recipe_id': recipe.pk})
+        self.assertEqual(jobs.work_off(), 1)
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.pic_width, recipe.pic_height), (1200, 800))
+        self.assertEqual(set(recipe.pic_variants), {'webp', 'jpeg'})
+        self.assertEqual(set(recipe.pic_variants['webp']), {'320', '640', '960'})
+        storage = recipe.pic.storage
+        for names in recipe.pic_variants.values():
+            for name in names.values():
+                self.assertTrue(storage.exists(name))
+
+        html = recipe_picture(recipe)
+        self.assertIn('type="image/webp"', html)
+        self.assertIn('-320.webp 320w', html)
+        self.assertIn('-960.jpeg 960w', html)
+        self.assertIn('width="1200" height="800"', html)
+        self.assertIn('loading="lazy"', html)
+
+    def test_small_picture_keeps_one_copy(self):
+        """Test pictures narrower than every width still get a copy at their own size"""
+        recipe = Recipe.objects.create(
+            name='Harira', ingredients='- lentils', cooking_time=60, difficulty=2,
+            pic=self.upload(200, 150),
+        )
+        Recipe.objects.filter(pk=recipe.pk).update(updated_at=timezone.now() - timedelta(days=1))
+        self.assertTrue(thumbnails.generate_thumbnails(recipe))
+        self.assertEqual(set(recipe.pic_variants['jpeg']), {'200'})
+        self.assertGreater(Recipe.objects.get(pk=recipe.pk).updated_at, timezone.now() - timedelta(minutes=1))
+
+    def test_unreadable_picture(self):
+        """Test a missing picture leaves the recipe on the original image"""
+        recipe = Recipe.objects.create(name='Msemen', ingredients='- flour', cooking_time=30, difficulty=2)
+        self.assertFalse(thumbnails.generate_thumbnails(recipe))
+        self.assertIn('<img src="', recipe_picture(recipe))
+
+    def test_backfill_command(self):
+        """Test the command only processes recipes without thumbnails unless forced"""
+        recipe = Recipe.objects.create(
+            name='Tagine', ingredients='- lamb', cooking_time=90, difficulty=3, pic=self.upload()
+        )
+        Recipe.objects.create(
+            name='Harira', ingredients='- lentils', cooking_time=60, difficulty=2, pic=self.upload()
+        )
+        version = get_version(CATALOG)
+        out = StringIO()
+        with mock.patch('recipes.management.commands.generate_thumbnails.bump_version',
+                        wraps=caching.bump_version) as bump:
+            call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Generated thumbnails for 2 recipes', out.getvalue())
+        # Once for the run, not per recipe
+        bump.assert_called_once_with(CATALOG)
+        self.assertGreater(get_version(CATALOG), version)
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.pic_width, 1200)
+
+        out = StringIO()
+        call_command('generate_thumbnails', stdout=out)
+        self.assertIn('Generated thumbnails for 0 recipes', out.getvalue())
+
+    def test_queued_backfill_bumps_catalog_once(self):
+        """Test thumbnail jobs finishing together share one delayed catalog bump"""
+        for name in ('Tagine', 'Harira'):
+            Recipe.objects.create(
+                name=name, ingredients='- salt', cooking_time=60, difficulty=2, pic=self.upload()
+            )
+        self.assertEqual(jobs.work_off(), 2)
+        bumps = Job.objects.filter(name='bump_catalog')
+        self.assertEqual(bumps.count(), 1)
+
+        version = get_version(CATALOG)
+        bumps.update(run_at=timezone.now())
+        self.assertEqual(jobs.work_off(), 1)
+        self.assertGreater(get_version(CATALOG), version)
+
+
+class JobQueueTest(TestCase):
+    def setUp(self):
+        self.calls = []
+        self.addCleanup(jobs.registry.pop, 'test_echo', None)
+        self.addCleanup(jobs.registry.pop, 'test_flaky', None)
+
+        @jobs.task('test_echo')
+        def echo(value):
+            self.calls.append(value)
+            return {'value': value}
+
+        @jobs.task('test_flaky')
+        def flaky():
+            self.calls.append('flaky')
+            raise OSError('storage unavailable')
+
+    def test_run_and_status(self):
+        """Test a queued job runs once and its status endpoint reports the result"""
+        job = jobs.enqueue('test_echo', {'value': 3})
+        url = reverse('recipes:job_status', args=[job.pk])
+        self.assertEqual(job.get_absolute_url(), url)
+        self.assertEqual(self.client.get(url).json()['status'], 'queued')
+
+        self.assertEqual(jobs.work_off(), 1)
+        self.assertEqual(self.calls, [3])
+        data = self.client.get(url).json()
+        self.assertEqual(data['status'], 'succeeded')
+        self.assertEqual(data['result'], {'value': 3})
+        self.assertNotIn('last_error', data)
+        self.assertEqual(jobs.work_off(), 0)
+        self.assertEqual(self.client.get(reverse('recipes:job_status', args=[999999])).status_code, 404)
+
+    def test_dedupe(self):
+        """Test equivalent jobs share one queued row, but a running one doesn't count"""
+        first = jobs.enqueue('test_echo', {'value': 1}, dedupe_key='echo')
+        self.assertEqual(jobs.enqueue('test_echo', {'value': 1}, dedupe_key='echo').pk, first.pk)
+        self.assertEqual(Job.objects.count(), 1)
+
+        claimed = jobs.claim()
+        self.assertEqual(claimed.pk, first.pk)
+        second = jobs.enqueue('test_echo', {'value': 1}, dedupe_key='echo')
+        self.assertNotEqual(second.pk, first.pk)
+        with self.assertRaises(ValueError):
+            jobs.enqueue('unknown')
+
+    @override_settings(JOBS={**settings.JOBS, 'MAX_ATTEMPTS': 3, 'RETRY_DELAY': 10})
+    def test_retry_with_backoff(self):
+        """Test failures are retried later with a growing delay, then marked failed"""
+        job = jobs.enqueue('test_flaky')
+        delays = []
+        for attempt in range(3):
+            claimed = jobs.claim()
+            self.assertEqual(claimed.attempts, attempt + 1)
+            started = timezone.now()
+            self.assertFalse(jobs.run(claimed))
+            job.refresh_from_db()
+            if attempt < 2:
+                self.assertEqual(job.status, Job.QUEUED)
+                delays.append((job.run_at - started).total_seconds())
+                # Nothing is due until the delay has passed
+                self.assertIsNone(jobs.claim())
+                Job.objects.filter(pk=job.pk).update(run_at=started)
+        self.assertTrue(5 <= delays[0] <= 10 and 10 <= delays[1] <= 20)
+        self.assertEqual(job.status, Job.FAILED)
+        self.assertIn('storage unavailable', job.last_error)
+        self.assertEqual(len(self.calls), 3)
+
+    def test_lost_lease_is_reclaimed(self):
+        """Test a job whose worker died runs again once its lease expires"""
+        job = jobs.enqueue('test_echo', {'value': 5})
+        self.assertIsNotNone(jobs.claim('dead-worker'))
+        self.assertIsNone(jobs.claim('live-worker'))
+
+        Job.objects.filter(pk=job.pk).update(locked_until=timezone.now() - timedelta(seconds=1))
+        claimed = jobs.claim('live-worker')
+        self.assertEqual((claimed.pk, claimed.attempts), (job.pk, 2))
+        self.assertTrue(jobs.run(claimed))
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), (Job.SUCCEEDED, 'live-worker'))
+
+    def test_worker_command(self):
+        """Test run_jobs --once drains due jobs and prunes old finished ones"""
+        old = jobs.enqueue('test_echo', {'value': 0})
+        Job.objects.filter(pk=old.pk).update(
+            status=Job.SUCCEEDED, finished_at=timezone.now() - timedelta(days=30)
+        )
+        jobs.enqueue('test_echo', {'value': 1})
+        jobs.enqueue('test_echo', {'value': 2})
+        out, err = StringIO(), StringIO()
+        # Closing connections would end the test's transaction
+        with mock.patch('recipes.management.commands.run_jobs.close_old_connections'):
+            call_command('run_jobs', '--once', stdout=out, stderr=err)
+        # The test caches are process memory, which a worker elsewhere can't reach
+        self.assertIn('Cache versions are kept on this machine only', err.getvalue())
+        self.assertIn('ran 2 jobs', out.getvalue())
+        self.assertIn('Deleted 1 finished jobs', out.getvalue())
+        self.assertEqual(self.calls, [1, 2])
+
+
+class ImportRecipesTest(TestCase):
+    def write(self, text, suffix):
+        f = tempfile.NamedTemporaryFile('w', suffix=suffix, delete=False)
+        self.addCleanup(os.unlink, f.name)
+        with f:
+            f.write(text)
+        return f.name
+
+    def test_stream_parser(self):
+        """Test JSON arrays decode element by element across small reads"""
+        data = [{'name': 'a' * 50, 'n': [1, 2, {'x': '],'}]}, 17, 'tail']
+        stream = StringIO(json.dumps(data, indent=2))
+        self.assertEqual(list(import_recipes.iter_json_array(stream, read_size=7)), data)
+        self.assertEqual(list(import_recipes.iter_json_array(StringIO(' [ ] '))), [])
+        for invalid in ('{"name": 1}', '[{"a": 1} {"b": 2}]', '[{"a": 1},]', '[{"a": 1}'):
+            with self.assertRaises(ValueError):
+                list(import_recipes.iter_json_array(StringIO(invalid), read_size=4))
+
+    def test_import_fixture(self):
+        """Test the fixture imports with its ingredient index and counters, and reimports as updates"""
+        fixture = str(settings.BASE_DIR.parent / 'moroccan-recipes-fixture.json')
+        out = StringIO()
+        call_command('import_recipes', fixture, '--batch-size', '4', stdout=out)
+        self.assertIn('6 created, 0 updated', out.getvalue())
+        self.assertIn('rows/s', out.getvalue())
+        self.assertEqual(Recipe.objects.count(), 6)
+        recipe = Recipe.objects.get(pk=1)
+        self.assertEqual(recipe.cooking_time, 90)
+        self.assertTrue(recipe.ingredient_lines.exists())
+        self.assertTrue(IngredientToken.objects.filter(recipe=recipe, token='chicken').exists())
+        self.assertEqual(sum(stats.get_series(stats.DIFFICULTY).values()), 6)
+        lines = recipe.ingredient_lines.count()
+
+        out = StringIO()
+        call_command('import_recipes', fixture, stdout=out)
+        self.assertIn('0 created, 6 updated', out.getvalue())
+        self.assertEqual(Recipe.objects.count(), 6)
+        self.assertEqual(recipe.ingredient_lines.count(), lines)
+        # Ids continue after the imported ones
+        self.assertEqual(
+            Recipe.objects.create(name='New', ingredients='- salt', cooking_time=5, difficulty=1).pk, 7
+        )
+
+    def test_ndjson_rows(self):
+        """Test NDJSON rows are validated, partially update, and fill saved_by"""
+        cook = User.objects.create_user(username='cook', password='pw')
+        other = User.objects.create_user(username='other', password='pw')
+        recipe = Recipe.objects.create(
+            name='Harira', ingredients='- lentils', cooking_time=60, difficulty=2
+        )
+        recipe.saved_by.add(other)
+        long_ago = timezone.now() - timedelta(days=30)
+        Recipe.objects.filter(pk=recipe.pk).update(updated_at=long_ago)
+        rows = [
+            {'id': recipe.pk, 'cooking_time': 45, 'saved_by': ['cook']},
+            {'name': 'Msemen', 'ingredients': '- flour\n- semolina', 'cooking_time': 30,
+             'difficulty': 2, 'saved_by': [cook.pk, ['other'], 'nobody']},
+            {'name': 'Too hard', 'ingredients': '- salt', 'cooking_time': 5, 'difficulty': 9},
+            {'name': 'Colour', 'colour': 'red'},
+            {'model': 'auth.user', 'pk': 5, 'fields': {'username': 'x'}},
+        ]
+        path = self.write('\n'.join(json.dumps(row) for row in rows) + '\n', '.ndjson')
+        out, err = StringIO(), StringIO()
+        call_command('import_recipes', path, stdout=out, stderr=err)
+        self.assertIn('1 created, 1 updated, 2 invalid, 1 skipped', out.getvalue())
+        self.assertIn('Row 3: difficulty', err.getvalue())
+        self.assertIn('Row 4: unknown fields colour', err.getvalue())
+
+        recipe.refresh_from_db()
+        self.assertEqual((recipe.name, recipe.cooking_time), ('Harira', 45))
+        self.assertGreater(recipe.updated_at, long_ago)
+        self.assertEqual(list(recipe.saved_by.all()), [cook])
+        msemen = Recipe.objects.get(name='Msemen')
+        self.assertEqual(set(msemen.saved_by.all()), {cook, other})
+        self.assertEqual(msemen.ingredient_lines.count(), 2)
+
+    def test_failure_keeps_committed_batches_consistent(self):
+        """Test counters and the catalog version catch up with batches written before an error"""
+        path = self.write(
+            '{"name": "Harira", "ingredients": "- lentils", "cooking_time": 60, "difficulty": 2}\n'
+            '{"name": broken\n', '.ndjson'
+        )
+        version = get_version(CATALOG)
+        with self.assertRaises(CommandError):
+            call_command('import_recipes', path, '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(Recipe.objects.count(), 1)
+        self.assertEqual(sum(stats.get_series(stats.DIFFICULTY).values()), 1)
+        self.assertGreater(get_version(CATALOG), version)
+
+
+class ExportTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        Recipe.objects.bulk_create([
+            Recipe(name=f'Recipe {i}, "quoted"', ingredients='- salt\n- 1 cup water',
+                   cooking_time=10 + i, difficulty=1 + i % 5)
+            for i in range(25)
+        ])
+
+    def setUp(self):
+        cache.clear()
+
+    def test_ndjson_endpoint(self):
+        """Test the NDJSON export streams every recipe from values() rows in one query"""
+        url = reverse('recipes:export', args=['ndjson'])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+            body = b''.join(response.streaming_content).decode()
+        self.assertEqual(len([q for q in queries if 'recipes_recipe' in q['sql']]), 1)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson; charset=utf-8')
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual(len(rows), 25)
+        self.assertEqual(list(rows[0]), list(export.FIELDS))
+        self.assertEqual([row['id'] for row in rows], sorted(row['id'] for row in rows))
+
+        # Unchanged catalogs revalidate without a query
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(self.client.get(reverse('recipes:export', args=['xml'])).status_code, 404)
+
+    def test_csv_endpoint(self):
+        """Test the CSV export has a header row and quotes fields"""
+        response = self.client.get(reverse('recipes:export', args=['csv']))
+        rows = list(csv.reader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual(rows[0], list(export.FIELDS))
+        self.assertEqual(len(rows), 26)
+        self.assertEqual(rows[1][1], 'Recipe 0, "quoted"')
+        self.assertEqual(rows[1][2], '- salt\n- 1 cup water')
+
+    def test_admission_slot_held_while_streaming(self):
+        """Test an export keeps its admission slot until the body is sent"""
+        limiter = limiter_for('export')
+        response = self.client.get(reverse('recipes:export', args=['ndjson']))
+        self.assertEqual(limiter.active, 1)
+        b''.join(response.streaming_content)
+        self.assertEqual(limiter.active, 0)
+
+    def test_admission_slot_released_on_early_close(self):
+        """Test a client leaving mid-export gives its admission slot back"""
+        limiter = limiter_for('export')
+        response = self.client.get(reverse('recipes:export', args=['ndjson']))
+        next(iter(response.streaming_content))
+        self.assertEqual(limiter.active, 1)
+        response.close()
+        self.assertEqual(limiter.active, 0)
+
+    def test_database_down(self):
+        """Test an export that can't reach the database answers 503 before streaming"""
+        def rows(*args, **kwargs):
+            # Like a cursor, the query only runs once iteration starts
+            raise db.OperationalError('down')
+            yield
+
+        with mock.patch.object(export, 'export_rows', rows):
+            response = self.client.get(reverse('recipes:export', args=['ndjson']))
+        self.assertEqual(response.status_code, 503)
+        self.assertIn('no-store', response['Cache-Control'])
+
+    def test_command_round_trip(self):
+        """Test the command's NDJSON output imports back as updates"""
+        out = StringIO()
+        call_command('export_recipes', '--chunk-size', '7', stdout=out)
+        self.assertEqual(len(out.getvalue().splitlines()), 25)
+
+        f = tempfile.NamedTemporaryFile('w', suffix='.ndjson', delete=False)
+        self.addCleanup(os.unlink, f.name)
+        with f:
+            f.write(out.getvalue())
+        result = StringIO()
+        call_command('import_recipes', f.name, stdout=result)
+        self.assertIn('0 created, 25 updated, 0 invalid', result.getvalue())
+
+
+class JsonApiTest(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.recipes = Recipe.objects.bulk_create([
+            Recipe(name=f"Recipe {i:02d}", ingredients="- salt\n- cumin" if i % 2 else "- flour",
+                   cooking_time=10 * (i + 1), difficulty=1 + i % 5)
+            for i in range(25)
+        ])
+        call_command('rebuild_ingredient_index', stdout=StringIO())
+
+    def setUp(self):
+        cache.clear()
+
+    def test_list_pages_with_cursors(self):
+        """Test the list walks every recipe through next links with the default fields"""
+        url = reverse('recipes:api_recipes') + '?limit=10'
+        names = []
+        while url:
+            data = self.client.get(url).json()
+            names += [row['name'] for row in data['results']]
+            url = data['next']
+        self.assertEqual(names, sorted(recipe.name for recipe in self.recipes))
+        self.assertEqual(set(data['results'][0]), set(api.LIST_FIELDS))
+
+        previous = self.client.get(data['previous']).json()
+        self.assertEqual(previous['results'][0]['name'], 'Recipe 10')
+
+    def test_sparse_fields_and_search(self):
+        """Test searches filter in the database and select only the requested columns"""
+        url = reverse('recipes:api_recipes')
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, {
+                'recipe_ingredients': 'cumin', 'sort': 'cooking_time', 'fields': 'name,cooking_time',
+            })
+        rows = response.json()['results']
+        self.assertEqual(len(rows), 12)
+        self.assertEqual(rows[0], {'name': 'Recipe 01', 'cooking_time': 20})
+        sql = next(q['sql'] for q in queries if 'recipes_recipe' in q['sql'])
+        self.assertNotIn('"ingredients"', sql.split('FROM')[0])
+
+        self.assertEqual(self.client.get(url, {'fields': 'name,secret'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'limit': '0'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'cursor': 'forged'}).status_code, 400)
+        self.assertEqual(self.client.get(url, {'difficulty_level': '9'}).status_code, 400)
+
+    def test_cursor_of_another_sort_order(self):
+        """Test a cursor reused with another sort is refused without validators"""
+        url = reverse('recipes:api_recipes')
+        cursor = parse_qs(urlparse(self.client.get(url, {'limit': 2}).json()['next']).query)['cursor'][0]
+        response = self.client.get(url, {'sort': 'cooking_time', 'cursor': cursor})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.json(), {'error': 'Invalid cursor'})
+        self.assertFalse(response.has_header('ETag'))
+        self.assertFalse(response.has_header('Last-Modified'))
+        self.assertFalse(self.client.get(reverse('recipes:api_recipe', args=[999999])).has_header('ETag'))
+
+    def test_etag_revalidation(self):
+        """Test unchanged pages revalidate without queries and change with the catalog"""
+        url = reverse('recipes:api_recipes')
+        response = self.client.get(url)
+        self.assertIn('public', response['Cache-Control'])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Recipe.objects.create(name='Aaa first', ingredients='- salt', cooking_time=5, difficulty=1)
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'][0]['name'], 'Aaa first')
+
+    def test_detail(self):
+        """Test the detail endpoint serves all or some fields, and 404s as JSON"""
+        recipe = self.recipes[0]
+        url = reverse('recipes:api_recipe', args=[recipe.pk])
+        data = self.client.get(url).json()
+        self.assertEqual(list(data), list(api.FIELDS))
+        self.assertEqual(data['pic'], '/media/no_image.jpg')
+        self.assertEqual(self.client.get(url, {'fields': 'name'}).json(), {'name': 'Recipe 00'})
+        with self.assertNumQueries(0):
+            self.client.get(url, {'fields': 'difficulty'})
+
+        response = self.client.get(reverse('recipes:api_recipe', args=[999999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'error': 'Recipe not found'})
+
+    def test_detail_last_modified_is_updated_at(self):
+        """Test the detail endpoint's Last-Modified is the recipe's updated_at"""
+        recipe = Recipe.objects.get(pk=self.recipes[0].pk)
+        url = reverse('recipes:api_recipe', args=[recipe.pk])
+        response = self.client.get(url)
+        self.assertEqual(
+            response['Last-Modified'], http_date(timezone.make_aware(recipe.updated_at).timestamp())
+        )
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_database_down(self):
+        """Test the API serves the last good page marked stale, or a 503"""
+        url = reverse('recipes:api_recipes')
+        self.client.get(url)
+        with mock.patch.object(circuit.database, 'allow', return_value=False):
+            # A newer catalog version misses the cache and needs the database
+            caching.bump_version(CATALOG)
+            response = self.client.get(url)
+            self.assertTrue(response.json()['stale'])
+            self.assertIn('no-store', response['Cache-Control'])
+            self.assertFalse(response.has_header('ETag'))
+            self.assertEqual(self.client.get(url, {'limit': 3}).status_code, 503)
+
+    def test_only_default_page_is_snapshotted(self):
+        """Test pages shaped by client input don't leave long-lived snapshots"""
+        url = reverse('recipes:api_recipes')
+        with mock.patch.object(circuit.cache, 'set', wraps=circuit.cache.set) as cache_set:
+            self.client.get(url, {'limit': 3})
+            self.client.get(url, {'recipe_ingredients': 'cumin'})
+            self.client.get(url)
+        snapshots = [c.args[0] for c in cache_set.call_args_list if c.args[0].startswith('snapshot_')]
+        self.assertEqual(len(snapshots), 1)
+
+
+class FakeConnection:
+    def __init__(self, healthy=True):
+        self.closed = False
+        self.autocommit = True
+        self.healthy = healthy
+        self.status = TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def cursor(self):
+        if not self.healthy:
+            raise OperationalError("server closed the connection unexpectedly")
+        return mock.MagicMock()
+
+    def get_transaction_status(self):
+        return self.status
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.status = TRANSACTION_STATUS_IDLE
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def test_connections_are_reused(self):
+        """Test released connections are handed out again instead of reconnecting"""
+        pool = ConnectionPool('test')
+        conn = pool.acquire(FakeConnection)
+        conn.status = TRANSACTION_STATUS_INTRANS
+        pool.release(conn)
+        self.assertEqual(conn.rollbacks, 1)
+        self.assertIs(pool.acquire(FakeConnection), conn)
+        self.assertEqual(pool.stats()['opened'], 1)
+        self.assertEqual(pool.stats()['in_use'], 1)
+
+    def test_full_pool_times_out(self):
+        """Test checkouts wait at most max_wait when every connection is in use"""
+        pool = ConnectionPool('test', max_size=1, max_wait=0.05)
+        conn = pool.acquire(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.acquire(FakeConnection)
+        threading.Timer(0.01, pool.release, [conn]).start()
+        pool.max_wait = 5
+        self.assertIs(pool.acquire(FakeConnection), conn)
+        stats = pool.stats()
+        self.assertEqual((stats['timeouts'], stats['waits']), (1, 2))
+
+    def test_dead_idle_connections_are_replaced(self):
+        """Test idle connections failing their health check are closed and replaced"""
+        pool = ConnectionPool('test', check_after=0)
+        dead = pool.acquire(lambda: FakeConnection(healthy=False))
+        pool.release(dead)
+        conn = pool.acquire(FakeConnection)
+        self.assertIsNot(conn, dead)
+        self.assertTrue(dead.closed)
+        self.assertEqual(pool.stats()['failed_checks'], 1)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    @mock.patch('recipe_app.db_utils.time.sleep')
+    def test_connect_retries_with_backoff(self, sleep):
+        """Test failed connects are retried with growing, jittered delays"""
+        attempts = []
+
+        def connect():
+            attempts.append(1)
+            if len(attempts) < 3:
+                raise OperationalError("too many connections")
+            return 'conn'
+
+        retried = []
+        self.assertEqual(retry_with_backoff(connect, on_retry=retried.append), 'conn')
+        self.assertEqual(len(retried), 2)
+        first, second = [call.args[0] for call in sleep.call_args_list]
+        self.assertGreaterEqual(second, 2.0)
+        self.assertLess(first, 1.5)
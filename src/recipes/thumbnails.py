@@ -0,0 +1,141 @@
+# src/recipes/thumbnails.py
+import hashlib
+import logging
+import posixpath
+from io import BytesIO
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from .caching import bump_on_commit, recipe_namespace
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+# Card and detail images are laid out at most about this wide, in CSS pixels,
+# so these cover 1x and 2x screens
+WIDTHS = (320, 640, 960)
+
+# Browsers take the first format they support, so WebP comes first
+FORMATS = {
+    "webp": {"format": "WEBP", "quality": 80, "method": 4},
+    "jpeg": {"format": "JPEG", "quality": 82, "optimize": True, "progressive": True},
+}
+CONTENT_TYPES = {"webp": "image/webp", "jpeg": "image/jpeg"}
+
+THUMBNAIL_DIR = "thumbnails"
+
+
+def variant_name(source_name, width, fmt):
+    """
+    Storage name of one resized copy of an image.
+
+    Names include a hash of the source name, so replacing a picture gives
+    new URLs and old copies can be cached forever.
+    """
+    stem = posixpath.splitext(posixpath.basename(source_name))[0]
+    digest = hashlib.md5(source_name.encode()).hexdigest()[:8]
+    return f"{THUMBNAIL_DIR}/{stem}-{digest}-{width}.{fmt}"
+
+
+def render_variants(image, widths=WIDTHS):
+    """
+    Resize an image to each width narrower than it, in every format.
+
+    Args:
+        image (PIL.Image.Image): The source picture
+
+    Yields:
+        tuple: (width, format, encoded bytes)
+    """
+    from PIL import Image
+
+    image = image.convert("RGB")
+    # Always keep one copy, even of pictures narrower than the smallest width
+    targets = [width for width in widths if width < image.width] or [image.width]
+    for width in targets:
+        height = max(1, round(image.height * width / image.width))
+        resized = image.resize((width, height), Image.LANCZOS)
+        for fmt, options in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(buffer, **options)
+            yield width, fmt, buffer.getvalue()
+
+
+def generate_thumbnails(recipe, force=False):
+    """
+    Store resized copies of a recipe's picture and record them with its size.
+
+    Goes through the pic field's storage, so it works the same with local
+    MEDIA_ROOT files and Cloudinary. Copies that already exist, e.g. of the
+    shared default picture, are reused unless force is set.
+
+    Only the recipe's own cache namespace is bumped. List cards show the
+    copies too, so callers bump CATALOG once they're done, however many
+    recipes they processed.
+
+    Args:
+        recipe (Recipe): Recipe whose pic to process
+        force (bool): Re-render copies that already exist
+
+    Returns:
+        bool: True if the recipe was updated, False if its picture can't be read
+    """
+    from PIL import Image, ImageOps
+
+    storage = recipe.pic.storage
+    try:
+        with recipe.pic.open("rb") as f:
+            image = ImageOps.exif_transpose(Image.open(f))
+            image.load()
+    except (OSError, ValueError) as e:
+        logger.warning(f"Could not read picture of recipe {recipe.pk}: {str(e)}")
+        return False
+
+    variants = {fmt: {} for fmt in FORMATS}
+    for width, fmt, data in render_variants(image):
+        name = variant_name(recipe.pic.name, width, fmt)
+        if force and storage.exists(name):
+            storage.delete(name)
+        if force or not storage.exists(name):
+            # Storages may pick another name, e.g. Cloudinary's public ids
+            name = storage.save(name, ContentFile(data))
+        variants[fmt][str(width)] = name
+
+    recipe.pic_width, recipe.pic_height = image.size
+    recipe.pic_variants = variants
+    with transaction.atomic():
+        # update() skips the save signals, which would reparse ingredients
+        Recipe.objects.filter(pk=recipe.pk).update(
+            pic_width=recipe.pic_width,
+            pic_height=recipe.pic_height,
+            pic_variants=variants,
+            # Nor does it run auto_now
+            updated_at=timezone.now(),
+        )
+        bump_on_commit(recipe_namespace(recipe.pk))
+    logger.info(f"Stored {sum(map(len, variants.values()))} thumbnails for recipe {recipe.pk}")
+    return True
+
+
+def srcset(recipe, fmt):
+    """
+    Return the srcset attribute value for one format of a recipe's picture.
+
+    Returns:
+        str: e.g. "/media/thumbnails/a-1f2e3d4c-320.webp 320w, ...", or ""
+            if no copies were made yet
+    """
+    names = (recipe.pic_variants or {}).get(fmt) or {}
+    storage = recipe.pic.storage
+    return ", ".join(
+        f"{storage.url(name)} {width}w"
+        for width, name in sorted(names.items(), key=lambda item: int(item[0]))
+    )
+
+
+def fallback_url(recipe):
+    """URL for browsers without srcset: the smallest JPEG copy, else the original."""
+    names = (recipe.pic_variants or {}).get("jpeg") or {}
+    if not names:
+        return recipe.pic.url
+    return recipe.pic.storage.url(names[min(names, key=int)])
@@ -1,6 +1,6 @@
 from django.urls import path
 from .views import RecipeListView, RecipeDetailView, recipe_home, RecipeAnalyticsView
-from . import views
+from . import api, views
 
 app_name = "recipes"
 
@@ -9,6 +9,16 @@ urlpatterns = [
     path("list/", RecipeListView.as_view(), name="list"),
     path("list/<pk>/", RecipeDetailView.as_view(), name="recipe_detail"),
     path("data/", RecipeAnalyticsView.as_view(), name="analytics"),
+    path(
+        "data/chart/<slug:analysis_type>/<slug:chart_type>.<slug:fmt>",
+        views.chart_image,
+        name="chart",
+    ),
     path("my-recipes/", views.my_recipes, name="my_recipes"),
     path("save-recipe/<int:recipe_id>/", views.save_recipe, name="save_recipe"),
+    path("save-recipes/", views.save_recipes, name="save_recipes"),
+    path("export/recipes.<slug:fmt>", views.export_recipes, name="export"),
+    path("api/recipes/", api.recipe_list, name="api_recipes"),
+    path("api/recipes/<int:pk>/", api.recipe_detail, name="api_recipe"),
+    path("jobs/<int:job_id>/", views.job_status, name="job_status"),
 ]
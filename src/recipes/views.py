@@ -1,122 +1,228 @@
-from django.shortcuts import render
+from django.shortcuts import render, redirect
+from django.urls import reverse
 from django.views.generic import ListView, DetailView, TemplateView
-from .models import Recipe
+from .models import Job, Recipe
 from django.contrib.auth.decorators import login_required
 from django.db.models import Q
-from .forms import RecipesSearchForm, RecipeAnalyticsForm
-from .utils import create_chart
-from django.http import JsonResponse
+from .forms import RecipesSearchForm, RecipeAnalyticsForm, ANALYSIS_CHOICES, CHART_CHOICES
+from .caching import (
+    CATALOG, VERSIONED_TIMEOUT, get_or_compute, get_version, jittered, recipe_namespace,
+    versioned_key,
+)
+from .middleware import versioned_cache_page
+from .conditional import (
+    catalog_etag, catalog_last_modified, conditional_page, detail_etag, detail_last_modified,
+    list_etag, list_last_modified,
+)
+from .charts import CONTENT_TYPES, RenderPending, get_chart
+from .circuit import DATABASE_ERRORS, CircuitOpen, database, fetch_and_remember, last_known_good
+from .search import apply_search_filters, search_sort_key
+from .pagination import KeysetPaginator, InvalidCursor
+from . import export
+from .saved import MAX_BATCH_SIZE, save_many, saved_recipe_ids, toggle_saved
+from django.core.paginator import Paginator
+from django.http import Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+import hashlib
+import itertools
+import json
 import logging
 import time
-from django.core.cache import cache
-from django.views.decorators.cache import cache_page
+from urllib.parse import urlencode
+from django.utils.cache import add_never_cache_headers, patch_cache_control
+from django.utils import timezone
 from django.utils.decorators import method_decorator
+from django.views.decorators.csrf import csrf_protect
+from django.views.decorators.http import require_GET, require_POST
 
 # Set up logging
 logger = logging.getLogger(__name__)
 
-# Apply cache to the recipe list view (2 minute cache)
-@method_decorator(cache_page(120), name='dispatch')
-class RecipeListView(ListView):
+CHART_MAX_AGE = 60 * 60 * 24 * 365
+# Seconds a client should wait before polling a chart that is still rendering
+CHART_RETRY_AFTER = 1
+# Saved recipes shown per page of My Recipes
+SAVED_PAGE_SIZE = 12
+
+
+class StaleFallbackMixin:
+    """
+    Mark pages built from a last known good snapshot, or from nothing at all.
+
+    Views set self.stale when the database was unavailable and a snapshot was
+    served, or self.unavailable when there wasn't one. Either way the page is
+    kept out of every cache, so the live page replaces it once the database
+    is back.
+    """
+    stale = False
+    unavailable = False
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        context["stale"] = self.stale
+        context["unavailable"] = self.unavailable
+        return context
+
+    def render_to_response(self, context, **response_kwargs):
+        if self.unavailable:
+            response_kwargs.setdefault("status", 503)
+        response = super().render_to_response(context, **response_kwargs)
+        if self.stale or self.unavailable:
+            patch_cache_control(response, private=True, no_store=True)
+        if self.unavailable:
+            response["Retry-After"] = str(database.reset_timeout)
+        return response
+
+# Revalidated copies get a 304 before the page cache or the view is consulted
+@method_decorator(conditional_page(list_etag, list_last_modified), name='dispatch')
+# Cache whole list pages until the catalog or the user's saved recipes change
+@method_decorator(versioned_cache_page(VERSIONED_TIMEOUT, per_user=True), name='dispatch')
+# Pages embed the CSRF token: set its cookie and Vary before cache_page
+# decides whether, and under which key, to store the page
+@method_decorator(csrf_protect, name='dispatch')
+class RecipeListView(StaleFallbackMixin, ListView):
     model = Recipe
     template_name = "recipes/main.html"
-    paginate_by = None  # Disable pagination to avoid extra queries
+    fragment_template_name = "recipes/_recipe_cards.html"
+    context_object_name = "recipe_list"  # Cached results are lists, not querysets
+    paginate_by = None  # Keyset pagination is handled in get_queryset
+    page_size = 20
+    card_fields = ("id", "name", "pic", "pic_width", "pic_height", "pic_variants")
+    default_sort = "name"
+
+    def get_search_data(self):
+        # Search filters come from the form POST or, for later pages, the query string
+        if self.request.method == "POST":
+            return self.request.POST
+        if any(name in self.request.GET for name in RecipesSearchForm.base_fields):
+            return self.request.GET
+        return None
+
+    def get_page_url(self, cursor):
+        data = self.get_search_data() or {}
+        params = [
+            (name, value) for name, value in data.items()
+            if name in RecipesSearchForm.base_fields
+        ]
+        params.append(("cursor", cursor))
+        return "?" + urlencode(params)
+
+    def get_template_names(self):
+        # Infinite scroll requests only need the next batch of cards
+        if self.request.GET.get("fragment"):
+            return [self.fragment_template_name]
+        return super().get_template_names()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context["form"] = RecipesSearchForm(self.request.POST or None)
+        context["form"] = RecipesSearchForm(self.get_search_data())
+        page = getattr(self, "page", None)
+        if page is not None and page.next_cursor:
+            context["next_url"] = self.get_page_url(page.next_cursor)
+        if page is not None and page.prev_cursor:
+            context["prev_url"] = self.get_page_url(page.prev_cursor)
         return context
 
     def post(self, request, *args, **kwargs):
         return self.get(request, *args, **kwargs)
 
+    def get_cache_key(self, data, cursor):
+        params = sorted(
+            (name, value) for name, value in (data or {}).items()
+            if name in RecipesSearchForm.base_fields
+        )
+        if not params and not cursor:
+            return 'recipe_list'
+        params.append(("cursor", cursor or ""))
+        digest = hashlib.md5(urlencode(params).encode()).hexdigest()
+        return f'recipe_search_{digest}'
+
+    def fetch_page(self, data, cursor):
+        # Get from database one page at a time
+        queryset = Recipe.objects.all()
+        sort_key = self.default_sort
+
+        if data is not None:
+            form = RecipesSearchForm(data)
+            if form.is_valid():
+                # All filters run in the database as a single indexed query
+                queryset = apply_search_filters(queryset, form.cleaned_data)
+                sort_key = search_sort_key(form.cleaned_data, sort_key)
+
+        # Cards only need these columns, plus the sort key for the cursors
+        sort_field = sort_key.lstrip("-")
+        fields = self.card_fields
+        if sort_field not in fields and sort_field != "search_rank":
+            fields += (sort_field,)
+        paginator = KeysetPaginator(queryset.only(*fields), sort_key, self.page_size)
+
+        try:
+            return paginator.page(cursor)
+        except InvalidCursor:
+            logger.debug("Ignoring invalid pagination cursor")
+            return paginator.page()
+
     def get_queryset(self):
-        # Use cache if possible to avoid database hits
-        cache_key = 'recipe_list'
-        
-        if self.request.method == "POST":
-            cache_key = 'recipe_search_' + str(hash(frozenset(self.request.POST.items())))
-        
-        queryset = cache.get(cache_key)
-        
-        if queryset is not None:
-            logger.debug(f"Using cached queryset for {cache_key}")
-            return queryset
-            
-        # If not in cache, get from database with strict limits
+        data = self.get_search_data()
+        cursor = self.request.GET.get("cursor")
+        if data is not None:
+            self.request.metrics_route = "recipes:search"
+
+        # Use cache if possible to avoid database hits; concurrent misses
+        # share one query. Keys carry the catalog version so pages always
+        # match the list ETag
+        cache_key = self.get_cache_key(data, cursor)
         try:
-            # Start with a very limited queryset
-            queryset = list(Recipe.objects.all()[:20])  # Convert to list to avoid future queries
-
-            if self.request.method == "POST":
-                form = RecipesSearchForm(self.request.POST)
-                if form.is_valid():
-                    # Apply filters with stricter limits
-                    recipe_title = form.cleaned_data.get("recipe_title")
-                    recipe_ingredients = form.cleaned_data.get("recipe_ingredients")
-                    difficulty_level = form.cleaned_data.get("difficulty_level")
-                    cooking_time = form.cleaned_data.get("cooking_time", 120)  # Default to 2 hours max
-
-                    # Apply filters to the in-memory list to avoid database queries
-                    filtered_queryset = []
-                    for recipe in queryset:
-                        # Apply difficulty filter
-                        if difficulty_level and recipe.difficulty > difficulty_level:
-                            continue
-                            
-                        # Apply cooking time filter
-                        if recipe.cooking_time > min(cooking_time, 120):
-                            continue
-                            
-                        # Apply title filter
-                        if recipe_title and recipe_title.lower() not in recipe.name.lower():
-                            continue
-                            
-                        # Apply ingredients filter
-                        if recipe_ingredients:
-                            ingredients_list = [ing.strip() for ing in recipe_ingredients.split(",") if ing.strip()][:1]
-                            if ingredients_list and not any(ing.lower() in recipe.ingredients.lower() for ing in ingredients_list):
-                                continue
-                                
-                        filtered_queryset.append(recipe)
-                    
-                    queryset = filtered_queryset[:20]  # Apply final limit
-            
-            # Cache the result for 2 minutes
-            cache.set(cache_key, queryset, 120)
-            return queryset
-            
-        except Exception as e:
-            # Log any database errors
-            logger.error(f"Database error in get_queryset: {str(e)}")
-            # Return empty queryset as fallback
-            return []
-
-
-class RecipeDetailView(DetailView):
+            page = get_or_compute(
+                versioned_key(CATALOG, cache_key),
+                lambda: fetch_and_remember(
+                    cache_key, lambda: self.fetch_page(data, cursor),
+                    # Searches and cursors are client input, so only the
+                    # default first page keeps a snapshot
+                    remember=cache_key == 'recipe_list',
+                ),
+                jittered(VERSIONED_TIMEOUT),
+            )
+        except (CircuitOpen,) + DATABASE_ERRORS as e:
+            # While the database is down, serve the last default page we got,
+            # whatever catalog version it came from
+            logger.error(f"Database unavailable in get_queryset: {str(e)}")
+            page = last_known_good(cache_key)
+            if page is None:
+                self.unavailable = True
+                return []
+            self.stale = True
+        self.page = page
+        return page.object_list
+
+
+@method_decorator(conditional_page(detail_etag, detail_last_modified), name='dispatch')
+class RecipeDetailView(StaleFallbackMixin, DetailView):
     model = Recipe
     template_name = "recipes/detail.html"
 
     def get_object(self, queryset=None):
+        pk = self.kwargs["pk"]
+        cache_key = f'recipe_detail_{pk}'
         try:
-            # Check cache first
-            cache_key = f'recipe_detail_{self.kwargs["pk"]}'
-            cached_object = cache.get(cache_key)
-            
-            if cached_object:
-                return cached_object
-                
-            # If not in cache, get from database
-            obj = super().get_object(queryset)
-            
-            # Cache for 2 minutes
-            cache.set(cache_key, obj, 120)
-            return obj
-            
-        except Exception as e:
-            logger.error(f"Error retrieving recipe: {str(e)}")
-            # Return None, template will handle this gracefully
-            return None
+            # Check cache first. If not in cache, get from database once however
+            # many requests miss together, and keep it until the recipe changes
+            # or it's evicted
+            return get_or_compute(
+                versioned_key(recipe_namespace(pk), cache_key),
+                lambda: fetch_and_remember(
+                    cache_key, lambda: super(RecipeDetailView, self).get_object(queryset)
+                ),
+                jittered(VERSIONED_TIMEOUT),
+            )
+        except (CircuitOpen,) + DATABASE_ERRORS as e:
+            logger.error(f"Database unavailable retrieving recipe: {str(e)}")
+            recipe = last_known_good(cache_key)
+            if recipe is None:
+                # Return None, template will handle this gracefully
+                self.unavailable = True
+            else:
+                self.stale = True
+            return recipe
 
 
 class RecipeAnalyticsView(TemplateView):
@@ -135,20 +241,54 @@ class RecipeAnalyticsView(TemplateView):
             chart_type = form.cleaned_data.get("chart_type")
             analysis_type = form.cleaned_data.get("analysis_type")
 
-            try:
-                # Get recipes with stricter limit
-                recipes = Recipe.objects.all()[:15]
+            output_format = form.cleaned_data.get("output_format") or "png"
 
-                if recipes:
-                    chart = create_chart(chart_type, recipes, analysis_type)
-                    context["chart"] = chart
-            except Exception as e:
-                logger.error(f"Error in analytics: {str(e)}")
-                context["error"] = "Could not generate chart due to database issues."
+            # The image is served, and cached, by chart_image under this version
+            url = reverse("recipes:chart", kwargs={
+                "analysis_type": analysis_type,
+                "chart_type": chart_type,
+                "fmt": output_format,
+            })
+            context["chart"] = f"{url}?v={get_version(CATALOG)}"
 
         return self.render_to_response(context)
 
 
+def chart_image(request, analysis_type, chart_type, fmt):
+    if (
+        analysis_type not in dict(ANALYSIS_CHOICES)
+        or chart_type not in dict(CHART_CHOICES)
+        or fmt not in CONTENT_TYPES
+    ):
+        raise Http404("Unknown chart")
+
+    version = get_version(CATALOG)
+    if request.GET.get("v") != str(version):
+        # Links to an old dataset version lead to the current chart
+        return redirect(f"{request.path}?v={version}")
+
+    try:
+        # Counters cover the whole catalog and are read in O(buckets)
+        image = get_chart(analysis_type, chart_type, fmt, version)
+    except RenderPending:
+        # Still rendering in the pool; the client polls the same URL
+        response = HttpResponse("Chart is being rendered.", status=202)
+        response["Retry-After"] = str(CHART_RETRY_AFTER)
+        add_never_cache_headers(response)
+        return response
+    except Exception as e:
+        logger.error(f"Error in analytics: {str(e)}")
+        return HttpResponse("Could not generate chart due to database issues.", status=503)
+
+    if image is None:
+        raise Http404("No recipes to chart")
+
+    response = HttpResponse(image, content_type=CONTENT_TYPES[fmt])
+    # The URL changes whenever the data does, so browsers can keep it forever
+    patch_cache_control(response, public=True, max_age=CHART_MAX_AGE, immutable=True)
+    return response
+
+
 def recipe_home(request):
     return render(request, "recipes/recipes_home.html")
 
@@ -162,18 +302,56 @@ def save_recipe(request, recipe_id):
         })
     
     try:
-        recipe = Recipe.objects.get(id=recipe_id)
-        if recipe in request.user.saved_recipes.all():
-            request.user.saved_recipes.remove(recipe)
-            return JsonResponse({"status": "removed"})
-        else:
-            request.user.saved_recipes.add(recipe)
-            return JsonResponse({"status": "saved"})
-    except Recipe.DoesNotExist:
-        return JsonResponse({"status": "error", "message": "Recipe not found"})
+        # Works on the through table by id, without loading the recipe
+        saved = toggle_saved(request.user, recipe_id)
     except Exception as e:
         logger.error(f"Error saving recipe: {str(e)}")
         return JsonResponse({"status": "error", "message": "Database connection error"})
+    if saved is None:
+        return JsonResponse({"status": "error", "message": "Recipe not found"})
+    return JsonResponse({"status": "saved" if saved else "removed"})
+
+
+def _recipe_ids(value):
+    if not isinstance(value, list) or not all(
+        isinstance(pk, int) and not isinstance(pk, bool) for pk in value
+    ):
+        raise ValueError("expected a list of recipe ids")
+    return value
+
+
+@require_POST
+def save_recipes(request):
+    """
+    Save and unsave many recipes at once, e.g. favourites synced from offline.
+
+    Takes a JSON body like {"save": [1, 2], "unsave": [3]} and applies it in
+    one transaction.
+    """
+    if not request.user.is_authenticated:
+        return JsonResponse({
+            "status": "error",
+            "message": "Authentication is currently disabled. Recipe saving is unavailable."
+        }, status=401)
+
+    try:
+        body = json.loads(request.body or b"{}")
+        save_ids = _recipe_ids(body.get("save", []))
+        unsave_ids = _recipe_ids(body.get("unsave", []))
+    except (AttributeError, ValueError) as e:
+        return JsonResponse({"status": "error", "message": f"Invalid request: {str(e)}"}, status=400)
+    if len(save_ids) + len(unsave_ids) > MAX_BATCH_SIZE:
+        return JsonResponse({
+            "status": "error",
+            "message": f"At most {MAX_BATCH_SIZE} recipe ids per request"
+        }, status=400)
+
+    try:
+        result = save_many(request.user, save_ids, unsave_ids)
+    except Exception as e:
+        logger.error(f"Error saving recipes: {str(e)}")
+        return JsonResponse({"status": "error", "message": "Database connection error"}, status=503)
+    return JsonResponse({"status": "ok", **result})
 
 
 def my_recipes(request):
@@ -183,8 +361,79 @@ def my_recipes(request):
         return render(request, "recipes/my_recipes.html", {"recipes": []})
     
     try:
-        saved_recipes = request.user.saved_recipes.all()[:10]  # Strict limit
-        return render(request, "recipes/my_recipes.html", {"recipes": saved_recipes})
+        # Page through the cached id list, newest first, then load only the
+        # cards on this page in one query
+        page = Paginator(saved_recipe_ids(request.user.pk), SAVED_PAGE_SIZE).get_page(
+            request.GET.get("page")
+        )
+        cards = Recipe.objects.filter(pk__in=page.object_list).only(*RecipeListView.card_fields)
+        by_pk = {recipe.pk: recipe for recipe in cards}
+        # Recipes deleted since the ids were cached are skipped
+        recipes = [by_pk[pk] for pk in page.object_list if pk in by_pk]
+        return render(request, "recipes/my_recipes.html", {"recipes": recipes, "page": page})
     except Exception as e:
         logger.error(f"Error retrieving saved recipes: {str(e)}")
         return render(request, "recipes/my_recipes.html", {"recipes": [], "error": "Database connection error"})
+
+
+@require_GET
+@conditional_page(catalog_etag, catalog_last_modified)
+def export_recipes(request, fmt):
+    """
+    Stream the whole catalog as NDJSON or CSV, e.g. /export/recipes.ndjson.
+
+    Rows are read through a cursor and written out as they arrive, so the
+    response starts at once and memory stays flat however big the catalog.
+    """
+    if fmt not in export.CONTENT_TYPES:
+        raise Http404("Unknown export format")
+
+    pieces = export.stream(fmt, export.export_rows())
+    try:
+        # Runs the query now, so an unavailable database still gets a 503
+        first = database.call(lambda: next(pieces, ""))
+    except (CircuitOpen,) + DATABASE_ERRORS as e:
+        logger.error(f"Database unavailable exporting recipes: {str(e)}")
+        response = HttpResponse("Export unavailable due to database issues.", status=503)
+        response["Retry-After"] = str(database.reset_timeout)
+        patch_cache_control(response, private=True, no_store=True)
+        return response
+
+    response = StreamingHttpResponse(
+        itertools.chain([first], pieces), content_type=export.CONTENT_TYPES[fmt]
+    )
+    response["Content-Disposition"] = f'attachment; filename="recipes.{fmt}"'
+    return response
+
+
+def job_status(request, job_id):
+    """
+    Report how a background job is getting on, for clients polling after
+    an action that queued one.
+    """
+    try:
+        job = Job.objects.filter(pk=job_id).first()
+    except Exception as e:
+        logger.error(f"Error reading job {job_id}: {str(e)}")
+        return JsonResponse({"status": "error", "message": "Database connection error"}, status=503)
+    if job is None:
+        return JsonResponse({"status": "error", "message": "Job not found"}, status=404)
+
+    data = {
+        "id": job.pk,
+        "name": job.name,
+        "status": job.status,
+        "attempts": job.attempts,
+        "max_attempts": job.max_attempts,
+        "run_at": job.run_at.isoformat(),
+        "finished_at": job.finished_at.isoformat() if job.finished_at else None,
+        "result": job.result,
+    }
+    if request.user.is_staff:
+        # Errors can mention storage paths and credentials
+        data["last_error"] = job.last_error
+    response = JsonResponse(data)
+    add_never_cache_headers(response)
+    if job.status == Job.QUEUED:
+        response["Retry-After"] = str(max(1, int((job.run_at - timezone.now()).total_seconds())))
+    return response